@@ -17,9 +17,10 @@
  *
  * FUNCIONALIDADES:
  * - **Atualização OTA (Over-The-Air)**: Permite atualizar o firmware do dispositivo sem
- *   a necessidade de uma conexão física.
- * - **Sincronização de horário preciso**: Usa o protocolo NTP para obter o horário atual
- *   de um servidor remoto.
+ *   a necessidade de uma conexão física (ArduinoOTA ou download da versão liberada pelo
+ *   servidor em /ota/verificar, com liberação gradual).
+ * - **Sincronização de horário preciso**: Usa o relógio do servidor Django (/api/tempo e o
+ *   campo server_time das respostas), com NTP apenas como reserva.
  * - **Controle de saída com timeout de segurança**: A sirene é desativada automaticamente
  *   após um tempo máximo de ativação para evitar funcionamento contínuo e prolongado.
  * - **Logs detalhados via Serial**: Exibe informações sobre o estado do sistema e
@@ -35,7 +36,7 @@
  * FUNCIONAMENTO:
  * O firmware está configurado para:
  * 1. Conectar-se automaticamente à rede WiFi.
- * 2. Sincronizar a hora com um servidor NTP.
+ * 2. Sincronizar a hora com o servidor Django (NTP como reserva).
  * 3. Realizar requisições periódicas ao servidor Django para verificar agendamentos
  *    e comandos manuais.
  * 4. Ativar ou desativar a sirene de acordo com os agendamentos recebidos ou comandos
@@ -51,6 +52,9 @@
 #include <NTPClient.h>
 #include <WiFiUdp.h>
 #include <ArduinoOTA.h>
+#include <ESP8266httpUpdate.h>
+
+const char* firmwareVersion = "1.0.0";  // Versão deste firmware (informada ao servidor)
 
 ///// CONFIGURAÇÕES DE REDE /////
 const char* ssid = "SEU_SSID";        // SSID da rede Wi-Fi à qual o ESP8266 se conectará
@@ -60,26 +64,43 @@ const char* password = "SUA_SENHA";           // Senha da rede Wi-Fi
 const char* scheduleUrl = "http://200.18.75.25:3235/api/comando"; // URL para verificar agendamentos
 const char* commandUrl = "http://200.18.75.25:3235/check_command/"; // URL para comandos manuais
 const char* confirmUrl = "http://200.18.75.25:3235/confirm_command/"; // URL para confirmar comando
+const char* timeUrl = "http://200.18.75.25:3235/api/tempo"; // URL do relógio do servidor
+const char* otaCheckUrl = "http://200.18.75.25:3235/ota/verificar"; // URL de verificação de firmware
+const char* configUrl = "http://200.18.75.25:3235/api/config"; // URL da configuração do dispositivo
 
 // Configurações de hardware
 const int sirenPin = 5;           // Pino de controle da sirene (saída digital, D1 no ESP8266)
 const int statusLed = 2;          // LED interno (azul, D4 no ESP8266)
 
 ///// INTERVALOS DE VERIFICAÇÃO /////
-const unsigned long scheduleCheckInterval = 60000;  // Intervalo de 1 minuto para verificar agendamentos
-const unsigned long commandCheckInterval = 5000;    // Intervalo de 5 segundos para verificar comandos manuais
-const unsigned long sirenMinDuration = 2000;        // Duração mínima da sirene (2 segundos)
-const unsigned long sirenMaxDuration = 3500;       // Duração máxima da sirene (5 segundos)
+// Valores padrão; substituídos pela configuração recebida de /api/config
+unsigned long scheduleCheckInterval = 60000;        // Intervalo de 1 minuto para verificar agendamentos
+unsigned long commandCheckInterval = 5000;          // Intervalo de 5 segundos para verificar comandos manuais
+const unsigned long otaCheckInterval = 3600000;     // Intervalo de 1 hora para verificar novas versões de firmware
+unsigned long sirenMinDuration = 2000;              // Duração mínima da sirene (2 segundos)
+unsigned long sirenMaxDuration = 3500;              // Duração máxima da sirene (3,5 segundos)
 
 ///// VARIÁVEIS GLOBAIS /////
+const long utcOffsetSeconds = -3 * 3600;  // UTC-3 (Brasília), usado até a primeira sincronização
 WiFiUDP ntpUDP;
-NTPClient timeClient(ntpUDP, "br.pool.ntp.org", -3 * 3600);  // UTC-3 (Brasília)
+NTPClient timeClient(ntpUDP, "br.pool.ntp.org", utcOffsetSeconds);
 
 unsigned long lastScheduleCheck = 0;    // Marca o último tempo que a consulta ao servidor de agendamentos foi realizada
 unsigned long lastCommandCheck = 0;     // Marca o último tempo que a consulta ao servidor de comandos manuais foi realizada
+unsigned long lastOtaCheck = 0;         // Marca a última verificação de nova versão de firmware
+unsigned long scheduleDelay = 60000;    // Espera até a próxima consulta de agendamentos (next_poll_ms do servidor)
+unsigned long commandDelay = 5000;      // Espera até a próxima consulta de comandos (next_poll_ms do servidor)
 unsigned long sirenStartTime = 0;       // Marca o momento que a sirene foi ativada
 bool sirenActive = false;               // Estado da sirene (ativada ou desativada)
 String lastCommandId = "";              // Armazena o ID do último comando manual recebido
+String deviceId = "";                   // Identificação do dispositivo (MAC) enviada ao servidor
+uint64_t sirenActivatedAtMs = 0;        // Instante (ms desde a época Unix, UTC) da última ativação
+bool serverClockSynced = false;         // true após receber o horário do servidor
+uint64_t serverEpochAtSync = 0;         // Horário do servidor (ms, UTC) na última sincronização
+unsigned long millisAtSync = 0;         // millis() correspondente a serverEpochAtSync
+long serverUtcOffset = utcOffsetSeconds; // Deslocamento UTC informado pelo servidor (inclui horário de verão)
+String configVersion = "0";             // Versão da configuração aplicada ("0" = padrão do firmware; ms, não cabe em long)
+String scheduleVersion = "";           // Versão da agenda recebida (schedule_version)
 int wifiRetries = 0;                    // Contador de tentativas de reconexão Wi-Fi
 
 const char* DAYS_OF_WEEK[7] = {"DOM", "SEG", "TER", "QUA", "QUI", "SEX", "SAB"}; // Mapeamento dos dias da semana
@@ -98,9 +119,14 @@ void setup() {
 
   // Conectar ao WiFi
   connectWiFi();
+  deviceId = WiFi.macAddress();                  // Usado pelo servidor para medir a latência por dispositivo
 
-  // Configurar NTP (Network Time Protocol)
+  // Sincronizar o relógio com o servidor (NTP apenas como reserva)
   setupNTP();
+  syncServerClock();
+
+  // Carregar a configuração central (intervalos e durações)
+  fetchDeviceConfig();
 
   // Configurar OTA (Over The Air)
   setupOTA();
@@ -110,8 +136,10 @@ void setup() {
 
 ///// LOOP PRINCIPAL /////
 void loop() {
-  // Atualiza o cliente NTP
-  timeClient.update();
+  // Atualiza o cliente NTP (reserva enquanto o relógio do servidor não estiver sincronizado)
+  if (!serverClockSynced) {
+    timeClient.update();
+  }
 
   // Utiliza o OTA
   ArduinoOTA.handle();
@@ -132,7 +160,7 @@ void loop() {
   }
 
   // 2. Verificação de agendamentos (menos frequente)
-  if (currentMillis - lastScheduleCheck >= scheduleCheckInterval) {
+  if (currentMillis - lastScheduleCheck >= scheduleDelay) {
     lastScheduleCheck = currentMillis;
     if (WiFi.status() == WL_CONNECTED) {
       checkSchedules();  // Verifica os agendamentos no servidor Django
@@ -140,13 +168,21 @@ void loop() {
   }
 
   // 3. Verificação de comandos manuais (mais frequente)
-  if (currentMillis - lastCommandCheck >= commandCheckInterval) {
+  if (currentMillis - lastCommandCheck >= commandDelay) {
     lastCommandCheck = currentMillis;
     if (WiFi.status() == WL_CONNECTED) {
       checkManualCommands();  // Verifica se há comandos manuais disponíveis
     }
   }
 
+  // 4. Verificação de nova versão de firmware (liberação gradual pelo servidor)
+  if (currentMillis - lastOtaCheck >= otaCheckInterval && !sirenActive) {
+    lastOtaCheck = currentMillis;
+    if (WiFi.status() == WL_CONNECTED) {
+      checkFirmwareUpdate();
+    }
+  }
+
   // Piscar LED indicativo
   static unsigned long lastBlink = 0;
   if (currentMillis - lastBlink >= 1000) {
@@ -195,24 +231,76 @@ void handleWiFiDisconnection() {
 }
 
 void setupNTP() {
-  timeClient.begin();  // Inicializa o cliente NTP
-  Serial.print("Sincronizando horário NTP...");
+  // Reserva: uma única tentativa, sem bloquear a inicialização
+  timeClient.begin();
+  timeClient.update();
+}
 
-  int attempts = 0;
-  while (!timeClient.update() && attempts < 10) {  // Tenta sincronizar até 10 vezes
-    delay(1000);  // Aguarda um segundo entre tentativas
-    Serial.print(".");
-    attempts++;
+// aplica o bloco de horário do servidor, compensando metade do tempo da requisição
+void applyServerTime(JsonVariant serverTime, unsigned long requestStart, unsigned long requestEnd) {
+  if (serverTime.isNull() || serverTime["epoch_ms"].isNull()) {
+    return;
+  }
+  unsigned long roundTrip = requestEnd - requestStart;
+  serverEpochAtSync = serverTime["epoch_ms"].as<uint64_t>() + roundTrip / 2;
+  millisAtSync = requestEnd;
+  serverUtcOffset = serverTime["utc_offset_s"] | utcOffsetSeconds;
+  serverClockSynced = true;
+}
+
+// sincronização inicial com o relógio do servidor
+void syncServerClock() {
+  WiFiClient client;
+  HTTPClient http;
+
+  http.begin(client, timeUrl);
+  unsigned long requestStart = millis();
+  int httpCode = http.GET();
+  unsigned long requestEnd = millis();
+
+  if (httpCode == HTTP_CODE_OK) {
+    DynamicJsonDocument doc(384);
+    deserializeJson(doc, http.getString());
+    applyServerTime(doc.as<JsonVariant>(), requestStart, requestEnd);
+    Serial.println("Relógio sincronizado com o servidor: " + formattedTime());
+  } else {
+    Serial.print("Falha ao obter horário do servidor: ");
+    Serial.println(httpCode);
   }
 
-  if (attempts < 10) {
-    Serial.println(" OK!");
-    Serial.println("Horário atual: " + timeClient.getFormattedTime());
+  http.end();
+}
+
+// instante atual em ms desde a época Unix (UTC), usado para medir o atraso dos toques;
+// 0 enquanto nem o servidor nem o NTP tiverem informado o horário
+uint64_t currentEpochMs() {
+  if (serverClockSynced) {
+    return serverEpochAtSync + (millis() - millisAtSync);
+  }
+  if (!timeClient.isTimeSet()) {
+    return 0;
+  }
+  return (uint64_t)(timeClient.getEpochTime() - utcOffsetSeconds) * 1000ULL;
+}
+
+// instante da ativação no corpo da confirmação: null com o relógio não sincronizado
+// (o servidor usa então o horário de chegada)
+void putActivatedAt(JsonDocument& body) {
+  if (sirenActivatedAtMs > 0) {
+    body["activated_at"] = sirenActivatedAtMs;
   } else {
-    Serial.println(" Falha na sincronização!");
+    body["activated_at"] = (char*)0;
   }
 }
 
+// horário local (HH:MM:SS) no mesmo fuso usado pelo servidor
+String formattedTime() {
+  unsigned long localSeconds = (unsigned long)((currentEpochMs() / 1000ULL + serverUtcOffset) % 86400ULL);
+  char buffer[9];
+  snprintf(buffer, sizeof(buffer), "%02lu:%02lu:%02lu", localSeconds / 3600, (localSeconds % 3600) / 60, localSeconds % 60);
+  return String(buffer);
+}
+
 ///// FUNÇÕES DE CONEXÃO COM O SERVIDOR  /////
 
 // verifica a agenda
@@ -220,15 +308,32 @@ void checkSchedules() {
   WiFiClient client;
   HTTPClient http;
 
-  http.begin(client, scheduleUrl);  // Inicia a requisição ao servidor de agendamentos
+  // schedule_version informa ao servidor que a agenda é acompanhada pelo canal de comandos:
+  // longe dos toques a próxima consulta pode esperar até o toque seguinte
+  String url = String(scheduleUrl) + "?schedule_version=" + scheduleVersion;
+  http.begin(client, url);  // Inicia a requisição ao servidor de agendamentos
   http.setTimeout(10000);  // Timeout de 10 segundos para a requisição
+  http.addHeader("X-Device-Id", deviceId);
 
+  unsigned long requestStart = millis();
   int httpCode = http.GET();  // Realiza a requisição GET para obter os agendamentos
+  unsigned long requestEnd = millis();
 
   if (httpCode == HTTP_CODE_OK) {
     String payload = http.getString();  // Obtém a resposta do servidor
     DynamicJsonDocument doc(1024);
     deserializeJson(doc, payload);  // Deserializa o JSON recebido
+    applyServerTime(doc["server_time"], requestStart, requestEnd);  // Corrige o desvio do relógio
+
+    // Próxima consulta sugerida pelo servidor (rara longe dos toques, logo antes de um toque)
+    scheduleDelay = doc["next_poll_ms"] | scheduleCheckInterval;
+
+    if (!doc["schedule_version"].isNull()) {
+      scheduleVersion = doc["schedule_version"].as<String>();
+    }
+
+    // Configuração alterada no servidor: recarrega os intervalos
+    checkConfigVersion(doc["config_version"]);
 
     bool shouldActivate = doc["should_activate"];  // Verifica se a sirene deve ser ativada
     bool isScheduled = doc["is_scheduled"];      // Verifica se o comando foi agendado
@@ -236,6 +341,9 @@ void checkSchedules() {
     if (shouldActivate && !sirenActive) {
       String activationSource = isScheduled ? "agendamento" : "servidor";
       activateSiren(activationSource);  // Ativa a sirene se o comando for "ativar"
+      if (isScheduled && !doc["expected_at_ms"].isNull()) {
+        confirmScheduledRing(doc["expected_at_ms"].as<uint64_t>());  // Informa o atraso do toque
+      }
     }
 
     // Log de status
@@ -243,7 +351,7 @@ void checkSchedules() {
     Serial.print(shouldActivate ? "ATIVAR" : "DESATIVAR");
     Serial.print(isScheduled ? " (agendado)" : " (manual)");
     Serial.print(" | Hora: ");
-    Serial.println(timeClient.getFormattedTime());
+    Serial.println(formattedTime());
 
     // Debug: próximo alarme
     if (doc.containsKey("next_alarm")) {
@@ -253,22 +361,70 @@ void checkSchedules() {
   } else {
     Serial.print("Erro ao verificar agendamentos: ");
     Serial.println(httpCode);
+    scheduleDelay = scheduleCheckInterval;  // Sem resposta do servidor: volta ao intervalo padrão
   }
 
   http.end();
 }
+// recarrega a configuração se a versão informada pelo servidor for outra
+void checkConfigVersion(JsonVariant serverVersion) {
+  if (!serverVersion.isNull() && serverVersion.as<String>() != configVersion) {
+    fetchDeviceConfig();
+  }
+}
+
+// carrega a configuração efetiva do dispositivo (GlobalConfig + DeviceConfig)
+void fetchDeviceConfig() {
+  WiFiClient client;
+  HTTPClient http;
+
+  String url = String(configUrl) + "?device_id=" + deviceId + "&version=" + configVersion;
+  http.begin(client, url);
+  int httpCode = http.GET();
+
+  if (httpCode == HTTP_CODE_OK) {
+    DynamicJsonDocument doc(512);
+    deserializeJson(doc, http.getString());
+    if (doc["changed"] == true) {
+      JsonObject config = doc["config"];
+      scheduleCheckInterval = config["schedule_check_interval_ms"] | scheduleCheckInterval;
+      commandCheckInterval = config["command_check_interval_ms"] | commandCheckInterval;
+      sirenMinDuration = config["siren_min_duration_ms"] | sirenMinDuration;
+      sirenMaxDuration = config["siren_max_duration_ms"] | sirenMaxDuration;
+      configVersion = doc["version"].as<String>();
+      Serial.println("Configuração atualizada (versão " + configVersion + ")");
+    }
+  } else {
+    Serial.print("Erro ao carregar configuração: ");
+    Serial.println(httpCode);
+  }
+
+  http.end();
+}
+
 // verifica se ha comando manual
 void checkManualCommands() {
   WiFiClient client;
   HTTPClient http;
 
   http.begin(client, commandUrl);  // Inicia a requisição ao servidor de comandos manuais
+  http.addHeader("X-Device-Id", deviceId);
+  unsigned long requestStart = millis();
   int httpCode = http.GET();
+  unsigned long requestEnd = millis();
 
   if (httpCode == HTTP_CODE_OK) {
     String payload = http.getString();  // Obtém a resposta do servidor
-    DynamicJsonDocument doc(256);
+    DynamicJsonDocument doc(512);
     deserializeJson(doc, payload);  // Deserializa o JSON recebido
+    applyServerTime(doc["server_time"], requestStart, requestEnd);  // Corrige o desvio do relógio
+    commandDelay = doc["next_poll_ms"] | commandCheckInterval;      // Próxima consulta sugerida pelo servidor
+
+    // Agenda alterada no servidor: consulta agora em vez de esperar o próximo toque
+    if (!doc["schedule_version"].isNull() && doc["schedule_version"].as<String>() != scheduleVersion) {
+      scheduleDelay = 0;
+    }
+    checkConfigVersion(doc["config_version"]);
 
     // Verifica se existe comando e se é para ligar
     if (doc.containsKey("command") && doc["command"] == "ligar") {
@@ -285,6 +441,8 @@ void checkManualCommands() {
         }
       }
     }
+  } else {
+    commandDelay = commandCheckInterval;  // Sem resposta do servidor: volta ao intervalo padrão
   }
   http.end();
 }
@@ -296,7 +454,14 @@ void confirmCommandExecution() {
   http.begin(client, confirmUrl);  // URL para confirmar a execução do comando
   http.addHeader("Content-Type", "application/json");
 
-  int httpCode = http.POST("{}");  // Envia confirmação de que o comando foi executado
+  // Informa o instante real da ativação para o cálculo de latência no servidor
+  StaticJsonDocument<128> body;
+  body["device_id"] = deviceId;
+  putActivatedAt(body);
+  String payload;
+  serializeJson(body, payload);
+
+  int httpCode = http.POST(payload);  // Envia confirmação de que o comando foi executado
 
   if (httpCode == HTTP_CODE_OK) {
     Serial.println("Comando manual confirmado no servidor");
@@ -308,6 +473,31 @@ void confirmCommandExecution() {
   http.end();
 }
 
+// informa ao servidor o instante real de um toque agendado
+void confirmScheduledRing(uint64_t scheduledAtMs) {
+  WiFiClient client;
+  HTTPClient http;
+
+  http.begin(client, confirmUrl);
+  http.addHeader("Content-Type", "application/json");
+
+  StaticJsonDocument<160> body;
+  body["device_id"] = deviceId;
+  body["source"] = "schedule";
+  body["scheduled_at"] = scheduledAtMs;
+  putActivatedAt(body);
+  String payload;
+  serializeJson(body, payload);
+
+  int httpCode = http.POST(payload);
+  if (httpCode != HTTP_CODE_OK) {
+    Serial.print("Erro ao confirmar toque agendado: ");
+    Serial.println(httpCode);
+  }
+
+  http.end();
+}
+
 ///// CONTROLE DA SIRENE /////
 
 // ativa sirene
@@ -315,11 +505,12 @@ void activateSiren(String source) {
   digitalWrite(sirenPin, LOW);  // Ativa a sirene 
   sirenActive = true;
   sirenStartTime = millis();    // Marca o tempo de ativação
+  sirenActivatedAtMs = currentEpochMs();
 
   Serial.print("Sirene ATIVADA por ");
   Serial.print(source);
   Serial.print(" às ");
-  Serial.println(timeClient.getFormattedTime());
+  Serial.println(formattedTime());
 
   // LED fica fixo ligado durante ativação
   digitalWrite(statusLed, HIGH);
@@ -332,7 +523,7 @@ void deactivateSiren(String reason) {
   Serial.print("Sirene DESATIVADA (");
   Serial.print(reason);
   Serial.print(") às ");
-  Serial.println(timeClient.getFormattedTime());
+  Serial.println(formattedTime());
 
   // Retorna ao estado normal do LED
   digitalWrite(statusLed, LOW);
@@ -366,11 +557,39 @@ void setupOTA() {
 }
 
 
+// consulta o servidor e instala a versão de firmware liberada para este dispositivo
+void checkFirmwareUpdate() {
+  WiFiClient client;
+  HTTPClient http;
+
+  String url = String(otaCheckUrl) + "?device_id=" + deviceId + "&version=" + firmwareVersion;
+  http.begin(client, url);
+  int httpCode = http.GET();
+
+  if (httpCode == HTTP_CODE_OK) {
+    DynamicJsonDocument doc(512);
+    deserializeJson(doc, http.getString());
+    http.end();
+
+    if (doc["update"] == true) {
+      String binaryUrl = doc["url"].as<String>();
+      Serial.println("Nova versão de firmware: " + doc["version"].as<String>());
+      t_httpUpdate_return result = ESPhttpUpdate.update(client, binaryUrl, firmwareVersion);
+      if (result == HTTP_UPDATE_FAILED) {
+        Serial.println("Falha na atualização: " + ESPhttpUpdate.getLastErrorString());
+      }
+    }
+    return;
+  }
+
+  http.end();
+}
+
 ///// FUNÇÕES AUXILIAR DE DEBUG /////
 
 void printDebugInfo() {
   Serial.println("\n=== DEBUG INFO ===");
-  Serial.println("Horário atual: " + timeClient.getFormattedTime());
+  Serial.println("Horário atual: " + formattedTime());
   Serial.println("WiFi: " + String(WiFi.status() == WL_CONNECTED ? "Conectado" : "Desconectado"));
   Serial.println("IP: " + WiFi.localIP().toString());
   Serial.println("Sirene: " + String(sirenActive ? "ATIVA" : "INATIVA"));
@@ -16,6 +16,7 @@ Este projeto utiliza ESP_BELL_URL para comunicação com ESP8266.
 # IMPORTAÇÕES E CONFIGURAÇÃO DE DIRETÓRIOS
 # ========================================================
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent  # Diretório base do projeto
@@ -122,12 +123,89 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",  # Diretório de arquivos estáticos do projeto
 ]
 
+STATIC_ROOT = BASE_DIR / "staticfiles"  # Destino do collectstatic (servido pelo Nginx)
+
+# Nomes com hash do conteúdo (ex: style.3f2a1c.css): o Nginx pode servir /static/
+# com cache longo ("expires max"), pois cada alteração gera um novo nome de arquivo
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+}
+
+# ========================================================
+# ARQUIVOS ENVIADOS (BINÁRIOS DE FIRMWARE OTA)
+# ========================================================
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# ========================================================
+# CACHE (AGENDA DO DIA, FRAGMENTOS DE TEMPLATE E ESTADO DA SIRENE)
+# ========================================================
+
+# O estado da sirene (app/state.py), os comandos pendentes e as chaves de idempotência
+# são publicados no cache para os demais processos: o padrão é um FileBasedCache no disco
+# local, compartilhado pelo painel, pela API dos dispositivos e por todos os workers
+# (Memcached ou Redis também servem). A LocMemCache só é vista pelo próprio processo e é
+# recusada na inicialização quando SERVER_PROCESSES > 1 (ver app/checks.py).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', str(BASE_DIR / 'var' / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Processos que atendem requisições com estas configurações (o gunicorn.conf.py informa
+# o número de workers)
+SERVER_PROCESSES = int(os.environ.get('SERVER_PROCESSES', 1))
+
 # ========================================================
 # CONFIGURAÇÕES DO SISTEMA DE SIRENE
 # ========================================================
 
 ESP_BELL_URL = "http://192.168.1.14/ring"  # Endereço da ESP8266 (POST de comando)
 
+# Histórico de toques (RingEvent): gravação em lote por uma thread de fundo
+RING_EVENT_ASYNC = True           # False grava cada evento imediatamente
+RING_EVENT_BATCH_SIZE = 100       # Eventos por INSERT em lote
+RING_EVENT_FLUSH_INTERVAL = 2.0   # Intervalo máximo (s) entre gravações
+RING_LATENCY_P95_THRESHOLD_MS = 10000  # Atraso p95 acima do qual um dispositivo é sinalizado
+
+# Estado da sirene em memória: intervalo (s) da gravação em segundo plano de SirenStatus
+# e DeviceSirenState (0 grava imediatamente)
+SIREN_STATE_SNAPSHOT_INTERVAL = 5.0
+# Validade (s) do estado publicado no cache: depois disso é reconstruído a partir do banco
+SIREN_STATE_TTL = 30
+
+# Exportação de leituras (/api/leituras/exportar): linhas lidas do banco por bloco
+SENSOR_EXPORT_CHUNK_SIZE = 2000
+
+# Ativação manual (/ativar/): agrupamento, limites de taxa (capacidade, período em s) e
+# validade das chaves de idempotência (s)
+ACTIVATION_COALESCE_SECONDS = 5
+ACTIVATION_RATE_LIMIT_USER = (5, 60)    # Por usuário (anônimos: por IP do cliente)
+ACTIVATION_RATE_LIMIT_SIREN = (10, 60)  # Global, compartilhado por todos os processos
+ACTIVATION_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Proxies confiáveis (Nginx local): deles se aceita o IP do cliente em X-Forwarded-For
+TRUSTED_PROXIES = ['127.0.0.1', '::1']
+
+# Implantação (python manage.py implantar): janela sem reinício em torno de cada toque
+# e pidfiles dos mestres Gunicorn a trocar (ver gunicorn.conf.py, GUNICORN_PIDFILE)
+DEPLOY_RING_WINDOW_S = 120
+DEPLOY_PIDFILES = []
+
+# Consulta adaptativa (campo next_poll_ms das respostas aos dispositivos)
+POLL_MIN_MS = 1000             # Menor intervalo sugerido (comando pendente)
+POLL_SCHEDULE_MAX_MS = 60000   # Maior espera do canal de agendamentos (firmware sem schedule_version)
+POLL_SCHEDULE_IDLE_MAX_MS = 3600000  # Maior espera quando o dispositivo acompanha schedule_version
+POLL_COMMAND_MAX_MS = 15000    # Maior espera do canal de comandos sob carga (atraso de um toque manual)
+POLL_RING_MARGIN_MS = 500      # Consulta logo após o início do minuto do toque
+POLL_TARGET_RPS = 50           # Acima desta taxa (req/s por processo) os intervalos aumentam
+POLL_LOAD_WINDOW_S = 10        # Janela de medição da taxa de requisições
+
 # ========================================================
 # LOGGING (EXIBIÇÃO NO TERMINAL)
 # ========================================================
@@ -0,0 +1,39 @@
+"""
+PERFIL "API DOS DISPOSITIVOS" (settings_device.py)
+
+DESCRIÇÃO:
+Configuração enxuta para os workers que atendem apenas os dispositivos ESP
+(agendamentos, comandos, horário, configuração e OTA). Herda tudo de settings.py e
+remove o que só a interface web usa:
+- sem admin, sessões, mensagens, arquivos estáticos e Django REST Framework
+- sem middlewares (os endpoints dos dispositivos não usam sessão, usuário nem CSRF)
+- DEBUG desligado (com DEBUG o Django guarda todas as consultas SQL em memória)
+- logging em nível INFO
+
+USO:
+    DJANGO_SETTINGS_MODULE=SchoolBuzzer.settings_device gunicorn -c gunicorn.conf.py SchoolBuzzer.wsgi
+
+O painel web e o /admin/ continuam sendo servidos com SchoolBuzzer.settings.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import LOGGING, SERVER_PROCESSES
+
+DEBUG = False
+
+# Os modelos do app não dependem de auth/contenttypes; as migrações continuam sendo
+# aplicadas com SchoolBuzzer.settings
+INSTALLED_APPS = [
+    'app',
+]
+
+MIDDLEWARE = []
+
+ROOT_URLCONF = 'SchoolBuzzer.urls_device'
+
+TEMPLATES = []
+
+LOGGING = {**LOGGING, 'root': {**LOGGING['root'], 'level': 'INFO'}}
+
+# Este perfil sempre roda ao lado do painel web: o cache precisa ser compartilhado
+SERVER_PROCESSES = max(SERVER_PROCESSES, 2)
@@ -0,0 +1,17 @@
+from django.urls import include, path
+
+from app.device_urls import device_urlpatterns
+
+"""
+ROTAS DO PERFIL "API DOS DISPOSITIVOS"
+
+DESCRIÇÃO:
+URLconf usada por SchoolBuzzer.settings_device: apenas as rotas consultadas pelos
+dispositivos ESP (app.device_urls.device_urlpatterns), no mesmo namespace 'app' e nos mesmos
+caminhos do URLconf completo, para que o firmware não precise de alterações. Não importa app.views
+(formulários, views genéricas e mensagens da interface web).
+"""
+
+urlpatterns = [
+		path('', include((device_urlpatterns, 'app'), namespace = 'app')),
+]
@@ -7,22 +7,79 @@ Configuração do painel administrativo do Django para gerenciamento dos dados d
 MODELOS REGISTRADOS:
 - AlarmSchedule: Agendamentos de toques
 - SirenStatus: Status atual da sirene
+- DeviceSirenState: Último acionamento de cada dispositivo (somente leitura)
 - ComandoESP: Comandos enviados para os dispositivos
 - Device: Dispositivos IoT cadastrados
+- SensorData, DeviceLog: Telemetria (changelists otimizadas para tabelas grandes)
+- RingEvent: Histórico de toques (somente leitura)
+- FirmwareRelease: Versões de firmware para OTA
 """
 
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+
 from .models import (
     AlarmSchedule, 
     SirenStatus, 
+    DeviceSirenState,
     ComandoESP,
     Device,
     Sensor,
     SensorData,
     DeviceConfig,
     DeviceLog,
-    GlobalConfig
+    GlobalConfig,
+    RingEvent,
+    FirmwareRelease
 )
+from .events import record_ring_event
+
+# A partir deste número de linhas o total exibido no admin passa a ser estimado
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+def estimated_row_count(model):
+    """
+    Estimativa barata do número de linhas da tabela, sem COUNT(*).
+
+    PostgreSQL: estatística do planejador (pg_class.reltuples); MySQL: information_schema;
+    SQLite: maior id (busca direta no índice da chave primária).
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s", [table]
+            )
+        else:
+            cursor.execute(f"SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) FROM {connection.ops.quote_name(table)}")
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginador que usa a contagem estimada quando a listagem não tem filtros"""
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class HighVolumeAdmin(admin.ModelAdmin):
+    """Base para tabelas de telemetria: sem COUNT(*) completo e sem N+1 nas FKs"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
 
 
 class AlarmScheduleAdmin(admin.ModelAdmin):
@@ -37,6 +94,12 @@ class SirenStatusAdmin(admin.ModelAdmin):
     list_display = ('is_on', 'last_activated')
     readonly_fields = ('last_activated',)
 
+class DeviceSirenStateAdmin(admin.ModelAdmin):
+    """Último acionamento por dispositivo (gravado em segundo plano por app/state.py)"""
+    list_display = ('device_id', 'last_activation', 'last_command_id', 'updated_at')
+    search_fields = ('device_id',)
+    readonly_fields = ('device_id', 'last_activation', 'last_command_id', 'updated_at')
+
 class ComandoESPAdmin(admin.ModelAdmin):
     """Configuração do admin para comandos"""
     list_display = ('comando', 'executado', 'timestamp', 'update',)
@@ -45,14 +108,88 @@ class ComandoESPAdmin(admin.ModelAdmin):
     date_hierarchy = 'timestamp'
     ordering = ('-timestamp',)
     search_fields = ('comando',)
+
+    def save_model(self, request, obj, form, change):
+        """Comandos de acionamento criados pelo admin entram no histórico de toques"""
+        if not change and obj.source == 'unknown':
+            obj.source = 'admin'
+        super().save_model(request, obj, form, change)
+        if not change and obj.comando == 'ligar':
+            record_ring_event(
+                source=RingEvent.Source.ADMIN,
+                outcome=RingEvent.Outcome.ISSUED,
+                command_id=obj.pk,
+                timestamp=obj.timestamp,
+            )
+
+class RingEventAdmin(HighVolumeAdmin):
+    """Histórico de toques: somente leitura (append-only)"""
+    list_display = ('timestamp', 'source', 'outcome', 'device_id', 'scheduled_at', 'ack_latency_ms')
+    list_filter = ('source', 'outcome')
+    date_hierarchy = 'timestamp'
+    ordering = ('-timestamp',)
+    search_fields = ('device_id',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
     
+class DeviceAdmin(admin.ModelAdmin):
+    """Dispositivos com versão de firmware e grupo de liberação"""
+    list_display = ('device_name', 'device_id', 'status', 'group', 'firmware_version', 'last_seen')
+    list_filter = ('status', 'group')
+    search_fields = ('device_id', 'device_name')
+
+class SensorAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sensor_type', 'value', 'timestamp')
+    list_filter = ('sensor_type',)
+    search_fields = ('name',)
+
+class SensorDataAdmin(HighVolumeAdmin):
+    """Leituras dos sensores (tabela de alto volume)"""
+    list_display = ('timestamp', 'device', 'sensor', 'value')
+    list_select_related = ('device', 'sensor')
+    list_filter = ('device',)
+    date_hierarchy = 'timestamp'
+    ordering = ('-timestamp',)
+    raw_id_fields = ('device', 'sensor')
+
+class DeviceLogAdmin(HighVolumeAdmin):
+    """Logs dos dispositivos (tabela de alto volume)"""
+    list_display = ('timestamp', 'device', 'log_message')
+    list_select_related = ('device',)
+    list_filter = ('device',)
+    date_hierarchy = 'timestamp'
+    ordering = ('-timestamp',)
+    raw_id_fields = ('device',)
+
+class DeviceConfigAdmin(admin.ModelAdmin):
+    list_display = ('device', 'send_interval', 'command_check_interval_ms', 'siren_max_duration_ms')
+    list_select_related = ('device',)
+    raw_id_fields = ('device',)
+
+class FirmwareReleaseAdmin(admin.ModelAdmin):
+    """Versões de firmware: o hash e o tamanho são calculados no envio do arquivo"""
+    list_display = ('version', 'rollout_percent', 'device_group', 'active', 'size', 'created_at')
+    list_editable = ('rollout_percent', 'active')
+    list_filter = ('active', 'device_group')
+    readonly_fields = ('sha256', 'size', 'created_at')
+
 # Registro dos modelos
 admin.site.register(AlarmSchedule, AlarmScheduleAdmin)
 admin.site.register(SirenStatus, SirenStatusAdmin)
+admin.site.register(DeviceSirenState, DeviceSirenStateAdmin)
 admin.site.register(ComandoESP, ComandoESPAdmin)
-admin.site.register(Device)
-admin.site.register(Sensor)
-admin.site.register(SensorData)
-admin.site.register(DeviceConfig)
-admin.site.register(DeviceLog)
-admin.site.register(GlobalConfig)
\ No newline at end of file
+admin.site.register(Device, DeviceAdmin)
+admin.site.register(Sensor, SensorAdmin)
+admin.site.register(SensorData, SensorDataAdmin)
+admin.site.register(DeviceConfig, DeviceConfigAdmin)
+admin.site.register(DeviceLog, DeviceLogAdmin)
+admin.site.register(GlobalConfig)
+admin.site.register(RingEvent, RingEventAdmin)
+admin.site.register(FirmwareRelease, FirmwareReleaseAdmin)
\ No newline at end of file
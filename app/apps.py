@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        # Registra os receptores de sinais (invalidação de cache) e as verificações do sistema
+        from . import checks, signals  # noqa: F401
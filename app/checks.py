@@ -0,0 +1,28 @@
+"""
+VERIFICAÇÕES DO SISTEMA (checks.py)
+
+DESCRIÇÃO:
+Verificações executadas pelo `manage.py check` (e comandos como runserver e migrate) e
+pelo mestre do Gunicorn antes de criar os workers (gunicorn.conf.py):
+- app.E001: LocMemCache com mais de um processo (SERVER_PROCESSES). O estado da sirene,
+  os comandos pendentes e as chaves de idempotência ficariam visíveis apenas no processo
+  que os gravou e os dispositivos atendidos por outro worker não tocariam
+"""
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    processes = getattr(settings, 'SERVER_PROCESSES', 1)
+    if processes <= 1 or settings.CACHES['default']['BACKEND'] != LOCMEM_BACKEND:
+        return []
+    return [Error(
+        f'O cache padrão é LocMemCache com {processes} processos (SERVER_PROCESSES).',
+        hint='Use um cache compartilhado entre os processos (FileBasedCache, Memcached ou Redis).',
+        obj='CACHES',
+        id='app.E001',
+    )]
@@ -0,0 +1,70 @@
+"""
+RELÓGIO DO SERVIDOR PARA OS DISPOSITIVOS
+
+DESCRIÇÃO:
+Informações de horário enviadas aos dispositivos ESP, para que eles usem exatamente o mesmo
+relógio e fuso horário (o fuso ativo do Django, TIME_ZONE por padrão) que o servidor usa ao
+comparar os agendamentos, sem depender de um servidor NTP externo a cada inicialização.
+
+CAMPOS:
+- epoch_ms: horário do servidor em ms desde a época Unix (UTC)
+- iso: horário local em ISO 8601 com milissegundos
+- timezone: nome do fuso horário (ex: America/Sao_Paulo)
+- utc_offset_s: deslocamento atual em relação ao UTC, em segundos (já inclui horário de verão)
+- dst: True se o horário de verão está em vigor
+- next_transition_ms: próxima mudança de deslocamento (horário de verão), ou None
+"""
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+from django.utils import timezone
+
+from .latency import epoch_ms
+
+TRANSITION_LOOKAHEAD_DAYS = 400
+
+
+@lru_cache(maxsize=8)
+def _next_transition(day, tz_name):
+    """
+    Procura a próxima mudança de deslocamento UTC a partir do dia informado, no fuso ativo
+    (tz_name é o nome dele e faz parte da chave do cache).
+
+    Avança dia a dia e refina por busca binária até o segundo. O resultado é guardado
+    por dia, de modo que o custo por requisição é desprezível.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz).astimezone(dt_timezone.utc)
+    offset = start.astimezone(tz).utcoffset()
+
+    # Aritmética feita em UTC: entre datetimes do mesmo fuso o Python ignora o deslocamento
+    previous = start
+    for days in range(1, TRANSITION_LOOKAHEAD_DAYS + 1):
+        candidate = start + timedelta(days=days)
+        if candidate.astimezone(tz).utcoffset() != offset:
+            low, high = int(previous.timestamp()), int(candidate.timestamp())
+            while high - low > 1:
+                middle = (low + high) // 2
+                if datetime.fromtimestamp(middle, tz).utcoffset() == offset:
+                    low = middle
+                else:
+                    high = middle
+            return high * 1000
+        previous = candidate
+    return None
+
+
+def clock_payload(now=None):
+    """Monta o bloco de horário do servidor (barato o bastante para toda resposta)"""
+    now = now or timezone.now()
+    local = timezone.localtime(now)
+    tz_name = timezone.get_current_timezone_name()
+    return {
+        'epoch_ms': epoch_ms(now),
+        'iso': local.isoformat(timespec='milliseconds'),
+        'timezone': tz_name,
+        'utc_offset_s': int(local.utcoffset().total_seconds()),
+        'dst': bool(local.dst()),
+        'next_transition_ms': _next_transition(local.date(), tz_name),
+    }
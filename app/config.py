@@ -0,0 +1,126 @@
+"""
+CONFIGURAÇÃO EFETIVA DOS DISPOSITIVOS
+
+DESCRIÇÃO:
+Monta a configuração de cada dispositivo (GlobalConfig com as substituições da sua
+DeviceConfig) e a mantém em um cache dentro do próprio processo, para que os intervalos de
+consulta e as durações da sirene possam ser ajustados centralmente sem regravar o firmware.
+
+FUNCIONAMENTO:
+- A versão da configuração é o último updated_at (ms) de GlobalConfig e DeviceConfig:
+  a mesma em todos os processos, crescente e preservada entre reinícios. Remoções
+  atualizam o updated_at das linhas restantes (ver touch_config)
+- A versão fica no cache do Django por CONFIG_VERSION_TIMEOUT e é descartada após o
+  commit de cada alteração (ver app/signals.py)
+- Cada processo guarda as configurações já calculadas (no máximo CONFIG_CACHE_SIZE
+  dispositivos, descartando as menos usadas) e as descarta quando a versão muda
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .latency import epoch_ms
+from .models import DeviceConfig, GlobalConfig
+
+CONFIG_VERSION_KEY = 'config:versao'
+CONFIG_VERSION_TIMEOUT = 30  # Atraso máximo para outro processo perceber uma alteração
+CONFIG_CACHE_SIZE = 500      # Configurações calculadas mantidas por processo
+
+# Campos de GlobalConfig que podem ser substituídos por dispositivo
+OVERRIDABLE_FIELDS = (
+    'schedule_check_interval_ms',
+    'command_check_interval_ms',
+    'siren_min_duration_ms',
+    'siren_max_duration_ms',
+)
+
+_local = {'version': None, 'configs': OrderedDict()}
+_lock = threading.Lock()
+
+
+def _version_from_database():
+    """Último updated_at (ms) das configurações; 1 enquanto nenhuma tiver sido gravada"""
+    latest = [
+        model.objects.aggregate(latest=Max('updated_at'))['latest']
+        for model in (GlobalConfig, DeviceConfig)
+    ]
+    latest = [value for value in latest if value is not None]
+    return epoch_ms(max(latest)) if latest else 1
+
+
+def config_version():
+    """Retorna a versão atual da configuração"""
+    version = cache.get(CONFIG_VERSION_KEY)
+    if version is None:
+        version = _version_from_database()
+        cache.set(CONFIG_VERSION_KEY, version, CONFIG_VERSION_TIMEOUT)
+    return version
+
+
+def bump_config_version():
+    """Invalida as configurações em cache: a versão é recalculada do banco após o commit"""
+    transaction.on_commit(lambda: cache.delete(CONFIG_VERSION_KEY))
+
+
+def touch_config():
+    """
+    Registra a remoção de uma configuração: as linhas restantes recebem um updated_at
+    novo, para que a versão continue crescendo
+    """
+    now = timezone.now()
+    if not GlobalConfig.objects.update(updated_at=now):
+        DeviceConfig.objects.update(updated_at=now)
+
+
+def _build_config(device_id):
+    """Mescla a configuração global com as substituições do dispositivo"""
+    global_config = GlobalConfig.objects.first() or GlobalConfig()
+    config = {
+        'data_refresh_interval': global_config.data_refresh_interval,
+        'send_interval': global_config.data_refresh_interval,
+        'temp_threshold': None,
+    }
+    for field in OVERRIDABLE_FIELDS:
+        value = getattr(global_config, field)
+        # Linhas criadas pelo código anterior à coluna ficam sem valor: usa o padrão
+        config[field] = GlobalConfig._meta.get_field(field).default if value is None else value
+
+    device_config = DeviceConfig.objects.filter(device__device_id=device_id).first() if device_id else None
+    if device_config:
+        config['send_interval'] = device_config.send_interval
+        config['temp_threshold'] = device_config.temp_threshold
+        for field in OVERRIDABLE_FIELDS:
+            value = getattr(device_config, field)
+            if value is not None:
+                config[field] = value
+    return config
+
+
+def effective_config(device_id=''):
+    """
+    Retorna (versão, configuração) do dispositivo.
+
+    O banco só é consultado na primeira chamada para o dispositivo após cada
+    alteração de configuração.
+    """
+    version = config_version()
+    with _lock:
+        if _local['version'] != version:
+            _local['version'] = version
+            _local['configs'] = OrderedDict()
+        config = _local['configs'].get(device_id)
+        if config is not None:
+            _local['configs'].move_to_end(device_id)
+    if config is None:
+        config = _build_config(device_id)
+        with _lock:
+            if _local['version'] == version:
+                _local['configs'][device_id] = config
+                if len(_local['configs']) > CONFIG_CACHE_SIZE:
+                    _local['configs'].popitem(last=False)
+    return version, config
@@ -0,0 +1,292 @@
+"""
+IMPLANTAÇÃO SEM INTERRUPÇÃO
+
+DESCRIÇÃO:
+Funções usadas pelo comando `implantar` e pelo gunicorn.conf.py para atualizar o sistema
+sem derrubar as consultas dos dispositivos nem perder um toque:
+- incompatible_operations: migrações pendentes que quebrariam os workers antigos,
+  que continuam atendendo enquanto o banco é migrado
+- ring_conflict: toque agendado próximo demais para trocar os workers
+- warm_caches: agenda do dia e templates carregados antes da primeira requisição
+- graceful_swap: troca do processo mestre do Gunicorn (USR2 + TERM)
+
+COMPATIBILIDADE DAS MIGRAÇÕES:
+Durante a implantação o código antigo roda sobre o esquema novo. São recusadas as
+operações que o código antigo não suporta: remoção/renomeação de campos e modelos,
+campos obrigatórios novos (os INSERTs antigos não informam a coluna), campos que deixam
+de aceitar nulo ou mudam de tipo e SQL arbitrário. Mudanças desse tipo devem ser feitas
+em duas implantações (primeiro adicionar/tornar opcional, depois remover).
+Com a revisão em execução (running_columns), só contam as tabelas e colunas que os
+modelos dessa revisão realmente declaram: remover uma coluna que o código antigo já não
+usa, por exemplo, é seguro.
+"""
+
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.db import migrations
+from django.template import TemplateDoesNotExist, engines
+
+from .schedule import today_schedule
+
+# Duração do minuto de um toque: os dispositivos o detectam em qualquer consulta dentro dele
+RING_MINUTE = timedelta(minutes=1)
+
+
+# Executado na cópia da revisão antiga: colunas declaradas pelos seus modelos
+_DUMP_COLUMNS = """
+import json, django
+django.setup()
+from django.apps import apps
+print(json.dumps({
+    model._meta.db_table: {field.column: field.null for field in model._meta.local_fields}
+    for model in apps.get_models(include_auto_created=True)
+}))
+"""
+
+
+def running_columns(revision, timeout=120):
+    """
+    Tabelas e colunas ({tabela: {coluna: aceita nulo}}) declaradas pelos modelos da
+    revisão git em execução. A revisão é extraída em um diretório temporário e seus
+    modelos carregados em outro processo Python, com o mesmo módulo de settings.
+    """
+    base_dir = Path(settings.BASE_DIR)
+    archive = subprocess.run(
+        ['git', 'archive', '--format=tar', revision],
+        cwd=base_dir, capture_output=True, check=True, timeout=timeout,
+    ).stdout
+    with tempfile.TemporaryDirectory() as directory:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(directory)
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'SchoolBuzzer.settings')
+        # `python -c` põe o diretório atual à frente do sys.path: carrega o código antigo
+        result = subprocess.run(
+            [sys.executable, '-c', _DUMP_COLUMNS],
+            cwd=directory, env=env, capture_output=True, text=True, timeout=timeout,
+        )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f'código de saída {result.returncode}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _table(state, app_label, model_name):
+    model = state.models[app_label, model_name.lower()]
+    return model.options.get('db_table') or f'{app_label}_{model.name_lower}'
+
+
+def _column(field, name):
+    field = field.clone()
+    field.set_attributes_from_name(name)
+    return field.column
+
+
+def _field_change(old, new, name):
+    """Motivo pelo qual a alteração de old para new quebra o código antigo (ou None)"""
+    if old.null and not new.null:
+        return 'campo passa a ser obrigatório (NOT NULL)'
+    if old.get_internal_type() != new.get_internal_type():
+        return f'tipo alterado ({old.get_internal_type()} → {new.get_internal_type()})'
+    if old.max_length and new.max_length and new.max_length < old.max_length:
+        return f'tamanho reduzido ({old.max_length} → {new.max_length})'
+    if _column(old, name) != _column(new, name):
+        return 'coluna renomeada'
+    return None
+
+
+def _operation_problem(operation, app_label, state, running):
+    def used(table, column=None):
+        """O código em execução usa a tabela (e a coluna)? Sem running, supõe que sim"""
+        if running is None:
+            return True
+        columns = running.get(table)
+        return columns is not None and (column is None or column in columns)
+
+    if isinstance(operation, migrations.RunSQL):
+        return 'SQL arbitrário (não verificável)'
+    if isinstance(operation, (migrations.DeleteModel, migrations.RenameModel, migrations.AlterModelTable)):
+        name = operation.old_name if isinstance(operation, migrations.RenameModel) else operation.name
+        if not used(_table(state, app_label, name)):
+            return None
+        if isinstance(operation, migrations.DeleteModel):
+            return 'remoção: o código antigo ainda usa a tabela'
+        return 'renomeação: o código antigo ainda usa o nome anterior'
+    if not isinstance(operation, (migrations.RemoveField, migrations.RenameField,
+                                  migrations.AddField, migrations.AlterField)):
+        return None
+
+    table = _table(state, app_label, operation.model_name)
+    fields = state.models[app_label, operation.model_name_lower].fields
+    if isinstance(operation, migrations.RemoveField):
+        if used(table, _column(fields[operation.name], operation.name)):
+            return 'remoção: o código antigo ainda usa a coluna'
+    elif isinstance(operation, migrations.RenameField):
+        if used(table, _column(fields[operation.old_name], operation.old_name)):
+            return 'renomeação: o código antigo ainda usa o nome anterior'
+    elif isinstance(operation, migrations.AddField):
+        field = operation.field
+        inserted = running is None or (used(table) and not used(table, _column(field, operation.name)))
+        if not field.null and not field.many_to_many and inserted:
+            return 'campo obrigatório novo: INSERTs do código antigo falhariam (use null=True)'
+    else:
+        old = fields.get(operation.name)
+        if old is not None and used(table, _column(old, operation.name)):
+            return _field_change(old, operation.field, operation.name)
+    return None
+
+
+def _state_operations(operations):
+    """Operações como o esquema as vê: SeparateDatabaseAndState vale pelo seu estado"""
+    for operation in operations:
+        if isinstance(operation, migrations.SeparateDatabaseAndState):
+            yield from _state_operations(operation.state_operations)
+        else:
+            yield operation
+
+
+def incompatible_operations(plan, loader, running=None):
+    """
+    Lista (migração, operação, motivo) das operações do plano de migração que
+    quebrariam os workers em execução. Reversões de migração são sempre recusadas.
+
+    running: colunas declaradas pelo código em execução (ver running_columns). Sem ele,
+    toda remoção, renomeação e campo obrigatório novo é tratado como incompatível.
+    """
+    problems = []
+    for migration, backwards in plan:
+        if backwards:
+            problems.append((migration, None, 'reversão de migração'))
+            continue
+        state = loader.project_state((migration.app_label, migration.name), at_end=False)
+        for operation in _state_operations(migration.operations):
+            reason = _operation_problem(operation, migration.app_label, state, running)
+            if reason:
+                problems.append((migration, operation, reason))
+            operation.state_forwards(migration.app_label, state)
+    return problems
+
+
+def ring_conflict(now, alarms, window_s):
+    """
+    Retorna (agendamento, horário do toque) se now estiver a menos de window_s segundos
+    do minuto de algum toque do dia; None se for seguro reiniciar.
+    """
+    window = timedelta(seconds=window_s)
+    for alarm in alarms:
+        ring_at = now.replace(hour=alarm.time.hour, minute=alarm.time.minute, second=0, microsecond=0)
+        if ring_at - window <= now < ring_at + RING_MINUTE + window:
+            return alarm, ring_at
+    return None
+
+
+def safe_after(ring_at, window_s):
+    """Primeiro instante seguro depois do toque"""
+    return ring_at + RING_MINUTE + timedelta(seconds=window_s)
+
+
+def warm_caches():
+    """Carrega a agenda do dia e compila os templates do projeto"""
+    today_schedule()
+    for engine in engines.all():
+        for directory in getattr(engine, 'dirs', []):
+            for path in Path(directory).rglob('*.html'):
+                try:
+                    engine.get_template(path.relative_to(directory).as_posix())
+                except TemplateDoesNotExist:
+                    pass
+
+
+def read_pid(pidfile):
+    try:
+        return int(Path(pidfile).read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _healthy(url):
+    try:
+        with urlopen(url, timeout=2) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _terminate(pid):
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def graceful_swap(pidfile, health_url=None, timeout=60, poll=0.5):
+    """
+    Troca os workers do Gunicorn sem derrubar requisições em andamento:
+    1. USR2 no mestre atual: um novo mestre é iniciado com o código novo (a aplicação é
+       pré-carregada e os caches aquecidos antes de criar os workers). Enquanto o antigo
+       existir, o novo grava seu PID em `<pidfile>.2`
+    2. aguarda o novo mestre gravar `<pidfile>.2` e, se informado, health_url responder 200
+    3. TERM no mestre antigo: ele para de aceitar conexões e encerra os workers após
+       concluírem as requisições em andamento (graceful_timeout)
+    4. aguarda o novo mestre assumir o pidfile (ele renomeia `<pidfile>.2` quando percebe
+       que o antigo encerrou)
+
+    Retorna (pid antigo, pid novo). Levanta RuntimeError se o novo mestre não subir; nesse
+    caso ele recebe TERM e o mestre antigo continua atendendo.
+    """
+    old_pid = read_pid(pidfile)
+    if old_pid is None:
+        raise RuntimeError(f'pidfile {pidfile} não encontrado: o Gunicorn está em execução?')
+
+    new_pidfile = f'{pidfile}.2'
+    os.kill(old_pid, signal.SIGUSR2)
+    deadline = time.monotonic() + timeout
+    new_pid = None
+    while time.monotonic() < deadline:
+        pid = read_pid(new_pidfile)
+        if pid and pid != old_pid:
+            if not _alive(pid):
+                raise RuntimeError(f'O novo mestre {pid} encerrou ao iniciar; mantido o mestre {old_pid}')
+            if health_url is None or _healthy(health_url):
+                new_pid = pid
+                break
+        time.sleep(poll)
+
+    if new_pid is None:
+        pid = read_pid(new_pidfile)
+        if pid and pid != old_pid:
+            _terminate(pid)
+        raise RuntimeError(f'O novo mestre não ficou pronto em {timeout} s; mantido o mestre {old_pid}')
+
+    os.kill(old_pid, signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if read_pid(pidfile) == new_pid:
+            return old_pid, new_pid
+        time.sleep(poll)
+    raise RuntimeError(
+        f'O mestre antigo {old_pid} recebeu TERM, mas o novo mestre {new_pid} não assumiu '
+        f'{pidfile} em {timeout} s'
+    )
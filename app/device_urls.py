@@ -0,0 +1,33 @@
+"""
+ROTAS DA API DOS DISPOSITIVOS ESP
+
+DESCRIÇÃO:
+Rotas consultadas pelos dispositivos ESP, incluídas em app.urls e servidas sozinhas pelo
+perfil SchoolBuzzer.settings_device (SchoolBuzzer/urls_device.py). Importa apenas
+app.device_views, sem as views da interface web.
+"""
+
+from django.urls import path
+from .device_views import (
+	comando_esp,
+	server_time,
+	device_config,
+	check_command,
+	confirm_command,
+	ota_check,
+	ota_download,
+	isUpdate,
+	updateConfirm,
+	)
+
+device_urlpatterns = [
+		path('api/comando', comando_esp, name = 'comando-esp'),
+		path('api/tempo', server_time, name = 'server-time'),
+		path('api/config', device_config, name = 'device-config'),
+		path('check_command/', check_command, name='check_command'),
+		path('confirm_command/', confirm_command, name='confirm_command'),
+		path('ota/verificar', ota_check, name = 'ota-check'),
+		path('ota/firmware/<str:version>', ota_download, name = 'ota-download'),
+		path('isUpdate/', isUpdate, name='isUpdate'),
+		path('updateConfirm/', updateConfirm, name = 'updateConfirm'),
+		]
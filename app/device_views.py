@@ -0,0 +1,401 @@
+"""
+VIEWS DA API DOS DISPOSITIVOS ESP
+
+DESCRIÇÃO:
+Endpoints consultados pelos dispositivos (firmware OTA - ESP/ESP8266_Code.ino). Ficam
+separados de app/views.py para que o perfil SchoolBuzzer.settings_device (ver
+SchoolBuzzer/urls_device.py) não importe formulários, views genéricas e mensagens da
+interface web. app/views.py reexporta estas views.
+
+ENDPOINTS:
+- /api/comando: Agendamentos e comando manual pendente
+- /api/tempo: Horário do servidor para sincronização dos dispositivos
+- /api/config: Configuração efetiva do dispositivo (intervalos e durações)
+- /check_command/ e /confirm_command/: Comando manual pendente e sua confirmação
+- /ota/verificar, /ota/firmware/<versão>: Distribuição de firmware com liberação gradual
+- /isUpdate/ e /updateConfirm/: Sinal de modo de atualização
+"""
+
+
+# ========================================================
+# IMPORTAÇÕES
+# ========================================================
+
+import json
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+
+from .clock import clock_payload
+from .config import config_version, effective_config
+from .events import record_ring_event
+from .latency import delta_ms, epoch_ms, from_epoch_ms
+from .models import ComandoESP, FirmwareRelease, RingEvent
+from .ota import report_version, serve_release, target_release
+from .polling import load_factor, load_meter, next_poll_ms
+from .schedule import next_alarm, schedule_version, today_schedule, weekday_code
+from .state import current_state, record_device_activation
+
+logger = logging.getLogger(__name__)
+
+# activated_at mais distante que isso do horário do servidor vem de um relógio não
+# sincronizado (ex: NTP sem resposta, 1970) e é descartado
+ACTIVATION_CLOCK_SKEW = timedelta(days=1)
+
+
+def _device_id(request):
+    """Identificação opcional do dispositivo (cabeçalho X-Device-Id ou parâmetro device_id)"""
+    return (request.headers.get('X-Device-Id') or request.GET.get('device_id') or '')[:100]
+
+
+def _record_scheduled_ring(alarm, scheduled_at, now, device_id):
+    """Registra o toque agendado apenas na primeira consulta do minuto (por dispositivo)"""
+    key = f'toque:{alarm.pk}:{device_id}:{scheduled_at.isoformat()}'
+    if cache.add(key, True, 120):
+        record_ring_event(
+            source=RingEvent.Source.SCHEDULE,
+            outcome=RingEvent.Outcome.ISSUED,
+            device_id=device_id,
+            scheduled_at=scheduled_at,
+            timestamp=now,
+        )
+
+
+
+# ========================================================
+# ENDPOINT PRINCIPAL PARA CONSULTA DA ESP
+# ========================================================
+
+@csrf_exempt
+def comando_esp(request):
+    """
+    Endpoint que retorna JSON com o comando 'ligar' ou 'desligar' baseado no
+    horário atual e na presença de agendamento ou comando manual.
+
+    Retorna:
+    - current_time: hora atual formatada
+    - current_day: dia da semana
+    - should_activate: True se deve ativar a sirene
+    - is_scheduled: True se é por agendamento (não manual)
+    - sirene_status: status atual da sirene
+    - next_alarm: horário do próximo alarme (se houver)
+    - issued_at_ms: instante da resposta (ms desde a época Unix)
+    - expected_at_ms: instante esperado do toque agendado (se houver)
+    - server_time: relógio do servidor usado na comparação (ver app/clock.py)
+    - config_version: versão da configuração; se mudar, o dispositivo consulta /api/config
+    - schedule_version: versão da agenda (muda a cada inclusão, alteração ou remoção)
+    - next_poll_ms: quando fazer a próxima consulta (ver app/polling.py); até o próximo
+      toque se o dispositivo informar o parâmetro schedule_version (ele acompanha a versão
+      pelas respostas de check_command)
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    load_meter.hit()
+    try:
+        now = timezone.localtime(timezone.now())
+        weekday_pt = weekday_code(now)
+        current_time = now.time()
+
+        # Alarmes válidos para hoje (agenda em cache)
+        agendamentos = today_schedule(now)
+
+        # Verifica se há alarme para o horário atual
+        alarme_atual = next(
+            (ag for ag in agendamentos
+             if ag.time.hour == current_time.hour and ag.time.minute == current_time.minute),
+            None
+        )
+        should_activate = alarme_atual is not None
+        expected_at = None
+        if should_activate:
+            expected_at = now.replace(
+                hour=alarme_atual.time.hour, minute=alarme_atual.time.minute, second=0, microsecond=0
+            )
+            _record_scheduled_ring(alarme_atual, expected_at, now, _device_id(request))
+
+        # Comando manual pendente e status da sirene (estado em memória, sem banco)
+        estado = current_state()
+        manual_pending = estado.command == 'ligar'
+
+        response_data = {
+            'current_time': now.strftime('%H:%M'),
+            'current_day': weekday_pt,
+            'should_activate': should_activate or manual_pending,
+            'is_scheduled': should_activate and not manual_pending,
+            'sirene_status': estado.siren_on,
+            'next_alarm': None,
+            'issued_at_ms': epoch_ms(now),
+            'expected_at_ms': epoch_ms(expected_at) if expected_at else None,
+            'server_time': clock_payload(now),
+            'config_version': config_version(),
+            'schedule_version': schedule_version(),
+            'next_poll_ms': next_poll_ms(
+                now, agendamentos, None,
+                pending_command=manual_pending, factor=load_factor(),
+                follows_version='schedule_version' in request.GET,
+            ),
+        }
+
+        # Próximo alarme após o horário atual
+        proximo = next_alarm(agendamentos, current_time)
+        if proximo:
+            response_data['next_alarm'] = proximo.time.strftime('%H:%M')
+
+        return JsonResponse(response_data)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+# ========================================================
+# HORÁRIO DO SERVIDOR (SINCRONIZAÇÃO DOS DISPOSITIVOS)
+# ========================================================
+
+def server_time(request):
+    """
+    Retorna o horário do servidor (ver app/clock.py) sem consultar o banco de dados.
+
+    Se o dispositivo enviar t0 (seu próprio relógio, em ms), o valor é devolvido junto com
+    received_ms e sent_ms, permitindo estimar o atraso de rede como no NTP.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    received = timezone.now()
+    response_data = clock_payload(received)
+    response_data['received_ms'] = epoch_ms(received)
+    if request.GET.get('t0', '').isdigit():
+        response_data['t0'] = int(request.GET['t0'])
+    response_data['sent_ms'] = epoch_ms(timezone.now())
+    return JsonResponse(response_data)
+
+# ========================================================
+# CONFIGURAÇÃO DOS DISPOSITIVOS
+# ========================================================
+
+def device_config(request):
+    """
+    Retorna a configuração efetiva do dispositivo (GlobalConfig + DeviceConfig).
+
+    Se o dispositivo enviar version igual à atual, responde apenas {'changed': False},
+    poupando a transferência da configuração completa.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    version, config = effective_config(_device_id(request))
+    if request.GET.get('version') == str(version):
+        return JsonResponse({'changed': False, 'version': version})
+    return JsonResponse({'changed': True, 'version': version, 'config': config})
+
+
+# ========================================================
+# VERIFICAÇÃO DO COMANDO PENDENTE PARA A ESP
+# ========================================================
+
+@csrf_exempt
+def check_command(request):
+    """
+    Retorna o comando atual ("ligar" ou "desligar") para a ESP.
+
+    next_poll_ms indica quando consultar novamente: o intervalo configurado para o
+    dispositivo, ampliado sob carga (ver app/polling.py). schedule_version e
+    config_version permitem ao dispositivo consultar a agenda e a configuração só quando
+    mudam.
+    """
+    load_meter.hit()
+    now = timezone.localtime(timezone.now())
+    estado = current_state()
+    version, config = effective_config(_device_id(request))
+    versions = {'schedule_version': schedule_version(), 'config_version': version}
+
+    if estado.command != 'ligar':
+        return JsonResponse({
+            'command': 'desligar',
+            'server_time': clock_payload(now),
+            **versions,
+            'next_poll_ms': next_poll_ms(
+                now, (), config['command_check_interval_ms'], factor=load_factor()
+            ),
+        })
+
+    return JsonResponse({
+        'command': 'ligar',
+        'source': estado.source or 'manual',
+        'id': str(estado.command_id),
+        'issued_at_ms': estado.issued_at_ms,
+        'expected_at_ms': estado.issued_at_ms,
+        'server_time': clock_payload(now),
+        **versions,
+        'next_poll_ms': next_poll_ms(now, (), None, pending_command=True),
+    })
+
+# ========================================================
+# CONFIRMAÇÃO DE EXECUÇÃO DO COMANDO PELA ESP
+# ========================================================
+
+def _activated_at(data, now):
+    """
+    Horário de acionamento informado pela ESP (ms desde a época ou ISO); padrão: agora.
+    Retorna None se o relógio da ESP estiver fora de ACTIVATION_CLOCK_SKEW.
+    """
+    valor = data.get('activated_at')
+    if valor in (None, ''):
+        return now
+    if isinstance(valor, (int, float)) or str(valor).isdigit():
+        momento = from_epoch_ms(valor)
+    else:
+        momento = parse_datetime(str(valor))
+        if momento is None:
+            raise ValueError(f"activated_at inválido: {valor}")
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+    if abs(momento - now) > ACTIVATION_CLOCK_SKEW:
+        logger.warning("activated_at descartado (relógio da ESP fora de sincronia): %s", valor)
+        return None
+    return momento
+
+
+@csrf_exempt
+def confirm_command(request):
+    """
+    Endpoint chamado pela ESP para confirmar execução do comando.
+    Reseta o comando para 'desligar'.
+
+    Corpo JSON opcional:
+    - activated_at: instante real do acionamento (ms desde a época Unix); null ou um
+      horário a mais de um dia do servidor (relógio não sincronizado) é ignorado
+    - device_id: identificação do dispositivo (alternativa ao cabeçalho X-Device-Id)
+    - source: 'schedule' para confirmar um toque agendado, junto de scheduled_at (ms)
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body or b'{}')
+            if not isinstance(data, dict):
+                data = {}
+        except ValueError:
+            data = {}
+
+        now = timezone.now()
+        device_id = (data.get('device_id') or _device_id(request))[:100]
+        try:
+            activated_at = _activated_at(data, now)
+            scheduled_at = None
+            if data.get('source') == RingEvent.Source.SCHEDULE:
+                if not str(data.get('scheduled_at', '')).isdigit():
+                    raise ValueError('scheduled_at obrigatório')
+                scheduled_at = from_epoch_ms(data['scheduled_at'])
+        except (ValueError, OverflowError, OSError) as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+        # Toque agendado: apenas registra o atraso, não há comando a resetar
+        if scheduled_at is not None:
+            if device_id:
+                record_device_activation(device_id, activated_at or now)
+            record_ring_event(
+                source=RingEvent.Source.SCHEDULE,
+                outcome=RingEvent.Outcome.CONFIRMED,
+                device_id=device_id,
+                timestamp=now,
+                scheduled_at=scheduled_at,
+                activated_at=activated_at,
+                lateness_ms=delta_ms(activated_at, scheduled_at) if activated_at else None,
+            )
+            return JsonResponse({'status': 'success'})
+
+        comando = ComandoESP.objects.first()
+        if comando:
+            if comando.comando == 'ligar':
+                if device_id:
+                    record_device_activation(device_id, activated_at or now, comando.pk)
+                source = comando.source if comando.source in RingEvent.Source.values else RingEvent.Source.UNKNOWN
+                record_ring_event(
+                    source=source,
+                    outcome=RingEvent.Outcome.CONFIRMED,
+                    device_id=device_id,
+                    command_id=comando.pk,
+                    timestamp=now,
+                    ack_latency_ms=delta_ms(now, comando.timestamp),
+                    activated_at=activated_at,
+                    lateness_ms=delta_ms(activated_at, comando.timestamp) if activated_at else None,
+                )
+            comando.comando = 'desligar'
+            comando.save()
+        return JsonResponse({'status': 'success'})
+
+    return JsonResponse({'status': 'error'}, status=400)
+
+
+# ========================================================
+# DISTRIBUIÇÃO DE FIRMWARE (OTA)
+# ========================================================
+
+def ota_check(request):
+    """
+    Consulta do dispositivo por uma nova versão de firmware.
+
+    Parâmetros (GET): device_id e version (versão atualmente instalada).
+    A versão informada é registrada no cadastro do dispositivo.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    device_id = _device_id(request)
+    if not device_id:
+        return JsonResponse({'error': 'device_id obrigatório'}, status=400)
+    current_version = request.GET.get('version', '')[:30]
+
+    group = report_version(device_id, current_version)
+    release = target_release(device_id, current_version, group)
+    if release is None:
+        return JsonResponse({'update': False, 'version': current_version})
+
+    return JsonResponse({
+        'update': True,
+        'version': release.version,
+        'url': request.build_absolute_uri(reverse('app:ota-download', args=[release.version])),
+        'sha256': release.sha256,
+        'size': release.size,
+    })
+
+
+def ota_download(request, version):
+    """Entrega o binário de uma versão ativa (com suporte a ETag e Range)"""
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    release = FirmwareRelease.objects.filter(version=version, active=True).first()
+    if release is None:
+        raise Http404("Versão de firmware não encontrada")
+    return serve_release(request, release)
+
+# ========================================================
+# SINAL DE MODO DE ATUALIZAÇÃO
+# ========================================================
+
+def isUpdate(request):
+    if request.method == 'GET':
+        estado = current_state()
+        if estado.command_id is not None:
+            return JsonResponse({'update': estado.update_mode})
+        else:
+            return JsonResponse({'error': 'Nenhum comando encontrado'}, status=404)
+    return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+@csrf_exempt
+def updateConfirm(request):
+	if request.method == 'POST':
+		comando = ComandoESP.objects.first()
+		if comando:
+			comando.update = 'modoNormal'
+			comando.save()
+			return JsonResponse({'status': 'success'})
+		else:
+			return JsonResponse({'error': 'Nenhum comando encontrado'}, status=404)
+	return JsonResponse({'error': 'Método não permitido'}, status=405)
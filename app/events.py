@@ -0,0 +1,106 @@
+"""
+REGISTRO DE EVENTOS DE TOQUE (ESCRITA EM LOTE)
+
+DESCRIÇÃO:
+Gravação assíncrona e em lote dos eventos de toque (modelo RingEvent), para que as views
+chamadas pelos dispositivos ESP não esperem por um INSERT a cada requisição.
+
+FUNCIONAMENTO:
+- record_ring_event() apenas monta o objeto e o coloca em uma fila em memória
+- Uma thread de fundo grava a fila com bulk_create a cada RING_EVENT_FLUSH_INTERVAL
+  segundos ou quando RING_EVENT_BATCH_SIZE eventos se acumulam
+- Se o INSERT em lote falhar, os eventos do lote são gravados um a um e só as linhas
+  inválidas são descartadas (com registro no log)
+- Com RING_EVENT_ASYNC = False (ex: testes) o evento é gravado imediatamente
+- Eventos pendentes são gravados ao encerrar o processo (atexit)
+"""
+
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import RingEvent
+
+logger = logging.getLogger(__name__)
+
+
+class RingEventWriter:
+    """Fila de eventos de toque gravada em lote por uma thread de fundo"""
+
+    def __init__(self, batch_size=100, flush_interval=2.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def record(self, event):
+        """Enfileira um evento (RingEvent ainda não salvo)"""
+        self._queue.put(event)
+        self._ensure_thread()
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Grava imediatamente todos os eventos pendentes"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            try:
+                RingEvent.objects.bulk_create(chunk)
+            except Exception:
+                logger.warning("Falha ao gravar %d eventos de toque em lote; gravando um a um",
+                               len(chunk), exc_info=True)
+                self._save_each(chunk)
+        return len(batch)
+
+    def _save_each(self, events):
+        """Grava os eventos individualmente: uma linha inválida não descarta o lote"""
+        for event in events:
+            try:
+                RingEvent.objects.bulk_create([event])
+            except Exception:
+                logger.exception("Evento de toque descartado: %s/%s de %r em %s",
+                                 event.source, event.outcome, event.device_id, event.timestamp)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ring-event-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+writer = RingEventWriter(
+    batch_size=getattr(settings, 'RING_EVENT_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'RING_EVENT_FLUSH_INTERVAL', 2.0),
+)
+atexit.register(writer.flush)
+
+
+def record_ring_event(**fields):
+    """Registra um evento de toque (em lote, ou imediatamente se RING_EVENT_ASYNC = False)"""
+    event = RingEvent(**fields)
+    if getattr(settings, 'RING_EVENT_ASYNC', True):
+        writer.record(event)
+    else:
+        RingEvent.objects.bulk_create([event])
+    return event
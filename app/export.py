@@ -0,0 +1,62 @@
+"""
+EXPORTAÇÃO EM MASSA DAS LEITURAS DE SENSORES
+
+DESCRIÇÃO:
+Serialização de SensorData para grandes volumes sem consultas por linha (N+1):
+- os nomes do sensor e do dispositivo vêm na mesma consulta (JOIN via values())
+- as linhas são lidas do banco em blocos com iterator(chunk_size=...)
+- a saída é gerada aos poucos (NDJSON ou array JSON) para StreamingHttpResponse
+
+O consumo de memória é constante, independente do número de leituras exportadas.
+As chaves de cada linha são as mesmas de SensorData.to_dict().
+"""
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+# Quantidade de linhas serializadas por bloco de bytes enviado ao cliente
+LINES_PER_WRITE = 200
+
+_encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def sensor_data_rows(queryset, chunk_size=2000):
+    """
+    Gera dicionários equivalentes a SensorData.to_dict() a partir de um queryset,
+    com uma única consulta (lida em blocos de chunk_size linhas).
+    """
+    rows = (
+        queryset
+        .order_by('timestamp', 'pk')
+        .values('value', 'timestamp', sensor_name=F('sensor__name'), device_name=F('device__device_name'))
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        row['timestamp'] = row['timestamp'].isoformat()
+        yield row
+
+
+def _batched(lines):
+    """Agrupa linhas já serializadas em blocos para reduzir o número de escritas"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= LINES_PER_WRITE:
+            yield ''.join(batch).encode()
+            batch = []
+    if batch:
+        yield ''.join(batch).encode()
+
+
+def iter_ndjson(rows):
+    """Uma linha JSON por registro (application/x-ndjson)"""
+    return _batched(_encoder.encode(row) + '\n' for row in rows)
+
+
+def iter_json_array(rows):
+    """Array JSON gerado incrementalmente: [{...},{...}]"""
+    def lines():
+        yield '['
+        for index, row in enumerate(rows):
+            yield (',' if index else '') + _encoder.encode(row)
+        yield ']'
+    return _batched(lines())
@@ -0,0 +1,109 @@
+"""
+LATÊNCIA DOS TOQUES (AGENDAMENTO → CONFIRMAÇÃO DO DISPOSITIVO)
+
+DESCRIÇÃO:
+Cálculo de histogramas e percentis do atraso dos toques, a partir do campo lateness_ms
+do histórico de toques (RingEvent). O atraso é a diferença entre o horário em que o
+dispositivo informa ter acionado a sirene e o horário esperado (minuto agendado ou
+emissão do comando manual).
+
+UTILIZADO POR:
+- View latency_report (/api/latencia)
+- Comando de gerenciamento relatorio_latencia
+"""
+
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+# Limites superiores (ms) das faixas do histograma; a última faixa é "acima de 60000"
+LATENCY_BUCKETS_MS = (500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+# Maior diferença gravada em RingEvent (IntegerField de 32 bits)
+MAX_DELTA_MS = 2**31 - 1
+
+
+def p95_threshold_ms():
+    """Atraso p95 máximo aceitável antes de um dispositivo ser sinalizado"""
+    return getattr(settings, 'RING_LATENCY_P95_THRESHOLD_MS', 10000)
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def epoch_ms(moment):
+    """Converte um datetime (com fuso) para milissegundos desde a época Unix"""
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+
+def from_epoch_ms(value):
+    """Converte milissegundos desde a época Unix para datetime (UTC)"""
+    return EPOCH + timedelta(milliseconds=int(value))
+
+
+def delta_ms(later, earlier):
+    """
+    Diferença entre dois instantes em milissegundos inteiros, limitada a MAX_DELTA_MS
+    (os campos de latência de RingEvent são IntegerField de 32 bits)
+    """
+    delta = (later - earlier) // timedelta(milliseconds=1)
+    return max(-MAX_DELTA_MS, min(MAX_DELTA_MS, delta))
+
+
+def percentile(sorted_values, pct):
+    """Percentil pelo método do posto mais próximo (lista já ordenada)"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def histogram(values):
+    """Conta os valores em cada faixa de LATENCY_BUCKETS_MS"""
+    labels = [f'<={limite}' for limite in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}']
+    counts = dict.fromkeys(labels, 0)
+    for value in values:
+        for limite, label in zip(LATENCY_BUCKETS_MS, labels):
+            if value <= limite:
+                counts[label] += 1
+                break
+        else:
+            counts[labels[-1]] += 1
+    return counts
+
+
+def summarize(values):
+    """Estatísticas de uma série de atrasos (ms)"""
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'p50_ms': percentile(ordered, 50),
+        'p95_ms': percentile(ordered, 95),
+        'max_ms': ordered[-1] if ordered else None,
+        'histogram': histogram(ordered),
+    }
+
+
+def latency_report(events, threshold_ms=None):
+    """
+    Monta o relatório de atraso por dispositivo e por origem.
+
+    Recebe um queryset de RingEvent (já filtrado por período) e executa uma única
+    consulta. Dispositivos com p95 acima de threshold_ms são listados em 'flagged'.
+    """
+    threshold_ms = p95_threshold_ms() if threshold_ms is None else threshold_ms
+    por_dispositivo, por_origem = {}, {}
+
+    linhas = events.filter(lateness_ms__isnull=False).values_list('device_id', 'source', 'lateness_ms')
+    for device_id, source, lateness in linhas.iterator():
+        por_dispositivo.setdefault(device_id or '-', []).append(lateness)
+        por_origem.setdefault(source, []).append(lateness)
+
+    devices = {device: summarize(values) for device, values in sorted(por_dispositivo.items())}
+    return {
+        'threshold_ms': threshold_ms,
+        'devices': devices,
+        'sources': {source: summarize(values) for source, values in sorted(por_origem.items())},
+        'flagged': [device for device, stats in devices.items() if stats['p95_ms'] > threshold_ms],
+    }
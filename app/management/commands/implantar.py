@@ -0,0 +1,153 @@
+"""
+COMANDO: implantar
+
+DESCRIÇÃO:
+Atualiza o sistema em produção sem interromper os dispositivos (substitui o
+`systemctl restart` do update.sh):
+1. verifica se os modelos têm migrações geradas (makemigrations não roda em produção)
+2. lista as migrações pendentes e recusa as incompatíveis com o código em execução
+   (ver app/deploy.py); com --revisao-anterior, a comparação usa os modelos dessa
+   revisão git em vez de recusar toda remoção
+3. recusa a implantação perto de um toque agendado (DEPLOY_RING_WINDOW_S)
+4. aplica as migrações com os workers antigos ainda atendendo e executa collectstatic
+5. troca os workers do Gunicorn graciosamente (USR2 + TERM) para cada pidfile
+   informado; os novos workers já iniciam com a agenda e os templates carregados
+
+USO:
+    python manage.py implantar [--verificar] [--aguardar] [--revisao-anterior REV]
+                               [--pidfile run/web.pid ...]
+
+Sem --pidfile são usados os de DEPLOY_PIDFILES.
+"""
+
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+from app.deploy import (
+    graceful_swap, incompatible_operations, ring_conflict, running_columns, safe_after,
+)
+from app.schedule import today_schedule
+
+
+class Command(BaseCommand):
+    help = "Migra o banco e troca os workers do Gunicorn sem interromper os dispositivos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='Apenas verifica migrações e janela de toque, sem alterar nada')
+        parser.add_argument('--aguardar', action='store_true',
+                            help='Espera o fim da janela de um toque em vez de recusar')
+        parser.add_argument('--forcar', action='store_true',
+                            help='Ignora a janela de toque')
+        parser.add_argument('--permitir-incompativel', action='store_true',
+                            help='Aplica migrações incompatíveis com os workers em execução')
+        parser.add_argument('--revisao-anterior', default=None,
+                            help='Revisão git em execução, usada para verificar as migrações')
+        parser.add_argument('--janela-segundos', type=int, default=None,
+                            help='Janela antes/depois de cada toque (padrão: DEPLOY_RING_WINDOW_S)')
+        parser.add_argument('--pidfile', action='append', dest='pidfiles',
+                            help='pidfile do mestre Gunicorn (pode ser repetido)')
+        parser.add_argument('--url-saude', default=None,
+                            help='URL que deve responder 200 antes de encerrar o mestre antigo')
+
+    def handle(self, *args, **options):
+        window_s = options['janela_segundos']
+        if window_s is None:
+            window_s = getattr(settings, 'DEPLOY_RING_WINDOW_S', 120)
+        pidfiles = options['pidfiles'] or getattr(settings, 'DEPLOY_PIDFILES', [])
+
+        self._check_models()
+        plan = self._check_migrations(options['permitir_incompativel'], options['revisao_anterior'])
+        self._check_ring_window(window_s, options)
+
+        if options['verificar']:
+            self.stdout.write(self.style.SUCCESS("Verificação concluída; nada foi alterado."))
+            return
+
+        if plan:
+            self.stdout.write("Aplicando migrações (workers antigos continuam atendendo)...")
+            call_command('migrate', interactive=False, verbosity=1)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        if not pidfiles:
+            self.stdout.write(self.style.WARNING(
+                "Nenhum pidfile do Gunicorn informado (DEPLOY_PIDFILES): workers não reiniciados."
+            ))
+            return
+
+        # A migração pode ter demorado: confere a janela outra vez antes da troca
+        self._check_ring_window(window_s, options)
+        for pidfile in pidfiles:
+            try:
+                old_pid, new_pid = graceful_swap(pidfile, options['url_saude'])
+            except (RuntimeError, OSError) as e:
+                raise CommandError(f"{pidfile}: {e}")
+            self.stdout.write(f"{pidfile}: mestre {old_pid} substituído por {new_pid}")
+        self.stdout.write(self.style.SUCCESS("Implantação concluída sem reinício do serviço."))
+
+    def _check_models(self):
+        """Falha se houver alterações de modelo sem migração (geradas em desenvolvimento)"""
+        try:
+            call_command('makemigrations', check=True, dry_run=True, verbosity=0)
+        except SystemExit:
+            raise CommandError(
+                "Há alterações nos modelos sem migração. Gere com makemigrations em "
+                "desenvolvimento e versione o arquivo antes de implantar."
+            )
+
+    def _check_migrations(self, allow_incompatible, revision=None):
+        connection = connections[DEFAULT_DB_ALIAS]
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.stdout.write("Nenhuma migração pendente.")
+            return plan
+
+        self.stdout.write("Migrações pendentes:")
+        for migration, _ in plan:
+            self.stdout.write(f"- {migration.app_label}.{migration.name}")
+
+        running = None
+        if revision:
+            try:
+                running = running_columns(revision)
+            except (RuntimeError, subprocess.SubprocessError, OSError, ValueError) as e:
+                raise CommandError(f"Não foi possível carregar os modelos da revisão {revision}: {e}")
+        problems = incompatible_operations(plan, executor.loader, running)
+        for migration, operation, reason in problems:
+            description = operation.describe() if operation else ''
+            self.stdout.write(self.style.WARNING(
+                f"  ! {migration.app_label}.{migration.name}: {description} – {reason}"
+            ))
+        if problems and not allow_incompatible:
+            raise CommandError(
+                "Migrações incompatíveis com os workers em execução. Divida a mudança em duas "
+                "implantações ou use --permitir-incompativel (pode gerar erros durante a troca)."
+            )
+        return plan
+
+    def _check_ring_window(self, window_s, options):
+        if options['forcar']:
+            return
+        while True:
+            now = timezone.localtime(timezone.now())
+            conflict = ring_conflict(now, today_schedule(now), window_s)
+            if conflict is None:
+                return
+            alarm, ring_at = conflict
+            resume = safe_after(ring_at, window_s)
+            message = (
+                f"Toque agendado ({alarm}) a menos de {window_s} s; "
+                f"implantação segura a partir de {resume:%H:%M:%S}."
+            )
+            if not options['aguardar']:
+                raise CommandError(message + " Use --aguardar para esperar.")
+            self.stdout.write(self.style.WARNING(message + " Aguardando..."))
+            time.sleep(max(1.0, (resume - now).total_seconds()))
@@ -0,0 +1,123 @@
+"""
+COMANDO: perfil_inicializacao
+
+DESCRIÇÃO:
+Mede a inicialização de um worker para cada perfil de configuração (por padrão o
+completo, SchoolBuzzer.settings, e o da API dos dispositivos, SchoolBuzzer.settings_device).
+Cada perfil é carregado em um processo Python novo com `-X importtime`, que executa o
+mesmo que um worker do Gunicorn antes da primeira requisição: django.setup(), criação
+da aplicação WSGI (middlewares) e importação do URLconf.
+
+Para cada perfil são exibidos:
+- tempo total de inicialização e memória do processo: RSS máxima e, no Linux (a partir
+  de /proc/self/smaps_rollup), RSS, PSS e USS atuais. A RSS máxima inclui o pico
+  temporário da inicialização; a USS (memória exclusiva do processo) é a que mede a
+  diferença entre os perfis
+- tempo de importação por pacote (os que mais pesam na inicialização)
+- os módulos individuais mais lentos
+
+USO:
+    python manage.py perfil_inicializacao [--perfil SchoolBuzzer.settings_device] [--top 10]
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PROFILES = ('SchoolBuzzer.settings', 'SchoolBuzzer.settings_device')
+
+# Executado no processo filho: mesmos passos de um worker antes da primeira requisição
+STARTUP_SCRIPT = """
+import json, os, resource, time
+inicio = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+memoria = {}
+if os.path.exists('/proc/self/smaps_rollup'):
+    with open('/proc/self/smaps_rollup') as arquivo:
+        for linha in arquivo:
+            partes = linha.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                memoria[partes[0].rstrip(':')] = int(partes[1])
+print(json.dumps({
+    'segundos': time.perf_counter() - inicio,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'memoria_kb': memoria,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Converte a saída de -X importtime em [(módulo, self_us, cumulativo_us)]"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # cabeçalho
+        modules.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return modules
+
+
+def by_package(modules):
+    """Soma o tempo próprio (self) de importação por pacote de primeiro nível"""
+    totals = defaultdict(int)
+    for name, self_us, _ in modules:
+        package = name.split('.')[0]
+        if package == 'django' and name.count('.') >= 2:
+            package = '.'.join(name.split('.')[:3])  # ex: django.contrib.admin
+        totals[package] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+class Command(BaseCommand):
+    help = "Mede tempo de importação e memória na inicialização de cada perfil de configuração"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfil', action='append', dest='perfis',
+                            help='Módulo de settings a medir (pode ser repetido)')
+        parser.add_argument('--top', type=int, default=10, help='Quantidade de pacotes/módulos exibidos')
+
+    def _measure(self, settings_module):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Falha ao iniciar {settings_module}:\n{result.stderr[-2000:]}")
+        return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        top = options['top']
+        for settings_module in options['perfis'] or DEFAULT_PROFILES:
+            stats, modules = self._measure(settings_module)
+            total_us = sum(self_us for _, self_us, _ in modules)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(settings_module))
+            self.stdout.write(
+                f"  Inicialização: {stats['segundos'] * 1000:.0f} ms | RSS máxima: {stats['rss_kb'] / 1024:.1f} MB | "
+                f"{len(modules)} módulos importados ({total_us / 1000:.0f} ms de importação)"
+            )
+            memory = stats.get('memoria_kb')
+            if memory:
+                uss = memory.get('Private_Clean', 0) + memory.get('Private_Dirty', 0)
+                self.stdout.write(
+                    f"  Memória atual: RSS {memory['Rss'] / 1024:.1f} MB | PSS {memory['Pss'] / 1024:.1f} MB | "
+                    f"USS {uss / 1024:.1f} MB"
+                )
+            self.stdout.write("  Pacotes mais lentos:")
+            for package, self_us in by_package(modules)[:top]:
+                self.stdout.write(f"    {self_us / 1000:8.1f} ms  {package}")
+            self.stdout.write("  Módulos mais lentos (tempo próprio):")
+            for name, self_us, _ in sorted(modules, key=lambda m: m[1], reverse=True)[:top]:
+                self.stdout.write(f"    {self_us / 1000:8.1f} ms  {name}")
@@ -0,0 +1,47 @@
+"""
+COMANDO: relatorio_latencia
+
+DESCRIÇÃO:
+Exibe o atraso dos toques (p50/p95/máximo) por dispositivo e por origem, sinalizando os
+dispositivos cujo p95 ultrapassa o limiar configurado.
+
+USO:
+    python manage.py relatorio_latencia [--dias 7] [--limiar-ms 10000]
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.latency import latency_report, p95_threshold_ms
+from app.models import RingEvent
+
+
+class Command(BaseCommand):
+    help = "Relatório de atraso dos toques por dispositivo e por origem"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=7, help='Período analisado (dias)')
+        parser.add_argument('--limiar-ms', type=int, default=None,
+                            help='Limiar de p95 em ms (padrão: RING_LATENCY_P95_THRESHOLD_MS)')
+
+    def handle(self, *args, **options):
+        inicio = timezone.now() - timedelta(days=options['dias'])
+        limiar = options['limiar_ms'] if options['limiar_ms'] is not None else p95_threshold_ms()
+        report = latency_report(RingEvent.objects.filter(timestamp__gte=inicio), limiar)
+
+        for titulo, grupo in (('DISPOSITIVOS', report['devices']), ('ORIGENS', report['sources'])):
+            self.stdout.write(f"\n{titulo}")
+            for nome, stats in grupo.items():
+                self.stdout.write(
+                    f"- {nome}: {stats['count']} toques | p50 {stats['p50_ms']} ms | "
+                    f"p95 {stats['p95_ms']} ms | máx {stats['max_ms']} ms"
+                )
+
+        if report['flagged']:
+            self.stdout.write(self.style.WARNING(
+                f"\nDispositivos com p95 acima de {limiar} ms: {', '.join(report['flagged'])}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"\nNenhum dispositivo com p95 acima de {limiar} ms"))
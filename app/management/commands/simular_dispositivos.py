@@ -0,0 +1,80 @@
+"""
+COMANDO: simular_dispositivos
+
+DESCRIÇÃO:
+Executa milhares de dispositivos simulados (app/simulator.py) contra um servidor em
+execução e confere os toques: cada toque agendado da janela simulada deve ocorrer uma
+única vez por dispositivo, dentro do atraso máximo, e nenhuma requisição pode falhar.
+
+Os toques esperados vêm da agenda do dia cadastrada no banco (o mesmo usado pelo
+servidor). Só são cobrados os toques que começam depois do primeiro minuto simulado,
+quando todos os dispositivos já fizeram a primeira consulta.
+
+USO:
+    python manage.py simular_dispositivos --url http://127.0.0.1:8000 [--dispositivos 1000]
+        [--duracao 300] [--concorrencia 200] [--atraso-max-ms 2000]
+"""
+
+import asyncio
+import time as monotonic_time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.latency import epoch_ms
+from app.schedule import today_schedule
+from app.simulator import run_fleet, verify_rings
+
+
+def expected_rings(start, end):
+    """Toques agendados (ms desde a época) inteiramente entre start + 1 min e end"""
+    rings = []
+    for alarm in today_schedule(start):
+        ring_at = start.replace(hour=alarm.time.hour, minute=alarm.time.minute, second=0, microsecond=0)
+        if start + timedelta(minutes=1) <= ring_at and ring_at + timedelta(minutes=1) <= end:
+            rings.append(epoch_ms(ring_at))
+    return rings
+
+
+class Command(BaseCommand):
+    help = "Simula dispositivos ESP8266 contra um servidor e confere a pontualidade dos toques"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', required=True, help='Endereço do servidor (ex: http://127.0.0.1:8000)')
+        parser.add_argument('--dispositivos', type=int, default=1000, help='Número de dispositivos')
+        parser.add_argument('--duracao', type=int, default=300, help='Duração da simulação (s)')
+        parser.add_argument('--concorrencia', type=int, default=200, help='Conexões simultâneas no máximo')
+        parser.add_argument('--atraso-max-ms', type=int, default=2000, help='Atraso máximo aceito por toque')
+        parser.add_argument('--semente', type=int, default=1, help='Semente da defasagem entre dispositivos')
+
+    def handle(self, *args, **options):
+        start = timezone.localtime(timezone.now())
+        end = start + timedelta(seconds=options['duracao'])
+        expected = expected_rings(start, end)
+        self.stdout.write(
+            f"{options['dispositivos']} dispositivos por {options['duracao']} s | "
+            f"toques esperados na janela: {len(expected)}"
+        )
+
+        began = monotonic_time.monotonic()
+        devices = asyncio.run(run_fleet(
+            options['url'].rstrip('/'), options['dispositivos'], options['duracao'],
+            concurrency=options['concorrencia'], seed=options['semente'],
+        ))
+        elapsed = monotonic_time.monotonic() - began
+
+        report = verify_rings(devices, expected, max_lateness_ms=options['atraso_max_ms'])
+        self.stdout.write(
+            f"Toques: {report['rings']} ({report['scheduled_rings']} agendados) | "
+            f"atraso p50 {report['lateness_p50_ms']} ms | p95 {report['lateness_p95_ms']} ms | "
+            f"máx {report['lateness_max_ms']} ms | tempo total {elapsed:.1f} s"
+        )
+        if report['manual_commands']:
+            self.stdout.write(f"Comandos manuais executados: {report['manual_commands']}")
+
+        if report['problems']:
+            for problem in report['problems'][:50]:
+                self.stdout.write(self.style.ERROR(f"- {problem}"))
+            raise CommandError(f"{len(report['problems'])} problemas encontrados")
+        self.stdout.write(self.style.SUCCESS("Nenhum problema encontrado."))
@@ -0,0 +1,172 @@
+"""
+COMANDO: simular_polling
+
+DESCRIÇÃO:
+Simula as consultas dos dispositivos e compara o intervalo fixo do firmware
+(agendamentos a cada 60 s, comandos a cada 5 s) com o intervalo adaptativo next_poll_ms
+(app/polling.py), informando a redução no número de requisições e os atrasos:
+- canal de agendamentos (um dia): atraso na detecção de cada toque e maior intervalo
+  sem consulta. No modo adaptativo o dispositivo acompanha schedule_version pelas
+  respostas de check_command e dorme até o próximo toque: uma alteração da agenda é
+  percebida na consulta de comandos seguinte
+- canal de comandos (--janela-comandos segundos, extrapolado para o dia): cada consulta
+  passa pelo medidor de carga de um dos --processos (rodízio) e recebe next_poll_ms com
+  o fator de carga daquele processo; comandos manuais em horários aleatórios medem o
+  atraso até cada dispositivo consultar
+
+USO:
+    python manage.py simular_polling [--dispositivos 500] [--processos 2] [--agenda-real]
+
+Sem --agenda-real é usada uma agenda escolar típica (12 toques); com a opção, a agenda
+do dia atual cadastrada no banco.
+"""
+
+import heapq
+import random
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.polling import LoadMeter, load_factor, next_poll_ms
+from app.schedule import today_schedule
+
+FIXED_SCHEDULE_MS = 60000
+FIXED_COMMAND_MS = 5000
+MANUAL_COMMANDS = 20
+TYPICAL_BELLS = ('07:30', '08:20', '09:10', '10:00', '10:15', '11:05', '11:55',
+                 '13:30', '14:20', '15:10', '15:25', '16:15')
+
+
+def _simulate_schedule_channel(day_start, alarms, first_poll_ms, adaptive):
+    """Retorna (nº de consultas, atrasos de detecção em ms, maior intervalo em ms) para um dispositivo"""
+    day_end = day_start + timedelta(days=1)
+    polls = []
+    now = day_start + timedelta(milliseconds=first_poll_ms)
+    while now < day_end:
+        polls.append(now)
+        if adaptive:
+            interval = next_poll_ms(now, alarms, None, follows_version=True)
+        else:
+            interval = FIXED_SCHEDULE_MS
+        now += timedelta(milliseconds=interval)
+
+    delays = []
+    for alarm in alarms:
+        ring_at = day_start.replace(hour=alarm.time.hour, minute=alarm.time.minute)
+        hit = next((poll for poll in polls if ring_at <= poll < ring_at + timedelta(minutes=1)), None)
+        delays.append(int((hit - ring_at) / timedelta(milliseconds=1)) if hit else None)
+    max_gap = max((later - earlier for earlier, later in zip(polls, polls[1:])), default=timedelta(0))
+    return len(polls), delays, int(max_gap / timedelta(milliseconds=1))
+
+
+def _simulate_command_channel(start, devices, duration_ms, processes, adaptive, rng, manual_at):
+    """
+    Simula duration_ms do canal de comandos (eventos ordenados por horário).
+
+    Retorna (nº de consultas, atrasos em ms entre cada comando manual de manual_at e a
+    consulta seguinte de cada dispositivo, fator de carga médio). Os comandos só são
+    medidos: não alteram o ritmo das consultas.
+    """
+    window_s = getattr(settings, 'POLL_LOAD_WINDOW_S', 10)
+    meters = [LoadMeter(window_s) for _ in range(processes)]
+    events = [(rng.randrange(FIXED_COMMAND_MS), device) for device in range(devices)]
+    heapq.heapify(events)
+    last_poll = [0] * devices
+    delays = []
+    polls = 0
+    factors = 0.0
+
+    while events and events[0][0] < duration_ms:
+        at, device = heapq.heappop(events)
+        meter = meters[polls % processes]
+        polls += 1
+        meter.hit(at / 1000)
+        factor = load_factor(meter.rate(at / 1000))
+        factors += factor
+        if adaptive:
+            now = start + timedelta(milliseconds=at)
+            interval = next_poll_ms(now, (), FIXED_COMMAND_MS, factor=factor)
+        else:
+            interval = FIXED_COMMAND_MS
+
+        # Comandos emitidos desde a consulta anterior deste dispositivo
+        for issued in manual_at[bisect_right(manual_at, last_poll[device]):bisect_right(manual_at, at)]:
+            delays.append(at - issued)
+        last_poll[device] = at
+        heapq.heappush(events, (at + interval, device))
+
+    # Comandos ainda não vistos por um dispositivo ao fim da janela ficam de fora
+    return polls, delays, factors / max(polls, 1)
+
+
+class Command(BaseCommand):
+    help = "Compara o número de consultas com intervalo fixo e adaptativo (next_poll_ms)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dispositivos', type=int, default=500, help='Número de dispositivos')
+        parser.add_argument('--processos', type=int, default=2, help='Workers que dividem as consultas')
+        parser.add_argument('--janela-comandos', type=int, default=3600,
+                            help='Duração (s) simulada do canal de comandos')
+        parser.add_argument('--agenda-real', action='store_true', help='Usa a agenda do dia cadastrada')
+        parser.add_argument('--semente', type=int, default=1, help='Semente da defasagem entre dispositivos')
+
+    def handle(self, *args, **options):
+        devices = options['dispositivos']
+        rng = random.Random(options['semente'])
+        now = timezone.localtime(timezone.now())
+        day_start = timezone.make_aware(datetime.combine(now.date(), time.min))
+
+        if options['agenda_real']:
+            alarms = today_schedule(now)
+        else:
+            alarms = [SimpleNamespace(time=time.fromisoformat(hhmm)) for hhmm in TYPICAL_BELLS]
+
+        # Canal de agendamentos: cada dispositivo começa em uma fase diferente
+        sample = min(devices, 50)
+        results = {'fixo': [0, [], 0], 'adaptativo': [0, [], 0]}
+        for _ in range(sample):
+            phase = rng.randrange(FIXED_SCHEDULE_MS)
+            for name, adaptive in (('fixo', False), ('adaptativo', True)):
+                count, delays, max_gap = _simulate_schedule_channel(day_start, alarms, phase, adaptive)
+                results[name][0] += count
+                results[name][1].extend(delays)
+                results[name][2] = max(results[name][2], max_gap)
+
+        self.stdout.write(f"Dispositivos: {devices} | processos: {options['processos']} | toques no dia: {len(alarms)}")
+        totals = {}
+        for name, (count, delays, max_gap) in results.items():
+            totals[name] = int(count / sample * devices)
+            detected = [d for d in delays if d is not None]
+            missed = len(delays) - len(detected)
+            self.stdout.write(
+                f"- Agendamentos ({name}): {totals[name]} requisições/dia | "
+                f"atraso médio {sum(detected) // max(len(detected), 1)} ms | "
+                f"máx {max(detected, default=0)} ms | toques perdidos {missed} | "
+                f"maior intervalo sem consulta {max_gap // 1000} s"
+            )
+
+        # Canal de comandos: a mesma defasagem e os mesmos comandos manuais nos dois modos
+        duration_ms = options['janela_comandos'] * 1000
+        manual_at = sorted(rng.randrange(duration_ms // 10, duration_ms * 9 // 10) for _ in range(MANUAL_COMMANDS))
+        start = day_start.replace(hour=10)
+        seed = rng.random()
+        for name, adaptive in (('fixo', False), ('adaptativo', True)):
+            polls, delays, factor = _simulate_command_channel(
+                start, devices, duration_ms, options['processos'], adaptive, random.Random(seed), manual_at
+            )
+            per_day = int(polls * 86400000 / duration_ms)
+            totals[name] += per_day
+            self.stdout.write(
+                f"- Comandos ({name}): {per_day} requisições/dia ({polls * 1000 / duration_ms:.1f} req/s, "
+                f"fator de carga médio {factor:.2f}) | comando manual percebido em média após "
+                f"{sum(delays) // max(len(delays), 1)} ms, máx {max(delays, default=0)} ms"
+            )
+
+        before, after = totals['fixo'], totals['adaptativo']
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {before} → {after} requisições/dia ({100 * (before - after) / before:.1f}% menos)"
+        ))
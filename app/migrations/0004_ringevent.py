@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:39
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_sirenstatus_activation_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Horário real')),
+                ('device_id', models.CharField(blank=True, default='', max_length=100, verbose_name='Dispositivo')),
+                ('source', models.CharField(choices=[('schedule', 'Agendamento'), ('web', 'Interface Web'), ('admin', 'Painel Administrativo'), ('unknown', 'Desconhecida')], max_length=20, verbose_name='Origem')),
+                ('outcome', models.CharField(choices=[('issued', 'Emitido'), ('confirmed', 'Confirmado pelo dispositivo')], max_length=20, verbose_name='Resultado')),
+                ('command_id', models.BigIntegerField(blank=True, null=True, verbose_name='Comando')),
+                ('scheduled_at', models.DateTimeField(blank=True, null=True, verbose_name='Horário agendado')),
+                ('ack_latency_ms', models.IntegerField(blank=True, null=True, verbose_name='Latência da confirmação (ms)')),
+            ],
+            options={
+                'verbose_name': 'Evento de Toque',
+                'verbose_name_plural': 'Eventos de Toque',
+                'indexes': [models.Index(fields=['timestamp'], name='ringevent_timestamp_idx'), models.Index(fields=['device_id', 'timestamp'], name='ringevent_device_ts_idx')],
+            },
+        ),
+    ]
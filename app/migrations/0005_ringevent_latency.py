@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_ringevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ringevent',
+            name='activated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Acionamento informado pelo dispositivo'),
+        ),
+        migrations.AddField(
+            model_name='ringevent',
+            name='lateness_ms',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Atraso em relação ao esperado (ms)'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:43
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_ringevent_latency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirmwareRelease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=30, unique=True, verbose_name='Versão')),
+                ('binary', models.FileField(upload_to='firmware/', verbose_name='Arquivo .bin')),
+                ('sha256', models.CharField(editable=False, max_length=64, verbose_name='SHA-256')),
+                ('size', models.PositiveIntegerField(default=0, editable=False, verbose_name='Tamanho (bytes)')),
+                ('rollout_percent', models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(100)], verbose_name='Liberação (%)')),
+                ('device_group', models.CharField(blank=True, default='', max_length=50, verbose_name='Grupo de dispositivos')),
+                ('active', models.BooleanField(default=True, verbose_name='Ativa')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Versão de Firmware',
+                'verbose_name_plural': 'Versões de Firmware',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='firmware_reported_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Versão informada em'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='firmware_version',
+            field=models.CharField(blank=True, null=True, default='', max_length=30, verbose_name='Versão do firmware'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='group',
+            field=models.CharField(blank=True, null=True, default='', max_length=50, verbose_name='Grupo'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_firmware_release'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deviceconfig',
+            name='command_check_interval_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Consulta de comandos (ms)'),
+        ),
+        migrations.AddField(
+            model_name='deviceconfig',
+            name='schedule_check_interval_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Consulta de agendamentos (ms)'),
+        ),
+        migrations.AddField(
+            model_name='deviceconfig',
+            name='siren_max_duration_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Duração máxima da sirene (ms)'),
+        ),
+        migrations.AddField(
+            model_name='deviceconfig',
+            name='siren_min_duration_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Duração mínima da sirene (ms)'),
+        ),
+        migrations.AddField(
+            model_name='globalconfig',
+            name='command_check_interval_ms',
+            field=models.PositiveIntegerField(default=5000, null=True, verbose_name='Consulta de comandos (ms)'),
+        ),
+        migrations.AddField(
+            model_name='globalconfig',
+            name='schedule_check_interval_ms',
+            field=models.PositiveIntegerField(default=60000, null=True, verbose_name='Consulta de agendamentos (ms)'),
+        ),
+        migrations.AddField(
+            model_name='globalconfig',
+            name='siren_max_duration_ms',
+            field=models.PositiveIntegerField(default=3500, null=True, verbose_name='Duração máxima da sirene (ms)'),
+        ),
+        migrations.AddField(
+            model_name='globalconfig',
+            name='siren_min_duration_ms',
+            field=models.PositiveIntegerField(default=2000, null=True, verbose_name='Duração mínima da sirene (ms)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_device_polling_config'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comandoesp',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Chave de idempotência'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_comandoesp_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='devicelog',
+            index=models.Index(fields=['timestamp'], name='devicelog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicelog',
+            index=models.Index(fields=['device', 'timestamp'], name='devicelog_device_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['timestamp'], name='sensordata_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sensordata',
+            index=models.Index(fields=['device', 'timestamp'], name='sensordata_device_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_telemetry_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceSirenState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(max_length=100, unique=True)),
+                ('last_activation', models.DateTimeField(blank=True, null=True, verbose_name='Último acionamento')),
+                ('last_command_id', models.CharField(blank=True, default='', max_length=20, verbose_name='Último comando')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
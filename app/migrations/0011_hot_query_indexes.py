@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_device_siren_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alarmschedule',
+            index=models.Index(condition=models.Q(('active', True)), fields=['time', 'start_date', 'end_date'], name='alarm_active_time_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comandoesp',
+            index=models.Index(fields=['comando', 'timestamp'], name='comandoesp_comando_ts_idx'),
+        ),
+    ]
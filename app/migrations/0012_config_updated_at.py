@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:23
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def stamp_existing(apps, schema_editor):
+    """Configurações já existentes recebem updated_at: a versão passa a vir do banco"""
+    now = timezone.now()
+    for model_name in ('GlobalConfig', 'DeviceConfig'):
+        apps.get_model('app', model_name).objects.update(updated_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deviceconfig',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='globalconfig',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.RunPython(stamp_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_config_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SirenThrottle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tokens', models.FloatField(default=0)),
+                ('refilled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:50
+
+# Remove SirenStatus.activation_source (criado em 0003, nunca declarado pelo modelo: a
+# origem de cada acionamento é registrada em RingEvent). A coluna e seus valores são
+# descartados.
+#
+# A remoção fazia parte de 0004_ringevent e foi separada para ficar explícita. Bancos que
+# aplicaram a versão anterior de 0004 já não têm a coluna, por isso ela só é removida do
+# banco se ainda existir.
+
+from django.db import migrations
+
+
+def _columns(schema_editor, model):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        description = connection.introspection.get_table_description(cursor, model._meta.db_table)
+    return {column.name for column in description}
+
+
+def drop_activation_source(apps, schema_editor):
+    SirenStatus = apps.get_model('app', 'SirenStatus')
+    if 'activation_source' in _columns(schema_editor, SirenStatus):
+        schema_editor.remove_field(SirenStatus, SirenStatus._meta.get_field('activation_source'))
+
+
+def restore_activation_source(apps, schema_editor):
+    SirenStatus = apps.get_model('app', 'SirenStatus')
+    if 'activation_source' not in _columns(schema_editor, SirenStatus):
+        schema_editor.add_field(SirenStatus, SirenStatus._meta.get_field('activation_source'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_siren_throttle'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(drop_activation_source, restore_activation_source),
+            ],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='sirenstatus',
+                    name='activation_source',
+                ),
+            ],
+        ),
+    ]
@@ -1,4 +1,8 @@
+import hashlib
+
+from django.core.validators import MaxValueValidator
 from django.db import models
+from django.utils import timezone
 
 """
 MODELOS DE BANCO DE DADOS PARA SISTEMA DE MONITORAMENTO IoT
@@ -15,6 +19,10 @@ MODELOS:
 - DeviceLog: log de eventos por dispositivo
 - GlobalConfig: configurações gerais do sistema
 - AlarmSchedule: agendamento de eventos no calendário semanal
+- RingEvent: histórico imutável (append-only) de cada toque da sirene
+- FirmwareRelease: versões de firmware para atualização OTA com liberação gradual
+- DeviceSirenState: último acionamento de cada dispositivo (cópia persistida do estado em memória)
+- SirenThrottle: limite de taxa global da ativação manual (compartilhado entre processos)
 """
 
 class Model(models.Model):
@@ -31,6 +39,10 @@ class Device(models.Model):
     device_name = models.CharField(max_length=100)
     last_seen = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=20, default="offline")
+    # null: linhas gravadas pelos workers antigos durante a implantação (ver app/deploy.py)
+    group = models.CharField(max_length=50, null=True, blank=True, default='', verbose_name='Grupo')
+    firmware_version = models.CharField(max_length=30, null=True, blank=True, default='', verbose_name='Versão do firmware')
+    firmware_reported_at = models.DateTimeField(null=True, blank=True, verbose_name='Versão informada em')
 
     def __str__(self):
         return f"{self.device_name} ({self.device_id})"
@@ -52,11 +64,22 @@ class SensorData(models.Model):
     value = models.FloatField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='sensordata_timestamp_idx'),
+            models.Index(fields=['device', 'timestamp'], name='sensordata_device_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.device.device_name} - {self.sensor.name}: {self.value} at {self.timestamp}"
 
     def to_dict(self):
-        """Converte os dados para formato de dicionário (API)"""
+        """
+        Converte os dados para formato de dicionário (API).
+
+        Para listas use select_related('sensor', 'device') ou, em grandes volumes,
+        app.export.sensor_data_rows (projeção sem instanciar modelos).
+        """
         return {
             'sensor_name': self.sensor.name,
             'device_name': self.device.device_name,
@@ -65,10 +88,15 @@ class SensorData(models.Model):
         }
 
 class DeviceConfig(models.Model):
-    """Configurações específicas para cada dispositivo"""
+    """Configurações específicas para cada dispositivo (campos vazios herdam a GlobalConfig)"""
     device = models.OneToOneField(Device, on_delete=models.CASCADE)
     send_interval = models.IntegerField(default=60)
     temp_threshold = models.FloatField(default=30.0)
+    schedule_check_interval_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='Consulta de agendamentos (ms)')
+    command_check_interval_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='Consulta de comandos (ms)')
+    siren_min_duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='Duração mínima da sirene (ms)')
+    siren_max_duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='Duração máxima da sirene (ms)')
+    updated_at = models.DateTimeField(auto_now=True, null=True)  # Versão da configuração (app/config.py)
 
     def __str__(self):
         return f"Configuração para {self.device.device_name}"
@@ -79,6 +107,12 @@ class DeviceLog(models.Model):
     log_message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='devicelog_timestamp_idx'),
+            models.Index(fields=['device', 'timestamp'], name='devicelog_device_ts_idx'),
+        ]
+
     def __str__(self):
         return f"Log de {self.device.device_name} em {self.timestamp}"
 
@@ -86,6 +120,12 @@ class GlobalConfig(models.Model):
     """Configurações globais do sistema"""
     api_key = models.CharField(max_length=100)
     data_refresh_interval = models.IntegerField(default=60)
+    # null: linhas gravadas pelos workers antigos durante a implantação (ver app/config.py)
+    schedule_check_interval_ms = models.PositiveIntegerField(null=True, default=60000, verbose_name='Consulta de agendamentos (ms)')
+    command_check_interval_ms = models.PositiveIntegerField(null=True, default=5000, verbose_name='Consulta de comandos (ms)')
+    siren_min_duration_ms = models.PositiveIntegerField(null=True, default=2000, verbose_name='Duração mínima da sirene (ms)')
+    siren_max_duration_ms = models.PositiveIntegerField(null=True, default=3500, verbose_name='Duração máxima da sirene (ms)')
+    updated_at = models.DateTimeField(auto_now=True, null=True)  # Versão da configuração (app/config.py)
 
     def __str__(self):
         return "Configuração Global"
@@ -97,6 +137,7 @@ class ComandoESP(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     duration = models.IntegerField(default=60, verbose_name='Duração (minutos)')
     update = models.CharField(max_length=20, default='normal')
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, verbose_name='Chave de idempotência')
 
     def __str__(self):
         return f"Comando: {self.comando} (Fonte: {self.source})"
@@ -104,6 +145,21 @@ class ComandoESP(models.Model):
     class Meta:
         verbose_name = "Comando ESP"
         verbose_name_plural = "Comandos ESP"
+        indexes = [
+            # Agrupamento de acionamentos em /ativar/ (comando='ligar' nos últimos segundos)
+            models.Index(fields=['comando', 'timestamp'], name='comandoesp_comando_ts_idx'),
+        ]
+
+class SirenThrottle(models.Model):
+    """
+    Limite de taxa global da sirene (linha única, ver app/ratelimit.py): fichas
+    disponíveis do token bucket e instante da última recarga
+    """
+    tokens = models.FloatField(default=0)
+    refilled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tokens:.1f} fichas"
 
 class SirenStatus(models.Model):
     """Status atual da sirene/campainha"""
@@ -113,6 +169,16 @@ class SirenStatus(models.Model):
     def __str__(self):
         return "Ligada" if self.is_on else "Desligada"
 
+class DeviceSirenState(models.Model):
+    """Último acionamento informado por cada dispositivo (gravado em segundo plano por app/state.py)"""
+    device_id = models.CharField(max_length=100, unique=True)
+    last_activation = models.DateTimeField(null=True, blank=True, verbose_name='Último acionamento')
+    last_command_id = models.CharField(max_length=20, blank=True, default='', verbose_name='Último comando')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.device_id}: {self.last_activation}"
+
 class AlarmSchedule(models.Model):
     """Agendamento de eventos automáticos para a sirene"""
     class EventType(models.TextChoices):
@@ -150,6 +216,17 @@ class AlarmSchedule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Agenda do dia (app/schedule.py): índice parcial só com os ativos, já em ordem de
+            # horário e com as datas conferidas no próprio índice. Parcial porque o filtro
+            # active=True vira "WHERE active" no SQLite, que não usa um índice comum na coluna.
+            models.Index(
+                fields=['time', 'start_date', 'end_date'], condition=models.Q(active=True),
+                name='alarm_active_time_dates_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.get_event_type_display()} às {self.time.strftime('%H:%M')}"
 
@@ -174,4 +251,91 @@ class AlarmSchedule(models.Model):
         """Garante que o agendamento sempre seja ativo ao criar ou atualizar"""
         if not self.pk or not hasattr(self, 'active'):  # Novo registro ou campo não especificado
             self.active = True
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class RingEvent(models.Model):
+    """
+    Histórico imutável (append-only) de cada toque da sirene.
+
+    Cada etapa de um toque gera uma nova linha (emissão do comando, confirmação do
+    dispositivo); registros existentes nunca são alterados ou removidos. A gravação
+    é feita em lote pelo RingEventWriter (app/events.py), fora do caminho crítico.
+    """
+    class Source(models.TextChoices):
+        SCHEDULE = 'schedule', 'Agendamento'
+        WEB = 'web', 'Interface Web'
+        ADMIN = 'admin', 'Painel Administrativo'
+        UNKNOWN = 'unknown', 'Desconhecida'
+
+    class Outcome(models.TextChoices):
+        ISSUED = 'issued', 'Emitido'
+        CONFIRMED = 'confirmed', 'Confirmado pelo dispositivo'
+
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name='Horário real')
+    device_id = models.CharField(max_length=100, blank=True, default='', verbose_name='Dispositivo')
+    source = models.CharField(max_length=20, choices=Source.choices, verbose_name='Origem')
+    outcome = models.CharField(max_length=20, choices=Outcome.choices, verbose_name='Resultado')
+    command_id = models.BigIntegerField(null=True, blank=True, verbose_name='Comando')
+    scheduled_at = models.DateTimeField(null=True, blank=True, verbose_name='Horário agendado')
+    ack_latency_ms = models.IntegerField(null=True, blank=True, verbose_name='Latência da confirmação (ms)')
+    activated_at = models.DateTimeField(null=True, blank=True, verbose_name='Acionamento informado pelo dispositivo')
+    lateness_ms = models.IntegerField(null=True, blank=True, verbose_name='Atraso em relação ao esperado (ms)')
+
+    class Meta:
+        verbose_name = "Evento de Toque"
+        verbose_name_plural = "Eventos de Toque"
+        indexes = [
+            models.Index(fields=['timestamp'], name='ringevent_timestamp_idx'),
+            models.Index(fields=['device_id', 'timestamp'], name='ringevent_device_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} - {self.get_outcome_display()} em {self.timestamp}"
+
+    def save(self, *args, **kwargs):
+        """Impede a alteração de eventos já gravados"""
+        if not self._state.adding:
+            raise ValueError("Eventos de toque são imutáveis (append-only).")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Eventos de toque são imutáveis (append-only).")
+
+
+class FirmwareRelease(models.Model):
+    """
+    Versão de firmware disponível para atualização OTA.
+
+    A liberação é gradual: apenas os dispositivos cujo sorteio determinístico (hash do
+    device_id com a versão) cai abaixo de rollout_percent recebem a versão, opcionalmente
+    restritos a um grupo de dispositivos.
+    """
+    version = models.CharField(max_length=30, unique=True, verbose_name='Versão')
+    binary = models.FileField(upload_to='firmware/', verbose_name='Arquivo .bin')
+    sha256 = models.CharField(max_length=64, editable=False, verbose_name='SHA-256')
+    size = models.PositiveIntegerField(default=0, editable=False, verbose_name='Tamanho (bytes)')
+    rollout_percent = models.PositiveSmallIntegerField(
+        default=0, validators=[MaxValueValidator(100)], verbose_name='Liberação (%)'
+    )
+    device_group = models.CharField(max_length=50, blank=True, default='', verbose_name='Grupo de dispositivos')
+    active = models.BooleanField(default=True, verbose_name='Ativa')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Versão de Firmware"
+        verbose_name_plural = "Versões de Firmware"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Firmware {self.version} ({self.rollout_percent}%)"
+
+    def save(self, *args, **kwargs):
+        """Calcula hash e tamanho do binário sempre que o arquivo muda"""
+        if self.binary and (not self.binary._committed or not self.sha256):
+            digest = hashlib.sha256()
+            self.binary.open('rb')
+            for chunk in self.binary.chunks():
+                digest.update(chunk)
+            self.sha256 = digest.hexdigest()
+            self.size = self.binary.size
+        super().save(*args, **kwargs)
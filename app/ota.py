@@ -0,0 +1,159 @@
+"""
+DISTRIBUIÇÃO DE FIRMWARE OTA
+
+DESCRIÇÃO:
+Seleção da versão de firmware de cada dispositivo (liberação gradual por porcentagem e
+grupo) e entrega do binário com suporte a ETag e HTTP Range, para que downloads
+interrompidos possam ser retomados sem baixar o arquivo inteiro novamente.
+
+UTILIZADO POR:
+- View ota_check (/ota/verificar): informa se há atualização para o dispositivo
+- View ota_download (/ota/firmware/<versão>): entrega o binário
+"""
+
+import hashlib
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Device, FirmwareRelease
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+UNSATISFIABLE = object()  # Intervalo fora do arquivo (416)
+
+
+def rollout_bucket(device_id, version):
+    """Sorteio determinístico (0-99) de um dispositivo para uma versão"""
+    digest = hashlib.sha256(f'{version}:{device_id}'.encode()).hexdigest()
+    return int(digest[:8], 16) % 100
+
+
+def is_eligible(release, device_id, group=''):
+    """Verifica se o dispositivo faz parte da liberação gradual da versão"""
+    if release.device_group and release.device_group != group:
+        return False
+    return rollout_bucket(device_id, release.version) < release.rollout_percent
+
+
+def report_version(device_id, version):
+    """
+    Registra a versão informada pelo dispositivo.
+
+    Só atualiza dispositivos já cadastrados (a consulta não é autenticada, então um
+    device_id desconhecido não cria linhas) e só grava quando a versão muda, evitando
+    uma escrita no banco a cada consulta. Retorna o grupo do dispositivo ('' se não
+    cadastrado).
+    """
+    device = Device.objects.filter(device_id=device_id).only('group', 'firmware_version').first()
+    if device is None:
+        return ''
+    if version and device.firmware_version != version:
+        Device.objects.filter(pk=device.pk).update(firmware_version=version, firmware_reported_at=timezone.now())
+    return device.group or ''
+
+
+def version_key(version):
+    """Chave de comparação de versões (ex: '1.0.10' -> (1, 0, 10)); sufixos não numéricos são ignorados"""
+    return tuple(int(part) for part in re.findall(r'\d+', version or ''))
+
+
+def target_release(device_id, current_version, group=''):
+    """
+    Versão mais recente liberada para o dispositivo, ou None se ele já estiver atualizado.
+
+    Só são oferecidas versões mais novas que a instalada: reduzir a liberação de uma
+    versão nunca faz os dispositivos que já a receberam voltarem à anterior.
+    """
+    current = version_key(current_version)
+    candidates = [
+        release for release in FirmwareRelease.objects.filter(active=True, rollout_percent__gt=0)
+        if version_key(release.version) > current and is_eligible(release, device_id, group)
+    ]
+    return max(candidates, key=lambda release: version_key(release.version), default=None)
+
+
+def _etag(release):
+    return f'"{release.sha256}"'
+
+
+def _byte_range(header, size):
+    """
+    Interpreta o cabeçalho Range (um único intervalo, RFC 7233).
+
+    Retorna (início, fim), UNSATISFIABLE se o intervalo não couber no arquivo ou None
+    se o cabeçalho deve ser ignorado (formato inválido ou fim antes do início).
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        if match.group(2):
+            end = int(match.group(2))
+            if end < start:
+                return None
+        else:
+            end = size - 1
+        if start >= size:
+            return UNSATISFIABLE
+        return start, min(end, size - 1)
+    suffix = int(match.group(2))
+    if suffix == 0 or size == 0:
+        return UNSATISFIABLE
+    return max(size - suffix, 0), size - 1
+
+
+def serve_release(request, release):
+    """
+    Entrega o binário de uma versão com ETag, If-None-Match, If-Range e Range (um intervalo).
+
+    Respostas: 200 (arquivo completo), 206 (intervalo), 304 (não modificado) ou 416
+    (intervalo fora do arquivo).
+    """
+    etag = _etag(release)
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    size = release.size
+    header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    byte_range = _byte_range(header, size) if header and (not if_range or if_range == etag) else None
+
+    if byte_range is UNSATISFIABLE:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(release, start, end), status=206, content_type='application/octet-stream'
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    response = FileResponse(release.binary.open('rb'), content_type='application/octet-stream')
+    response['Content-Length'] = str(size)
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _read_range(release, start, end):
+    """Lê o intervalo [start, end] do binário em blocos"""
+    with release.binary.open('rb') as arquivo:
+        arquivo.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = arquivo.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,112 @@
+"""
+INTERVALO DE CONSULTA ADAPTATIVO DOS DISPOSITIVOS
+
+DESCRIÇÃO:
+Cálculo do campo next_poll_ms enviado nas respostas de comando_esp e check_command,
+indicando ao dispositivo quando fazer a próxima consulta:
+- canal de agendamentos: logo após o início do minuto do próximo toque. Dispositivos
+  que acompanham schedule_version (informado também por check_command) dormem até lá,
+  no máximo POLL_SCHEDULE_IDLE_MAX_MS: uma alteração da agenda é percebida pelo canal de
+  comandos e antecipa a consulta. Os demais não esperam mais que POLL_SCHEDULE_MAX_MS
+  (um toque incluído em cima da hora ainda é percebido, como no intervalo fixo de 60 s)
+- canal de comandos: o intervalo configurado, ampliado sob carga até no máximo
+  POLL_COMMAND_MAX_MS (atraso máximo de um toque manual)
+- consulta imediata (POLL_MIN_MS) quando há comando manual pendente
+
+A carga é medida por processo (requisições por segundo nos últimos POLL_LOAD_WINDOW_S).
+"""
+
+import threading
+import time as monotonic_time
+from collections import deque
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LoadMeter:
+    """Taxa de requisições por segundo em uma janela deslizante"""
+
+    def __init__(self, window_s=10):
+        self.window_s = window_s
+        self._hits = deque()
+        self._lock = threading.Lock()
+
+    def hit(self, now=None):
+        now = monotonic_time.monotonic() if now is None else now
+        with self._lock:
+            self._hits.append(now)
+            self._trim(now)
+
+    def rate(self, now=None):
+        now = monotonic_time.monotonic() if now is None else now
+        with self._lock:
+            self._trim(now)
+            return len(self._hits) / self.window_s
+
+    def _trim(self, now):
+        while self._hits and self._hits[0] <= now - self.window_s:
+            self._hits.popleft()
+
+
+load_meter = LoadMeter(_setting('POLL_LOAD_WINDOW_S', 10))
+
+
+def load_factor(rate=None):
+    """Multiplicador dos intervalos (>= 1) quando a taxa passa de POLL_TARGET_RPS"""
+    rate = load_meter.rate() if rate is None else rate
+    target = _setting('POLL_TARGET_RPS', 50)
+    return max(1.0, rate / target) if target else 1.0
+
+
+def _ms_until(later, now):
+    # Diferença via timestamp: entre datetimes do mesmo fuso o Python ignora o horário de verão
+    return int((later.timestamp() - now.timestamp()) * 1000)
+
+
+def next_poll_ms(now, alarms, base_interval_ms, pending_command=False, factor=1.0, follows_version=False):
+    """
+    Intervalo (ms) até a próxima consulta do dispositivo.
+
+    - now: horário local atual (com fuso)
+    - alarms: agenda do dia (ordenada por horário)
+    - base_interval_ms: intervalo normal do canal de comandos; None para o canal de
+      agendamentos (guiado pelos toques, até POLL_SCHEDULE_MAX_MS)
+    - pending_command: há comando manual aguardando execução
+    - factor: multiplicador de carga (ver load_factor)
+    - follows_version: o dispositivo consulta a agenda quando schedule_version muda
+    """
+    min_ms = _setting('POLL_MIN_MS', 1000)
+    margin_ms = _setting('POLL_RING_MARGIN_MS', 500)
+
+    if pending_command:
+        return min_ms
+
+    if base_interval_ms is None:
+        if follows_version:
+            interval = _setting('POLL_SCHEDULE_IDLE_MAX_MS', 3600000)
+        else:
+            interval = _setting('POLL_SCHEDULE_MAX_MS', 60000)
+    else:
+        # A carga amplia o intervalo configurado, mas nunca além de POLL_COMMAND_MAX_MS
+        # (nem reduz um intervalo configurado acima dele)
+        stretch_cap = max(base_interval_ms, _setting('POLL_COMMAND_MAX_MS', 15000))
+        interval = min(stretch_cap, int(base_interval_ms * factor))
+
+    # Próximo toque de hoje; sem toques, a próxima referência é a virada do dia
+    # (quando a agenda do dia seguinte passa a valer)
+    current_time = now.time()
+    for alarm in alarms:
+        if alarm.time > current_time:
+            ring_at = now.replace(hour=alarm.time.hour, minute=alarm.time.minute, second=0, microsecond=0)
+            break
+    else:
+        ring_at = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), now.tzinfo)
+
+    # A carga nunca adia a consulta para depois do toque
+    until_ring = _ms_until(ring_at, now) + margin_ms
+    return max(min_ms, min(interval, until_ring))
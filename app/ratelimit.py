@@ -0,0 +1,129 @@
+"""
+LIMITE DE TAXA (TOKEN BUCKET)
+
+DESCRIÇÃO:
+Limitadores de taxa da ativação manual da sirene. Cada chave tem um "balde" com
+capacidade fixa que se recarrega continuamente; cada acionamento consome uma ficha.
+
+- RateLimiter: baldes em memória por chave (ex: por usuário). Vivem no processo (com
+  vários workers o limite efetivo é multiplicado pelo número de processos) e os baldes
+  sem uso há um período inteiro são descartados
+- Balde global da sirene: persistido no banco (SirenThrottle), compartilhado por todos
+  os processos; é o limite real, já que existe um único comando/sirene
+"""
+
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import F
+
+from .models import SirenThrottle
+
+
+class TokenBucket:
+    """Balde de fichas: capacity fichas, recarregadas integralmente a cada period segundos"""
+
+    def __init__(self, capacity, period, clock=time.monotonic, tokens=None, updated=None):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.clock = clock
+        self.tokens = float(capacity if tokens is None else tokens)
+        self.updated = clock() if updated is None else updated
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + max(now - self.updated, 0) * self.rate)
+        self.updated = now
+
+    def allow(self):
+        """Consome uma ficha se houver; retorna False caso contrário"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self):
+        """Segundos até a próxima ficha"""
+        self._refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Conjunto de baldes indexados por chave (ex: 'user:3', 'ip:10.0.0.1')"""
+
+    def __init__(self, capacity, period, clock=time.monotonic):
+        self.capacity = capacity
+        self.period = period
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._swept = clock()
+
+    def _bucket(self, key):
+        self._evict()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.capacity, self.period, self.clock)
+        return bucket
+
+    def _evict(self):
+        """
+        Descarta (no máximo uma vez por período) os baldes sem uso há um período inteiro:
+        já estariam cheios, iguais a um balde novo
+        """
+        now = self.clock()
+        if now - self._swept < self.period:
+            return
+        self._swept = now
+        for key in [key for key, bucket in self._buckets.items() if now - bucket.updated >= self.period]:
+            del self._buckets[key]
+
+    def retry_after(self, key):
+        """Segundos até haver ficha para a chave (0 se já houver)"""
+        with self._lock:
+            return self._bucket(key).retry_after()
+
+    def allow(self, key):
+        """Consome uma ficha da chave, se houver"""
+        with self._lock:
+            return self._bucket(key).allow()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+def lock_siren_row():
+    """
+    Trava da sirene entre processos: escreve na linha única de SirenThrottle, que fica
+    travada (no SQLite, o banco inteiro) até o fim da transação em curso
+    """
+    if not SirenThrottle.objects.filter(pk=1).update(tokens=F('tokens')):
+        SirenThrottle.objects.get_or_create(pk=1)
+
+
+def lock_siren_bucket(capacity, period):
+    """
+    Balde global da sirene (linha única de SirenThrottle), compartilhado entre processos.
+
+    Deve ser a primeira operação da transação: a escrita inicial trava a linha (no SQLite,
+    o banco inteiro) até o commit, serializando as ativações de todos os processos.
+    Depois de consumir a ficha, grave o balde com store_siren_bucket.
+    """
+    lock_siren_row()
+    row = SirenThrottle.objects.get(pk=1)
+    if row.refilled_at is None:
+        return TokenBucket(capacity, period, clock=time.time)
+    return TokenBucket(capacity, period, clock=time.time, tokens=row.tokens, updated=row.refilled_at.timestamp())
+
+
+def store_siren_bucket(bucket):
+    """Grava o estado do balde global da sirene (dentro da mesma transação)"""
+    SirenThrottle.objects.filter(pk=1).update(
+        tokens=bucket.tokens, refilled_at=datetime.fromtimestamp(bucket.updated, tz=dt_timezone.utc)
+    )
@@ -0,0 +1,94 @@
+"""
+AGENDA DO DIA – CACHE DE AGENDAMENTOS
+
+DESCRIÇÃO:
+Este módulo concentra o cálculo da agenda do dia (agendamentos ativos para a data e o dia da
+semana atuais), evitando que cada view repita a mesma consulta ao banco.
+
+FUNCIONAMENTO:
+- A agenda é calculada uma única vez por dia e por versão, e guardada no cache do Django
+  por no máximo SCHEDULE_TIMEOUT
+- A versão é derivada dos próprios agendamentos (último updated_at e quantidade): é a
+  mesma em todos os processos e sobrevive a reinícios. Ela fica em cache por
+  SCHEDULE_VERSION_TIMEOUT e é descartada após o commit de qualquer alteração em
+  AlarmSchedule (ver app/signals.py). Processos que não compartilham o cache percebem
+  a alteração em até SCHEDULE_VERSION_TIMEOUT segundos
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .latency import epoch_ms
+from .models import AlarmSchedule
+
+# Mapeamento do dia da semana (inglês abreviado) para o formato do sistema
+DAYS_MAP = {
+    'Mon': 'SEG', 'Tue': 'TER', 'Wed': 'QUA',
+    'Thu': 'QUI', 'Fri': 'SEX', 'Sat': 'SAB', 'Sun': 'DOM'
+}
+
+SCHEDULE_VERSION_KEY = 'agenda:versao'
+SCHEDULE_VERSION_TIMEOUT = 30  # Atraso máximo para outro processo perceber uma alteração
+SCHEDULE_TIMEOUT = 5 * 60
+
+
+def weekday_code(now):
+    """Retorna o dia da semana no formato do sistema (ex: 'SEG')"""
+    weekday_en = now.strftime('%a')
+    return DAYS_MAP.get(weekday_en, weekday_en)
+
+
+def _version_from_database():
+    """
+    Versão da agenda a partir do banco: qualquer inclusão ou edição aumenta o último
+    updated_at e qualquer remoção reduz a quantidade
+    """
+    stats = AlarmSchedule.objects.aggregate(total=Count('pk'), alterado=Max('updated_at'))
+    alterado = epoch_ms(stats['alterado']) if stats['alterado'] else 0
+    return f"{alterado}.{stats['total']}"
+
+
+def schedule_version():
+    """Retorna a versão atual da agenda"""
+    version = cache.get(SCHEDULE_VERSION_KEY)
+    if version is None:
+        version = _version_from_database()
+        cache.set(SCHEDULE_VERSION_KEY, version, SCHEDULE_VERSION_TIMEOUT)
+    return version
+
+
+def bump_schedule_version():
+    """Invalida a agenda em cache: a versão é recalculada do banco após o commit"""
+    transaction.on_commit(lambda: cache.delete(SCHEDULE_VERSION_KEY))
+
+
+def today_schedule(now=None):
+    """
+    Retorna a lista (ordenada por horário) dos agendamentos válidos para hoje.
+
+    A consulta ao banco só é feita na primeira chamada do dia ou após uma alteração
+    na agenda; as chamadas seguintes são atendidas pelo cache.
+    """
+    now = now or timezone.localtime(timezone.now())
+    key = f'agenda:{schedule_version()}:{now.date().isoformat()}'
+
+    alarms = cache.get(key)
+    if alarms is None:
+        alarms = list(AlarmSchedule.objects.filter(
+            start_date__lte=now.date(),
+            end_date__gte=now.date(),
+            days_of_week__contains=weekday_code(now),
+            active=True
+        ).order_by('time'))
+        cache.set(key, alarms, SCHEDULE_TIMEOUT)
+    return alarms
+
+
+def next_alarm(alarms, current_time):
+    """Retorna o primeiro agendamento da lista posterior ao horário informado"""
+    for alarm in alarms:
+        if alarm.time > current_time:
+            return alarm
+    return None
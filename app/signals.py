@@ -0,0 +1,52 @@
+"""
+SINAIS DO SISTEMA DE SIRENE ESCOLAR
+
+DESCRIÇÃO:
+Receptores de sinais do Django usados para manter os caches coerentes com o banco de dados.
+
+SINAIS TRATADOS:
+- post_save/post_delete de AlarmSchedule: invalida a agenda do dia em cache
+- post_save/post_delete de GlobalConfig e DeviceConfig: invalida a configuração dos dispositivos
+- post_save/post_delete de ComandoESP e SirenStatus: sincroniza o estado em memória (app/state.py)
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .config import bump_config_version, touch_config
+from .models import AlarmSchedule, ComandoESP, DeviceConfig, GlobalConfig, SirenStatus
+from .schedule import bump_schedule_version
+from .state import sync_command, sync_siren
+
+
+@receiver(post_save, sender=AlarmSchedule)
+@receiver(post_delete, sender=AlarmSchedule)
+def invalidate_schedule(sender, **kwargs):
+    """Qualquer alteração na agenda gera uma nova versão"""
+    bump_schedule_version()
+
+
+@receiver(post_save, sender=GlobalConfig)
+@receiver(post_delete, sender=GlobalConfig)
+@receiver(post_save, sender=DeviceConfig)
+@receiver(post_delete, sender=DeviceConfig)
+def invalidate_device_config(sender, signal, **kwargs):
+    """Qualquer alteração de configuração gera uma nova versão"""
+    if signal is post_delete:
+        touch_config()
+    bump_config_version()
+
+
+@receiver(post_save, sender=ComandoESP)
+@receiver(post_delete, sender=ComandoESP)
+def refresh_command_state(sender, **kwargs):
+    """O comando pendente é relido do banco somente após o commit"""
+    transaction.on_commit(sync_command)
+
+
+@receiver(post_save, sender=SirenStatus)
+@receiver(post_delete, sender=SirenStatus)
+def refresh_siren_state(sender, **kwargs):
+    """Alterações diretas de SirenStatus (ex: admin) substituem o estado em memória"""
+    transaction.on_commit(sync_siren)
@@ -0,0 +1,391 @@
+"""
+SIMULADOR DE DISPOSITIVOS ESP8266
+
+DESCRIÇÃO:
+Reproduz em Python (asyncio) a máquina de estados do firmware OTA - ESP/ESP8266_Code.ino,
+permitindo verificar o protocolo e o desempenho do servidor sem hardware:
+- inicialização: sincronização com /api/tempo e carga de /api/config
+- consulta de agendamentos (/api/comando) e de comandos manuais (/check_command/) com os
+  intervalos sugeridos pelo servidor (next_poll_ms), como scheduleDelay/commandDelay
+- activateSiren/deactivateSiren: a sirene desliga após siren_max_duration_ms
+- confirmação de comandos manuais e de toques agendados (/confirm_command/)
+- verificação de firmware (/ota/verificar + download) e do sinal de atualização
+  (/isUpdate/ + /updateConfirm/), nunca com a sirene ligada
+
+Assim como no firmware, cada dispositivo faz uma requisição por vez; milhares de
+dispositivos rodam como corrotinas em um único processo (ver run_fleet e o comando
+simular_dispositivos). verify_rings confere os toques registrados.
+"""
+
+import asyncio
+import json
+import random
+from urllib.parse import urlencode, urlsplit
+
+from .latency import percentile
+
+FIRMWARE_VERSION = '1.0.0'
+
+
+class HttpClient:
+    """Cliente HTTP/1.1 mínimo (uma conexão por requisição, como o ESP8266HTTPClient)"""
+
+    def __init__(self, base_url, concurrency=100, timeout=10):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(self, method, path, body=None, headers=None):
+        """Retorna (status, corpo em bytes); status 0 em erro de conexão ou timeout"""
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                return 0, b''
+
+    async def _request(self, method, path, body, headers):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            payload = json.dumps(body).encode() if body is not None else b''
+            lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: close']
+            if body is not None:
+                lines += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+            lines += [f'{name}: {value}' for name, value in headers.items()]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        head, _, content = response.partition(b'\r\n\r\n')
+        status = _status_code(head)
+        return status, content if status else b''
+
+    async def get_json(self, path, headers=None):
+        """Retorna (status, documento); corpo que não é JSON conta como erro (status 0)"""
+        status, content = await self.request('GET', path, headers=headers)
+        if status != 200:
+            return status, None
+        try:
+            return status, json.loads(content)
+        except ValueError:
+            return 0, None
+
+
+def _status_code(head):
+    """Código da linha de status ('HTTP/1.1 200 OK'); 0 se a resposta vier vazia ou malformada"""
+    parts = head.split(b'\r\n', 1)[0].split(b' ', 2)
+    if len(parts) < 2 or not parts[0].startswith(b'HTTP/') or not parts[1].isdigit():
+        return 0
+    return int(parts[1])
+
+
+class SimulatedDevice:
+    """Um dispositivo: mesmas variáveis e mesmo laço principal do firmware"""
+
+    def __init__(self, http, device_id, schedule_phase_ms=0, command_phase_ms=0,
+                 ota_interval_ms=3600000, firmware_version=FIRMWARE_VERSION):
+        self.http = http
+        self.device_id = device_id
+        self.firmware_version = firmware_version
+        self.ota_interval_ms = ota_interval_ms
+
+        # Valores padrão do firmware (substituídos por /api/config)
+        self.schedule_check_interval = 60000
+        self.command_check_interval = 5000
+        self.siren_min_duration = 2000
+        self.siren_max_duration = 3500
+        self.config_version = 0
+        self.schedule_version = ''
+
+        self.schedule_delay = 60000
+        self.command_delay = 5000
+        self.schedule_phase_ms = schedule_phase_ms
+        self.command_phase_ms = command_phase_ms
+
+        self.siren_active = False
+        self.siren_start = 0
+        self.siren_activated_at_ms = 0
+        self.last_command_id = ''
+
+        self.server_epoch_at_sync = None
+        self.millis_at_sync = 0
+
+        # Resultados para verify_rings
+        self.rings = []        # um dicionário por acionamento
+        self.updates = []      # versões instaladas e sinais de atualização recebidos
+        self.http_errors = {}  # caminho -> quantidade
+
+        self._t0 = None
+
+    # ---------------- relógio ----------------
+
+    def millis(self):
+        return int((asyncio.get_running_loop().time() - self._t0) * 1000)
+
+    def current_epoch_ms(self):
+        if self.server_epoch_at_sync is None:
+            return None
+        return self.server_epoch_at_sync + (self.millis() - self.millis_at_sync)
+
+    def _apply_server_time(self, server_time, request_start, request_end):
+        """Mesma compensação do firmware: metade do tempo de ida e volta"""
+        if not server_time or server_time.get('epoch_ms') is None:
+            return
+        self.server_epoch_at_sync = server_time['epoch_ms'] + (request_end - request_start) // 2
+        self.millis_at_sync = request_end
+
+    def _error(self, path):
+        self.http_errors[path] = self.http_errors.get(path, 0) + 1
+
+    @property
+    def _headers(self):
+        return {'X-Device-Id': self.device_id}
+
+    # ---------------- requisições ----------------
+
+    async def sync_server_clock(self):
+        start = self.millis()
+        status, doc = await self.http.get_json('/api/tempo')
+        if doc is None:
+            return self._error('/api/tempo')
+        self._apply_server_time(doc, start, self.millis())
+
+    async def fetch_device_config(self):
+        query = urlencode({'device_id': self.device_id, 'version': self.config_version})
+        status, doc = await self.http.get_json(f'/api/config?{query}')
+        if doc is None:
+            return self._error('/api/config')
+        if doc.get('changed'):
+            config = doc['config']
+            self.schedule_check_interval = config.get('schedule_check_interval_ms', self.schedule_check_interval)
+            self.command_check_interval = config.get('command_check_interval_ms', self.command_check_interval)
+            self.siren_min_duration = config.get('siren_min_duration_ms', self.siren_min_duration)
+            self.siren_max_duration = config.get('siren_max_duration_ms', self.siren_max_duration)
+            self.config_version = doc.get('version', self.config_version)
+
+    async def check_schedules(self):
+        start = self.millis()
+        query = urlencode({'schedule_version': self.schedule_version})
+        status, doc = await self.http.get_json(f'/api/comando?{query}', headers=self._headers)
+        if doc is None:
+            self._error('/api/comando')
+            self.schedule_delay = self.schedule_check_interval
+            return
+        self._apply_server_time(doc.get('server_time'), start, self.millis())
+        self.schedule_delay = doc.get('next_poll_ms') or self.schedule_check_interval
+        self.schedule_version = doc.get('schedule_version', self.schedule_version)
+
+        if doc.get('config_version', self.config_version) != self.config_version:
+            await self.fetch_device_config()
+
+        if doc.get('should_activate') and not self.siren_active:
+            scheduled = bool(doc.get('is_scheduled'))
+            self.activate_siren('agendamento' if scheduled else 'servidor', expected_at_ms=doc.get('expected_at_ms'))
+            if scheduled and doc.get('expected_at_ms') is not None:
+                await self.confirm_scheduled_ring(doc['expected_at_ms'])
+
+    async def check_manual_commands(self):
+        start = self.millis()
+        status, doc = await self.http.get_json('/check_command/', headers=self._headers)
+        if doc is None:
+            self._error('/check_command/')
+            self.command_delay = self.command_check_interval
+            return
+        self._apply_server_time(doc.get('server_time'), start, self.millis())
+        self.command_delay = doc.get('next_poll_ms') or self.command_check_interval
+
+        # Agenda alterada: consulta agora em vez de esperar o próximo toque
+        if doc.get('schedule_version', self.schedule_version) != self.schedule_version:
+            self.schedule_delay = 0
+        if doc.get('config_version', self.config_version) != self.config_version:
+            await self.fetch_device_config()
+
+        if doc.get('command') == 'ligar' and 'id' in doc:
+            command_id = str(doc['id'])
+            if command_id != self.last_command_id:
+                self.last_command_id = command_id
+                self.activate_siren(f"manual ({doc.get('source') or 'manual'})", command_id=command_id)
+                await self.confirm_command_execution()
+
+    async def confirm_command_execution(self):
+        body = {'device_id': self.device_id, 'activated_at': self.siren_activated_at_ms}
+        status, _ = await self.http.request('POST', '/confirm_command/', body=body)
+        if status != 200:
+            self._error('/confirm_command/')
+
+    async def confirm_scheduled_ring(self, scheduled_at_ms):
+        body = {
+            'device_id': self.device_id,
+            'source': 'schedule',
+            'scheduled_at': scheduled_at_ms,
+            'activated_at': self.siren_activated_at_ms,
+        }
+        status, _ = await self.http.request('POST', '/confirm_command/', body=body)
+        if status != 200:
+            self._error('/confirm_command/')
+
+    async def check_firmware_update(self):
+        query = urlencode({'device_id': self.device_id, 'version': self.firmware_version})
+        status, doc = await self.http.get_json(f'/ota/verificar?{query}')
+        if doc is None:
+            return self._error('/ota/verificar')
+        if doc.get('update'):
+            path = urlsplit(doc['url']).path
+            status, binary = await self.http.request('GET', path)
+            if status != 200 or len(binary) != doc.get('size', len(binary)):
+                return self._error(path)
+            self.firmware_version = doc['version']
+            self.updates.append(('firmware', doc['version']))
+
+        # Sinal de modo de atualização (update_alarm → isUpdate → updateConfirm)
+        status, doc = await self.http.get_json('/isUpdate/')
+        if doc is not None and doc.get('update') == 'modoUpdate':
+            status, _ = await self.http.request('POST', '/updateConfirm/')
+            if status != 200:
+                return self._error('/updateConfirm/')
+            self.updates.append(('modo_update', None))
+
+    # ---------------- sirene ----------------
+
+    def activate_siren(self, source, expected_at_ms=None, command_id=None):
+        self.siren_active = True
+        self.siren_start = self.millis()
+        self.siren_activated_at_ms = self.current_epoch_ms()
+        self.rings.append({
+            'source': source,
+            'activated_at_ms': self.siren_activated_at_ms,
+            'expected_at_ms': expected_at_ms,
+            'command_id': command_id,
+            'duration_ms': None,
+        })
+
+    def deactivate_siren(self, reason):
+        self.siren_active = False
+        self.rings[-1]['duration_ms'] = self.millis() - self.siren_start
+        self.rings[-1]['reason'] = reason
+
+    # ---------------- laço principal ----------------
+
+    async def run(self, duration_s):
+        """setup() e loop() do firmware por duration_s segundos (mais o fim do toque em curso)"""
+        self._t0 = asyncio.get_running_loop().time()
+        await self.sync_server_clock()
+        await self.fetch_device_config()
+
+        end = self.millis() + int(duration_s * 1000)
+        last_schedule = self.millis() - self.schedule_delay + self.schedule_phase_ms
+        last_command = self.millis() - self.command_delay + self.command_phase_ms
+        last_ota = self.millis()
+
+        while self.millis() < end or self.siren_active:
+            now = self.millis()
+            if self.siren_active and now - self.siren_start >= self.siren_max_duration:
+                self.deactivate_siren('timeout_seguranca')
+
+            if now < end:
+                if now - last_schedule >= self.schedule_delay:
+                    last_schedule = now
+                    await self.check_schedules()
+                if now - last_command >= self.command_delay:
+                    last_command = now
+                    await self.check_manual_commands()
+                if now - last_ota >= self.ota_interval_ms and not self.siren_active:
+                    last_ota = now
+                    await self.check_firmware_update()
+
+            # Em vez de girar como o loop() do firmware, dorme até o próximo evento
+            now = self.millis()
+            due = [end, last_schedule + self.schedule_delay, last_command + self.command_delay]
+            if self.siren_active:
+                due.append(self.siren_start + self.siren_max_duration)
+            await asyncio.sleep(max(1, min(due) - now) / 1000)
+
+
+async def run_fleet(base_url, count, duration_s, concurrency=100, seed=1, phases=True, **device_options):
+    """
+    Executa count dispositivos simultâneos contra base_url. Com phases, cada dispositivo
+    começa em um ponto diferente dos intervalos padrão (como dispositivos ligados em
+    horários diferentes). Retorna a lista de SimulatedDevice.
+    """
+    http = HttpClient(base_url, concurrency=concurrency)
+    rng = random.Random(seed)
+    devices = [
+        SimulatedDevice(
+            http,
+            f'sim-{index:05d}',
+            schedule_phase_ms=rng.randrange(60000) if phases else 0,
+            command_phase_ms=rng.randrange(5000) if phases else 0,
+            **device_options,
+        )
+        for index in range(count)
+    ]
+    await asyncio.gather(*(device.run(duration_s) for device in devices))
+    return devices
+
+
+def verify_rings(devices, expected_rings_ms=(), max_lateness_ms=2000, duration_tolerance_ms=1000):
+    """
+    Confere os toques dos dispositivos simulados e retorna um resumo com a lista 'problems':
+    - cada toque agendado esperado (ms desde a época) ocorre exatamente uma vez por dispositivo,
+      até max_lateness_ms após o início do minuto
+    - nenhum toque agendado fora dos esperados
+    - cada comando manual é executado no máximo uma vez por dispositivo
+    - a sirene fica ligada entre a duração mínima e a máxima (+ duration_tolerance_ms)
+    - nenhuma requisição falhou
+    """
+    expected = set(expected_rings_ms)
+    problems = []
+    lateness = []
+    manual = {}
+    http_errors = {}
+
+    for device in devices:
+        scheduled = {}
+        for ring in device.rings:
+            if ring['source'] == 'agendamento':
+                scheduled.setdefault(ring['expected_at_ms'], []).append(ring)
+            elif ring['command_id'] is not None:
+                manual.setdefault(ring['command_id'], []).append(device.device_id)
+
+            duration = ring['duration_ms']
+            if duration is not None and not (
+                device.siren_min_duration <= duration <= device.siren_max_duration + duration_tolerance_ms
+            ):
+                problems.append(f"{device.device_id}: sirene ligada por {duration} ms ({ring['source']})")
+
+        for expected_at, rings in scheduled.items():
+            if expected_at not in expected:
+                problems.append(f"{device.device_id}: toque agendado inesperado ({expected_at})")
+            if len(rings) > 1:
+                problems.append(f"{device.device_id}: toque {expected_at} repetido {len(rings)} vezes")
+            for ring in rings:
+                late = ring['activated_at_ms'] - expected_at
+                lateness.append(late)
+                if not -duration_tolerance_ms <= late <= max_lateness_ms:
+                    problems.append(f"{device.device_id}: toque {expected_at} com atraso de {late} ms")
+        for expected_at in expected - scheduled.keys():
+            problems.append(f"{device.device_id}: toque {expected_at} não ocorreu")
+
+        for path, errors in device.http_errors.items():
+            http_errors[path] = http_errors.get(path, 0) + errors
+
+    for command_id, device_ids in manual.items():
+        if len(device_ids) != len(set(device_ids)):
+            problems.append(f"comando {command_id} executado mais de uma vez por um dispositivo")
+    if http_errors:
+        problems.append(f"requisições com erro: {http_errors}")
+
+    lateness.sort()
+    return {
+        'devices': len(devices),
+        'rings': sum(len(device.rings) for device in devices),
+        'scheduled_rings': len(lateness),
+        'lateness_p50_ms': percentile(lateness, 50),
+        'lateness_p95_ms': percentile(lateness, 95),
+        'lateness_max_ms': lateness[-1] if lateness else None,
+        'manual_commands': {command_id: len(ids) for command_id, ids in manual.items()},
+        'http_errors': http_errors,
+        'problems': problems,
+    }
@@ -0,0 +1,261 @@
+"""
+ESTADO DA SIRENE EM MEMÓRIA (COM GRAVAÇÃO EM SEGUNDO PLANO)
+
+DESCRIÇÃO:
+Estado consultado a cada requisição dos dispositivos (sirene ligada, comando pendente,
+modo de atualização), mantido em memória para que comando_esp, check_command e isUpdate
+não consultem SirenStatus/ComandoESP no banco.
+
+FUNCIONAMENTO:
+- SirenState é uma tupla imutável publicada por substituição da referência: a leitura
+  (current_state) não usa trava; cada requisição confere apenas a geração no cache
+- Toda alteração publica o estado inteiro no cache do Django com uma nova geração; os
+  demais processos (workers do Gunicorn) detectam a geração diferente e carregam o novo
+  estado do cache. Leitura do banco e publicação acontecem sob a trava da sirene entre
+  processos (lock_siren_row): a última publicação sempre reflete o último commit
+- O estado publicado vale SIREN_STATE_TTL segundos; depois é reconstruído do banco, o
+  que corrige qualquer publicação perdida ou fora de ordem O cache padrão é um FileBasedCache no disco local, visto por todos os
+  processos; a LocMemCache só vale dentro do processo e é recusada com SERVER_PROCESSES > 1
+  (ver app/checks.py)
+- O comando pendente e o modo de atualização vêm de ComandoESP, que continua sendo gravado
+  na transação de cada view: os sinais de app/signals.py sincronizam o estado após o commit
+- O estado da sirene (SirenStatus) e o último acionamento de cada dispositivo
+  (DeviceSirenState) são gravados em segundo plano a cada SIREN_STATE_SNAPSHOT_INTERVAL
+  segundos (0 = imediatamente, ex: testes) e ao encerrar o processo (atexit)
+- Recuperação: sem estado no cache (reinício, cache limpo) o estado é reconstruído a
+  partir do banco com duas consultas
+"""
+
+import atexit
+import logging
+import threading
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from .latency import epoch_ms, from_epoch_ms
+from .models import ComandoESP, DeviceSirenState, SirenStatus
+from .ratelimit import lock_siren_row
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = 'estado:sirene'
+STATE_GENERATION_KEY = 'estado:geracao'
+DEVICE_KEY = 'estado:dispositivo:{}'
+
+SirenState = namedtuple('SirenState', (
+    'generation',
+    'siren_on', 'last_activated_ms',                           # SirenStatus
+    'command_id', 'command', 'source', 'issued_at_ms', 'update_mode',  # ComandoESP atual
+))
+DeviceState = namedtuple('DeviceState', ('last_activation_ms', 'last_command_id'))
+
+EMPTY_STATE = SirenState(None, False, None, None, None, None, None, None)
+
+_local = EMPTY_STATE  # Estado publicado neste processo (nunca alterado, apenas substituído)
+_write_lock = threading.RLock()
+
+
+def command_fields(comando):
+    """Campos de SirenState correspondentes ao ComandoESP atual (ou à ausência dele)"""
+    if comando is None:
+        return {'command_id': None, 'command': None, 'source': None, 'issued_at_ms': None, 'update_mode': None}
+    return {
+        'command_id': comando.pk,
+        'command': comando.comando,
+        'source': comando.source,
+        'issued_at_ms': epoch_ms(comando.timestamp),
+        'update_mode': comando.update,
+    }
+
+
+def _siren_fields(status):
+    if status is None:
+        return {'siren_on': False, 'last_activated_ms': None}
+    return {'siren_on': status.is_on, 'last_activated_ms': epoch_ms(status.last_activated)}
+
+
+def _from_database():
+    """Reconstrói o estado a partir do banco (início do processo ou cache perdido)"""
+    return EMPTY_STATE._replace(
+        **_siren_fields(SirenStatus.objects.order_by('pk').first()),
+        **command_fields(ComandoESP.objects.order_by('pk').first()),
+    )
+
+
+@contextmanager
+def _shared_lock():
+    """Trava entre processos (e threads) para ler o banco e publicar o estado"""
+    with _write_lock, transaction.atomic():
+        lock_siren_row()
+        yield
+
+
+def _publish(state):
+    """Publica o estado com uma nova geração no cache e neste processo (sob _shared_lock)"""
+    global _local
+    state = state._replace(generation=uuid.uuid4().hex)
+    timeout = getattr(settings, 'SIREN_STATE_TTL', 30)
+    cache.set_many({STATE_KEY: state, STATE_GENERATION_KEY: state.generation}, timeout)
+    _local = state
+    return state
+
+
+def _shared_state(generation):
+    """Estado publicado no cache para a geração informada (ou None)"""
+    shared = cache.get(STATE_KEY) if generation is not None else None
+    if shared is not None and shared.generation == generation:
+        return shared
+    return None
+
+
+def current_state():
+    """Estado atual; sem trava e sem banco enquanto a geração no cache não mudar"""
+    global _local
+    state = _local
+    generation = cache.get(STATE_GENERATION_KEY)
+    if generation is not None and generation == state.generation:
+        return state
+
+    shared = _shared_state(generation)
+    if shared is None:
+        with _shared_lock():
+            # Outro processo pode ter publicado enquanto esta thread aguardava a trava
+            shared = _shared_state(cache.get(STATE_GENERATION_KEY))
+            if shared is None:
+                return _publish(_from_database())
+    _local = shared
+    return shared
+
+
+def update_state(persist=False, **changes):
+    """
+    Altera campos do estado e publica a nova versão. Com persist=True os campos da
+    sirene são gravados em SirenStatus pela gravação em segundo plano.
+    """
+    with _shared_lock():
+        state = _publish(current_state()._replace(**changes))
+    if persist:
+        snapshots.mark_siren_dirty()
+    return state
+
+
+def sync_command():
+    """Relê o comando atual do banco (chamado pelos sinais após alterações em ComandoESP)"""
+    with _shared_lock():
+        return update_state(**command_fields(ComandoESP.objects.order_by('pk').first()))
+
+
+def sync_siren():
+    """Relê SirenStatus do banco (chamado pelos sinais após alterações fora deste módulo, ex: admin)"""
+    with _shared_lock():
+        return update_state(**_siren_fields(SirenStatus.objects.order_by('pk').first()))
+
+
+def mark_siren_on(now):
+    """Sirene acionada manualmente: estado imediato, gravação em SirenStatus em segundo plano"""
+    return update_state(persist=True, siren_on=True, last_activated_ms=epoch_ms(now))
+
+
+def record_device_activation(device_id, activated_at, command_id=None):
+    """Registra o último acionamento informado por um dispositivo"""
+    state = DeviceState(epoch_ms(activated_at), str(command_id or ''))
+    cache.set(DEVICE_KEY.format(device_id), state, None)
+    snapshots.mark_device_dirty(device_id, state)
+    return state
+
+
+def device_state(device_id):
+    """Último acionamento do dispositivo (cache; banco apenas se o cache não o tiver)"""
+    state = cache.get(DEVICE_KEY.format(device_id))
+    if state is None:
+        row = DeviceSirenState.objects.filter(device_id=device_id).first()
+        if row is None:
+            return None
+        last_activation_ms = epoch_ms(row.last_activation) if row.last_activation else None
+        state = DeviceState(last_activation_ms, row.last_command_id)
+        cache.set(DEVICE_KEY.format(device_id), state, None)
+    return state
+
+
+class StateSnapshotWriter:
+    """Grava em segundo plano as partes do estado que só existem em memória"""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._siren_dirty = False
+        self._devices = {}
+        self._thread = None
+        self._wakeup = threading.Event()
+
+    def mark_siren_dirty(self):
+        with self._lock:
+            self._siren_dirty = True
+        self._schedule()
+
+    def mark_device_dirty(self, device_id, state):
+        with self._lock:
+            self._devices[device_id] = state
+        self._schedule()
+
+    def _schedule(self):
+        if not getattr(settings, 'SIREN_STATE_SNAPSHOT_INTERVAL', self.interval):
+            self.flush()
+            return
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='siren-state-writer', daemon=True)
+                    self._thread.start()
+
+    def flush(self):
+        """Grava imediatamente o que estiver pendente"""
+        with self._lock:
+            siren_dirty, self._siren_dirty = self._siren_dirty, False
+            devices, self._devices = self._devices, {}
+        try:
+            if siren_dirty:
+                self._write_siren(_local)
+            if devices:
+                DeviceSirenState.objects.bulk_create(
+                    [
+                        DeviceSirenState(
+                            device_id=device_id,
+                            last_activation=from_epoch_ms(state.last_activation_ms),
+                            last_command_id=state.last_command_id,
+                        )
+                        for device_id, state in devices.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['device_id'],
+                    update_fields=['last_activation', 'last_command_id'],
+                )
+        except Exception:
+            logger.exception("Falha ao gravar o estado da sirene")
+
+    def _write_siren(self, state):
+        """Atualiza a linha existente de SirenStatus (nunca duplica o status)"""
+        fields = {'is_on': state.siren_on}
+        if state.last_activated_ms is not None:
+            fields['last_activated'] = from_epoch_ms(state.last_activated_ms)
+        pk = SirenStatus.objects.order_by('pk').values_list('pk', flat=True).first()
+        if pk is None:
+            SirenStatus.objects.create(pk=1, **fields)
+        else:
+            # update() não dispara sinais: o estado em memória já é o mais recente
+            SirenStatus.objects.filter(pk=pk).update(**fields)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            close_old_connections()
+            self.flush()
+
+
+snapshots = StateSnapshotWriter(interval=getattr(settings, 'SIREN_STATE_SNAPSHOT_INTERVAL', 5.0))
+atexit.register(snapshots.flush)
@@ -1,3 +1,1066 @@
-from django.test import TestCase
+"""
+TESTES DO SISTEMA DE SIRENE ESCOLAR
 
-# Create your tests here.
+DESCRIÇÃO:
+Testes automatizados executados com `python manage.py test`.
+
+CASOS COBERTOS:
+- TokenBucketTests: recarga e consumo do limitador de taxa
+- ManualActivationConcurrencyTests: ativação manual sob acesso concorrente
+- ManualActivationMultiProcessTests: ativação manual em processos separados (como workers do Gunicorn)
+- DeviceSimulatorTests: protocolo completo com dispositivos simulados (app/simulator.py)
+- HotViewQueryPlanTests: número de consultas e plano (EXPLAIN QUERY PLAN) das views mais acessadas
+- ScheduleVersionTests: versão da agenda igual entre processos e após alterações
+- ConfigVersionTests: versão da configuração derivada do banco e cache por dispositivo limitado
+- NextPollTests: limites do intervalo de consulta adaptativo
+- SensorDataExportTests: exportação das leituras em uma única consulta (NDJSON e array JSON)
+- ServerClockTests: horário e fuso enviados aos dispositivos, próxima mudança de horário de verão
+- InputValidationTests: parâmetros inválidos respondem 400 (nunca 500)
+- FirmwareOtaTests: liberação gradual (sem rebaixar versões) e download com ETag/Range
+- DeviceProfileTests: o perfil dos dispositivos não importa as views da interface web
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.servers.basehttp import WSGIServer
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import (
+    Client, LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.test.testcases import LiveServerThread
+from django.utils import timezone
+
+from . import views
+from .checks import check_shared_cache
+from .clock import _next_transition, clock_payload
+from .deploy import graceful_swap, incompatible_operations, read_pid
+from .events import RingEventWriter
+from .latency import epoch_ms
+from . import config as device_config
+from . import export
+from . import state as siren_state
+from .models import (
+    AlarmSchedule, ComandoESP, Device, DeviceConfig, FirmwareRelease, GlobalConfig, RingEvent, Sensor, SensorData,
+    SirenStatus, SirenThrottle,
+)
+from .ota import rollout_bucket, target_release
+from .polling import next_poll_ms
+from .schedule import SCHEDULE_VERSION_KEY, schedule_version
+from .ratelimit import RateLimiter, TokenBucket
+from .simulator import HttpClient, run_fleet, verify_rings
+
+
+class FakeClock:
+    """Relógio controlado manualmente para os testes do limitador"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_consumes_until_empty_and_refills(self):
+        clock = FakeClock()
+        bucket = TokenBucket(capacity=2, period=10, clock=clock)
+
+        self.assertTrue(bucket.allow())
+        self.assertTrue(bucket.allow())
+        self.assertFalse(bucket.allow())
+        self.assertAlmostEqual(bucket.retry_after(), 5)
+
+        clock.now = 5
+        self.assertTrue(bucket.allow())
+        self.assertFalse(bucket.allow())
+
+    def test_keys_are_independent(self):
+        limiter = RateLimiter(capacity=1, period=60, clock=FakeClock())
+
+        self.assertTrue(limiter.allow('user:1'))
+        self.assertFalse(limiter.allow('user:1'))
+        self.assertTrue(limiter.allow('user:2'))
+
+    def test_idle_buckets_are_evicted(self):
+        clock = FakeClock()
+        limiter = RateLimiter(capacity=1, period=60, clock=clock)
+        for n in range(100):
+            limiter.allow(f'ip:{n}')
+        self.assertEqual(len(limiter), 100)
+
+        clock.now = 61
+        self.assertTrue(limiter.allow('ip:0'))
+        self.assertEqual(len(limiter), 1)
+
+
+@override_settings(RING_EVENT_ASYNC=False, ACTIVATION_COALESCE_SECONDS=5, SIREN_STATE_SNAPSHOT_INTERVAL=0)
+class ManualActivationConcurrencyTests(TransactionTestCase):
+    """Dispara /ativar/ a partir de várias threads e verifica as invariantes"""
+
+    THREADS = 25
+
+    def setUp(self):
+        cache.clear()  # Estado da sirene e chaves de idempotência de cada teste
+        patcher_user = mock.patch.object(views, 'user_rate_limiter', RateLimiter(5, 60))
+        patcher_user.start()
+        self.addCleanup(patcher_user.stop)
+
+    def _hammer(self, count, clients=3, **extra):
+        """Envia count requisições simultâneas de `clients` endereços e retorna as respostas"""
+        barrier = threading.Barrier(count)
+        responses = [None] * count
+
+        def worker(index):
+            try:
+                client = Client(REMOTE_ADDR=f'10.0.0.{index % clients}')
+                body = {'device_id': f'esp-{index}'}
+                barrier.wait()
+                responses[index] = client.post('/ativar/', body, content_type='application/json', **extra)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_concurrent_clicks_ring_once(self):
+        responses = self._hammer(self.THREADS)
+
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+        command_ids = {r.json()['command_id'] for r in responses}
+        self.assertEqual(len(command_ids), 1)
+        self.assertEqual(sum(not r.json()['coalesced'] for r in responses), 1)
+        self.assertEqual(ComandoESP.objects.filter(comando='ligar').count(), 1)
+        self.assertEqual(SirenStatus.objects.count(), 1)
+        self.assertTrue(SirenStatus.objects.get().is_on)
+        self.assertEqual(RingEvent.objects.filter(outcome=RingEvent.Outcome.ISSUED).count(), 1)
+
+    def test_existing_status_row_is_reused(self):
+        SirenStatus.objects.create(pk=7, is_on=False)
+
+        self._hammer(self.THREADS)
+
+        self.assertEqual(list(SirenStatus.objects.values_list('pk', 'is_on')), [(7, True)])
+
+    @override_settings(ACTIVATION_COALESCE_SECONDS=0)
+    def test_idempotency_key_returns_same_command(self):
+        responses = self._hammer(self.THREADS, HTTP_IDEMPOTENCY_KEY='clique-123')
+
+        self.assertEqual(len({r.json()['command_id'] for r in responses}), 1)
+        self.assertEqual(ComandoESP.objects.count(), 1)
+        self.assertEqual(ComandoESP.objects.get().idempotency_key, 'clique-123')
+
+    @override_settings(ACTIVATION_COALESCE_SECONDS=0)
+    def test_idempotency_key_outlives_command_row(self):
+        client = Client()
+        first = client.post('/ativar/', content_type='application/json', HTTP_IDEMPOTENCY_KEY='clique-1').json()
+        second = client.post('/ativar/', content_type='application/json', HTTP_IDEMPOTENCY_KEY='clique-2').json()
+        self.assertFalse(ComandoESP.objects.filter(pk=first['command_id']).exists())
+
+        # Reenvio do primeiro clique após o segundo acionamento: não toca de novo
+        retry = client.post('/ativar/', content_type='application/json', HTTP_IDEMPOTENCY_KEY='clique-1').json()
+        self.assertEqual(retry, {'status': 'success', 'command_id': first['command_id'], 'coalesced': True})
+        self.assertEqual(list(ComandoESP.objects.values_list('pk', flat=True)), [second['command_id']])
+
+    @override_settings(ACTIVATION_COALESCE_SECONDS=0)
+    def test_user_limit_uses_forwarded_client_ip(self):
+        with mock.patch.object(views, 'user_rate_limiter', RateLimiter(1, 60)):
+            proxy = {'REMOTE_ADDR': '127.0.0.1'}
+            first = Client(HTTP_X_FORWARDED_FOR='192.168.0.10', **proxy).post('/ativar/')
+            again = Client(HTTP_X_FORWARDED_FOR='1.2.3.4, 192.168.0.10', **proxy).post('/ativar/')
+            other = Client(HTTP_X_FORWARDED_FOR='192.168.0.11', **proxy).post('/ativar/')
+
+        self.assertEqual([first.status_code, again.status_code, other.status_code], [200, 429, 200])
+
+    @override_settings(ACTIVATION_COALESCE_SECONDS=0, ACTIVATION_RATE_LIMIT_SIREN=(10, 60))
+    def test_global_siren_rate_limit(self):
+        # Cada requisição com um IP e um device_id diferentes: o limite é o da sirene
+        responses = self._hammer(self.THREADS, clients=self.THREADS)
+
+        created = [r for r in responses if r.status_code == 200]
+        limited = [r for r in responses if r.status_code == 429]
+        self.assertEqual(len(created), 10)
+        self.assertEqual(len(limited), self.THREADS - 10)
+        self.assertTrue(all(int(r['Retry-After']) >= 1 for r in limited))
+        self.assertEqual(ComandoESP.objects.count(), 1)
+        self.assertEqual(SirenStatus.objects.count(), 1)
+
+
+
+ACTIVATION_WORKER = """
+import sys, time, django
+django.setup()
+from django.test import Client
+start_at, index = float(sys.argv[1]), int(sys.argv[2])
+client = Client(REMOTE_ADDR=f'10.1.0.{index}')
+client.get('/api/tempo')  # Carrega URLconf e views antes da largada
+time.sleep(max(0, start_at - time.time()))
+response = client.post('/ativar/', {'device_id': f'esp-{index}'}, content_type='application/json')
+print(response.status_code, response.content.decode())
+"""
+
+
+class ManualActivationMultiProcessTests(SimpleTestCase):
+    """
+    Cliques simultâneos atendidos por processos diferentes (banco SQLite em arquivo e cache
+    em disco compartilhados): as travas do processo não valem, só a do banco
+    """
+
+    PROCESSES = 6
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        with open(f'{self.tmp}/settings_multiprocesso.py', 'w') as arquivo:
+            arquivo.write(
+                'from SchoolBuzzer.settings import *\n'
+                f"DATABASES = {{'default': {{'ENGINE': 'django.db.backends.sqlite3', 'NAME': r'{self.tmp}/db.sqlite3'}}}}\n"
+                "CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', "
+                f"'LOCATION': r'{self.tmp}/cache'}}}}\n"
+                'RING_EVENT_ASYNC = False\n'
+                'SIREN_STATE_SNAPSHOT_INTERVAL = 0\n'
+            )
+        self.env = {
+            **os.environ,
+            'PYTHONPATH': os.pathsep.join([self.tmp, str(settings.BASE_DIR)]),
+            'DJANGO_SETTINGS_MODULE': 'settings_multiprocesso',
+        }
+        subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'migrate', '-v', '0'],
+            env=self.env, check=True,
+        )
+
+    def test_concurrent_clicks_in_separate_processes_ring_once(self):
+        start_at = time.time() + 3
+        workers = [
+            subprocess.Popen(
+                [sys.executable, '-c', ACTIVATION_WORKER, str(start_at), str(index)],
+                env=self.env, stdout=subprocess.PIPE, text=True,
+            )
+            for index in range(self.PROCESSES)
+        ]
+        results = [worker.communicate(timeout=60)[0].split(' ', 1) for worker in workers]
+
+        self.assertEqual([status for status, _ in results], ['200'] * self.PROCESSES, results)
+        bodies = [json.loads(body) for _, body in results]
+        self.assertEqual(len({body['command_id'] for body in bodies}), 1)
+        self.assertEqual(sum(not body['coalesced'] for body in bodies), 1)
+        with sqlite3.connect(f'{self.tmp}/db.sqlite3') as db:
+            self.assertEqual(db.execute('SELECT COUNT(*) FROM app_comandoesp').fetchone(), (1,))
+
+class SerialWSGIServer(WSGIServer):
+    """Atende uma requisição por vez: o banco SQLite em memória dos testes usa uma única conexão"""
+
+    def __init__(self, *args, connections_override=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+class SerialLiveServerThread(LiveServerThread):
+    server_class = SerialWSGIServer
+
+
+@override_settings(RING_EVENT_ASYNC=False, POLL_MIN_MS=200)
+class DeviceSimulatorTests(LiveServerTestCase):
+    """Dispositivos simulados contra o servidor real: toque agendado, comando manual e OTA"""
+
+    DEVICES = 10
+    server_thread_class = SerialLiveServerThread
+
+    def setUp(self):
+        cache.clear()
+
+        # Desloca o relógio do servidor para logo após o início de um minuto, como um
+        # dispositivo que segue next_poll_ms (POLL_RING_MARGIN_MS)
+        real_now = timezone.now
+        start = real_now()
+        offset = timedelta(seconds=60 - start.second, microseconds=300000 - start.microsecond)
+        patcher = mock.patch('django.utils.timezone.now', lambda: real_now() + offset)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.now = timezone.localtime(timezone.now())
+        self.ring_at = self.now.replace(second=0, microsecond=0)
+        AlarmSchedule.objects.create(
+            event_type=AlarmSchedule.EventType.INICIO_AULA,
+            time=self.ring_at.time(),
+            days_of_week='SEG,TER,QUA,QUI,SEX,SAB,DOM',
+            start_date=date(2000, 1, 1),
+            end_date=date(2100, 1, 1),
+        )
+        GlobalConfig.objects.create(
+            api_key='teste',
+            command_check_interval_ms=300,
+            siren_min_duration_ms=500,
+            siren_max_duration_ms=800,
+        )
+
+    def _run(self, duration_s, activate_after_s=None):
+        """Executa os dispositivos; opcionalmente aciona /ativar/ durante a simulação"""
+        async def scenario():
+            fleet = asyncio.ensure_future(run_fleet(
+                self.live_server_url, self.DEVICES, duration_s, concurrency=4, phases=False, ota_interval_ms=1500,
+            ))
+            if activate_after_s is not None:
+                await asyncio.sleep(activate_after_s)
+                status, _ = await HttpClient(self.live_server_url).request('POST', '/ativar/', body={})
+                self.assertEqual(status, 200)
+            return await fleet
+        return asyncio.run(scenario())
+
+    def test_scheduled_and_manual_rings(self):
+        devices = self._run(2.5, activate_after_s=1)
+        report = verify_rings(devices, expected_rings_ms=[epoch_ms(self.ring_at)])
+
+        self.assertEqual(report['problems'], [])
+        self.assertEqual(report['scheduled_rings'], self.DEVICES)
+        self.assertEqual(len(report['manual_commands']), 1)
+        self.assertEqual(
+            RingEvent.objects.filter(source=RingEvent.Source.SCHEDULE, outcome=RingEvent.Outcome.CONFIRMED).count(),
+            self.DEVICES,
+        )
+        self.assertTrue(RingEvent.objects.filter(source=RingEvent.Source.WEB, outcome=RingEvent.Outcome.CONFIRMED).exists())
+
+    def test_update_flag_is_acknowledged(self):
+        ComandoESP.objects.create(update='modoUpdate')
+
+        devices = self._run(2)
+
+        self.assertEqual(verify_rings(devices, expected_rings_ms=[epoch_ms(self.ring_at)])['problems'], [])
+        self.assertTrue(any(('modo_update', None) in device.updates for device in devices))
+        self.assertEqual(ComandoESP.objects.get().update, 'modoNormal')
+
+
+class HttpClientTests(SimpleTestCase):
+    """Respostas vazias ou malformadas viram status 0 em vez de derrubar a frota"""
+
+    def _request(self, reply):
+        async def scenario():
+            async def handle(reader, writer):
+                await reader.readuntil(b'\r\n\r\n')
+                writer.write(reply)
+                await writer.drain()
+                writer.close()
+
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                http = HttpClient(f'http://127.0.0.1:{port}', timeout=2)
+                return await asyncio.gather(http.request('GET', '/'), http.get_json('/'))
+        return asyncio.run(scenario())
+
+    def test_valid_response(self):
+        reply = b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n{"ok": true}'
+        self.assertEqual(self._request(reply), [(200, b'{"ok": true}'), (200, {'ok': True})])
+
+    def test_empty_or_malformed_response(self):
+        for reply in (b'', b'HTTP/1.1', b'lixo\r\n\r\n', b'HTTP/1.1 abc OK\r\n\r\n',
+                      b'HTTP/1.1 200 OK\r\n\r\n{"trunc'):
+            with self.subTest(reply=reply):
+                (status, _), (json_status, doc) = self._request(reply)
+                self.assertEqual(json_status, 0)
+                self.assertIsNone(doc)
+                if not reply.endswith(b'trunc'):
+                    self.assertEqual(status, 0)
+
+
+FULL_SCAN = re.compile(r'^SCAN (\S+)$')  # Leitura da tabela inteira, sem índice
+
+
+def query_plan(sql):
+    """Linhas do EXPLAIN QUERY PLAN (SQLite) de uma consulta já com os parâmetros"""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN é específico do SQLite')
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class HotViewQueryPlanTests(TestCase):
+    """
+    Número de consultas e plano das views mais acessadas. Falha se surgir uma consulta
+    a mais ou uma leitura completa de tabela em consulta com filtro (WHERE).
+    """
+
+    def setUp(self):
+        for hour in (7, 9, 12):
+            AlarmSchedule.objects.create(
+                event_type=AlarmSchedule.EventType.INICIO_AULA,
+                time=f'{hour:02d}:00',
+                days_of_week='SEG,TER,QUA,QUI,SEX,SAB,DOM',
+                start_date=date(2000, 1, 1),
+                end_date=date(2100, 1, 1),
+            )
+        AlarmSchedule.objects.filter(time='12:00').update(active=False)
+        GlobalConfig.objects.create(api_key='teste')
+        ComandoESP.objects.create(comando='ligar', source='web')
+        SirenThrottle.objects.create(pk=1)
+        cache.clear()  # Agenda e estado da sirene lidos do banco na primeira requisição
+
+    def _get(self, url, expected_queries):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), expected_queries, [query['sql'] for query in queries])
+        self.assertNoFullScan(queries)
+        return response
+
+    def assertNoFullScan(self, queries):
+        for query in queries:
+            if ' WHERE ' not in query['sql']:
+                continue  # Sem filtro, a tabela inteira (ou a primeira linha) é o resultado
+            plan = query_plan(query['sql'])
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+            self.assertEqual(scans, [], f"{query['sql']}\n{plan}")
+
+    def test_comando_esp(self):
+        # Versão e agenda do dia, SirenStatus e ComandoESP sob a trava da sirene (savepoint,
+        # UPDATE e liberação) e versão da configuração (2)
+        self._get('/api/comando', expected_queries=9)
+        self._get('/api/comando', expected_queries=0)
+
+    def test_check_command(self):
+        # SirenStatus e ComandoESP sob a trava da sirene (+3), versão (2) e GlobalConfig da
+        # configuração, versão da agenda
+        response = self._get('/check_command/', expected_queries=9)
+        self.assertEqual(response.json()['command'], 'ligar')
+        self._get('/check_command/', expected_queries=0)
+
+    def test_home_view(self):
+        response = self._get('/', expected_queries=2)  # Versão e agenda do dia
+        self.assertEqual(len(response.context['alarms']), 2)
+        self._get('/', expected_queries=0)
+
+    def test_alarm_list_view(self):
+        response = self._get('/agendamentos/', expected_queries=1)
+        self.assertEqual([str(alarm.time) for alarm in response.context['alarms']], ['07:00:00', '09:00:00', '12:00:00'])
+
+    def test_today_schedule_uses_partial_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/')
+        agenda = next(query['sql'] for query in queries if ' WHERE ' in query['sql'])
+        self.assertIn('USING INDEX alarm_active_time_dates_idx', ' '.join(query_plan(agenda)))
+
+    def test_activation_coalescing_uses_command_index(self):
+        with mock.patch.object(views, 'user_rate_limiter', RateLimiter(5, 60)), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/ativar/', content_type='application/json')
+        self.assertTrue(response.json()['coalesced'])
+        self.assertNoFullScan(queries)
+        plans = ' '.join(line for query in queries for line in query_plan(query['sql']))
+        self.assertIn('comandoesp_comando_ts_idx', plans)
+
+
+
+class SirenStateTests(TestCase):
+    """Estado da sirene publicado no cache: leitura do banco sob a trava e validade curta"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sync_reads_command_under_shared_lock(self):
+        ComandoESP.objects.create(comando='ligar', source='web')
+        with CaptureQueriesContext(connection) as queries:
+            state = siren_state.sync_command()
+        self.assertEqual(state.command, 'ligar')
+
+        sql = [query['sql'] for query in queries]
+        lock = next(i for i, q in enumerate(sql) if q.startswith('UPDATE "app_sirenthrottle"'))
+        read = next(i for i, q in enumerate(sql) if 'FROM "app_comandoesp"' in q)
+        self.assertLess(lock, read)
+
+    @override_settings(SIREN_STATE_TTL=1)
+    def test_stale_publish_expires(self):
+        # Publicação fora de ordem (ex: confirmação concorrente): o banco não tem comando
+        siren_state.update_state(command='ligar', command_id=99)
+        self.assertEqual(siren_state.current_state().command, 'ligar')
+
+        time.sleep(1.1)
+        self.assertIsNone(siren_state.current_state().command)
+
+
+class ScheduleVersionTests(TestCase):
+    """A versão da agenda vem do banco: é a mesma em qualquer processo e muda a cada alteração"""
+
+    def _alarm(self, hour):
+        return AlarmSchedule(
+            event_type=AlarmSchedule.EventType.INICIO_AULA,
+            time=f'{hour:02d}:00',
+            days_of_week='SEG,TER,QUA,QUI,SEX,SAB,DOM',
+            start_date=date(2000, 1, 1),
+            end_date=date(2100, 1, 1),
+        )
+
+    def _painel(self):
+        return self.client.get('/api/painel').json()
+
+    def test_version_is_shared_and_follows_changes(self):
+        cache.clear()
+        vazia = self._painel()
+        self.assertEqual(vazia['alarms'], [])
+
+        # Outro processo inclui um agendamento: sem sinal neste processo, a alteração
+        # aparece quando a versão em cache expira (aqui, removida)
+        AlarmSchedule.objects.bulk_create([self._alarm(7)])
+        self.assertEqual(self._painel()['version'], vazia['version'])
+        cache.delete(SCHEDULE_VERSION_KEY)
+        painel = self._painel()
+        self.assertEqual(len(painel['alarms']), 1)
+        self.assertNotEqual(painel['version'], vazia['version'])
+
+        # Um processo novo (cache vazio) chega à mesma versão
+        cache.clear()
+        self.assertEqual(schedule_version(), painel['version'])
+
+    def test_signals_invalidate_after_commit(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            alarm = self._alarm(8)
+            alarm.save()
+        self.assertEqual(len(self._painel()['alarms']), 1)
+        antes = schedule_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alarm.delete()
+        self.assertEqual(self._painel()['alarms'], [])
+        self.assertNotEqual(schedule_version(), antes)
+
+    def test_command_channel_reports_schedule_version(self):
+        cache.clear()
+        antes = self.client.get('/check_command/').json()['schedule_version']
+        self.assertEqual(antes, self.client.get('/api/comando').json()['schedule_version'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._alarm(9).save()
+        self.assertNotEqual(self.client.get('/check_command/').json()['schedule_version'], antes)
+
+
+class ConfigVersionTests(TestCase):
+    """A versão da configuração é o último updated_at: igual entre processos e sempre crescente"""
+
+    def setUp(self):
+        cache.clear()
+        real_now = timezone.now
+        self.clock = iter(range(1, 1000))
+        patcher = mock.patch('django.utils.timezone.now', lambda: real_now() + timedelta(seconds=next(self.clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _save(self, obj):
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        return device_config.config_version()
+
+    def test_version_is_shared_and_increasing(self):
+        self.assertEqual(device_config.config_version(), 1)
+        global_config = GlobalConfig(api_key='teste')
+        v1 = self._save(global_config)
+        self.assertGreater(v1, 1)
+
+        cache.clear()  # Outro processo (ou reinício) chega à mesma versão
+        self.assertEqual(device_config.config_version(), v1)
+
+        device = Device.objects.create(device_id='esp-1', device_name='esp-1')
+        override = DeviceConfig(device=device, command_check_interval_ms=1000)
+        v2 = self._save(override)
+        self.assertGreater(v2, v1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            override.delete()
+        self.assertGreater(device_config.config_version(), v2)
+
+    def test_unchanged_version_skips_config(self):
+        self._save(GlobalConfig(api_key='teste'))
+        version = self.client.get('/api/config', {'device_id': 'esp-1'}).json()['version']
+
+        response = self.client.get('/api/config', {'device_id': 'esp-1', 'version': version})
+        self.assertEqual(response.json(), {'changed': False, 'version': version})
+
+    def test_missing_global_values_use_defaults(self):
+        # Linha gravada pelo código anterior à coluna, durante a implantação
+        GlobalConfig.objects.create(api_key='teste', command_check_interval_ms=None)
+        _, config = device_config.effective_config('esp-1')
+        self.assertEqual(config['command_check_interval_ms'], 5000)
+
+    def test_per_device_memo_is_bounded(self):
+        with mock.patch.object(device_config, 'CONFIG_CACHE_SIZE', 3):
+            for n in range(10):
+                device_config.effective_config(f'esp-{n}')
+        self.assertEqual(list(device_config._local['configs']), ['esp-7', 'esp-8', 'esp-9'])
+
+
+@override_settings(POLL_MIN_MS=1000, POLL_RING_MARGIN_MS=500, POLL_SCHEDULE_MAX_MS=60000,
+                   POLL_SCHEDULE_IDLE_MAX_MS=3600000, POLL_COMMAND_MAX_MS=15000)
+class NextPollTests(SimpleTestCase):
+    """next_poll_ms nunca espera além do próximo toque nem dos limites de cada canal"""
+
+    def setUp(self):
+        self.now = timezone.localtime(timezone.now()).replace(hour=8, minute=0, second=10, microsecond=0)
+
+    def _alarm(self, hhmm):
+        return AlarmSchedule(time=datetime.strptime(hhmm, '%H:%M').time())
+
+    def test_schedule_channel_is_capped(self):
+        # Próximo toque em 3 h: consulta a cada minuto, para perceber alterações de última hora
+        self.assertEqual(next_poll_ms(self.now, [self._alarm('11:00')], None), 60000)
+        self.assertEqual(next_poll_ms(self.now, [], None, factor=10), 60000)
+        # Toque próximo: logo após o início do minuto
+        self.assertEqual(next_poll_ms(self.now, [self._alarm('08:01')], None), 50500)
+
+    def test_version_following_schedule_channel_sleeps_until_ring(self):
+        alarms = [self._alarm('08:30'), self._alarm('11:00')]
+        self.assertEqual(next_poll_ms(self.now, alarms, None, follows_version=True), 1790500)
+        self.assertEqual(next_poll_ms(self.now, alarms[1:], None, follows_version=True), 3600000)
+        self.assertEqual(next_poll_ms(self.now, alarms, None, pending_command=True, follows_version=True), 1000)
+
+    def test_command_channel_stretch_is_capped(self):
+        self.assertEqual(next_poll_ms(self.now, (), 5000), 5000)
+        self.assertEqual(next_poll_ms(self.now, (), 5000, factor=2), 10000)
+        self.assertEqual(next_poll_ms(self.now, (), 5000, factor=50), 15000)
+        self.assertEqual(next_poll_ms(self.now, (), 30000, factor=50), 30000)
+        self.assertEqual(next_poll_ms(self.now, (), 5000, pending_command=True, factor=50), 1000)
+
+
+class RingEventLogTests(TransactionTestCase):
+    """Gravação em lote do histórico de toques e resumo agregado (/api/eventos/resumo)"""
+
+    def _event(self, **fields):
+        return RingEvent(**{'source': RingEvent.Source.WEB, 'outcome': RingEvent.Outcome.ISSUED, **fields})
+
+    def test_flush_writes_in_batches(self):
+        writer = RingEventWriter(batch_size=2)
+        with mock.patch.object(writer, '_ensure_thread'):
+            for _ in range(5):
+                writer.record(self._event())
+        self.assertTrue(writer._wakeup.is_set())  # lote completo acorda a thread
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(writer.flush(), 5)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT')]), 3)
+        self.assertEqual(RingEvent.objects.count(), 5)
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        writer = RingEventWriter(batch_size=10)
+        with mock.patch.object(writer, '_ensure_thread'):
+            for n in range(5):
+                writer.record(self._event(lateness_ms='inválido' if n == 2 else n))
+
+        with self.assertLogs('app.events', 'WARNING') as logs:
+            writer.flush()
+        self.assertEqual(sorted(RingEvent.objects.values_list('lateness_ms', flat=True)), [0, 1, 3, 4])
+        self.assertEqual(len([r for r in logs.records if r.levelname == 'ERROR']), 1)
+
+    def test_background_thread_flushes_queue(self):
+        writer = RingEventWriter(batch_size=100, flush_interval=0.05)
+        for _ in range(3):
+            writer.record(self._event())
+        deadline = time.monotonic() + 5
+        while RingEvent.objects.count() < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(RingEvent.objects.count(), 3)
+
+    def test_summary_groups_by_day_source_and_outcome(self):
+        day = timezone.make_aware(datetime(2026, 3, 2, 7, 0))
+        RingEvent.objects.bulk_create([
+            self._event(timestamp=day, ack_latency_ms=100, device_id='esp-1'),
+            self._event(timestamp=day + timedelta(hours=1), ack_latency_ms=300, device_id='esp-2'),
+            self._event(timestamp=day, outcome=RingEvent.Outcome.CONFIRMED, device_id='esp-1'),
+            self._event(timestamp=day + timedelta(days=1), ack_latency_ms=50, device_id='esp-1'),
+        ])
+
+        summary = self.client.get('/api/eventos/resumo', {'inicio': '2026-03-02', 'fim': '2026-03-02'}).json()['summary']
+        self.assertEqual([(row['dia'], row['outcome'], row['total']) for row in summary],
+                         [('2026-03-02', 'confirmed', 1), ('2026-03-02', 'issued', 2)])
+        self.assertEqual((summary[1]['latencia_media_ms'], summary[1]['latencia_max_ms']), (200, 300))
+
+        per_device = self.client.get('/api/eventos/resumo', {'por_dispositivo': '1'}).json()['summary']
+        self.assertEqual(len(per_device), 4)
+        self.assertEqual(self.client.get('/api/eventos/resumo', {'inicio': 'ontem'}).status_code, 400)
+
+
+class ServerClockTests(SimpleTestCase):
+    """Bloco de horário enviado aos dispositivos (app/clock.py) e /api/tempo"""
+
+    def _utc(self, *args):
+        return datetime(*args, tzinfo=dt_timezone.utc)
+
+    def test_payload_follows_active_timezone(self):
+        now = self._utc(2024, 7, 1, 12, 0, 0, 250000)
+        with timezone.override('America/New_York'):
+            payload = clock_payload(now)
+        self.assertEqual(payload, {
+            'epoch_ms': 1719835200250,
+            'iso': '2024-07-01T08:00:00.250-04:00',
+            'timezone': 'America/New_York',
+            'utc_offset_s': -4 * 3600,
+            'dst': True,
+            'next_transition_ms': epoch_ms(self._utc(2024, 11, 3, 6)),
+        })
+
+        with timezone.override('America/Sao_Paulo'):
+            payload = clock_payload(now)
+        self.assertEqual((payload['timezone'], payload['utc_offset_s'], payload['dst']),
+                         ('America/Sao_Paulo', -3 * 3600, False))
+        self.assertIsNone(payload['next_transition_ms'])  # sem horário de verão desde 2019
+
+    def test_next_transition_is_exact_to_the_second(self):
+        with timezone.override('Europe/Lisbon'):
+            # 31/03/2024 01:00 UTC: 01:00 WET passa a 02:00 WEST
+            self.assertEqual(_next_transition(date(2024, 1, 10), 'Europe/Lisbon'),
+                             epoch_ms(self._utc(2024, 3, 31, 1)))
+            # No próprio dia da mudança, e depois dela a próxima é a volta (27/10 01:00 UTC)
+            self.assertEqual(_next_transition(date(2024, 3, 31), 'Europe/Lisbon'),
+                             epoch_ms(self._utc(2024, 3, 31, 1)))
+            self.assertEqual(_next_transition(date(2024, 4, 1), 'Europe/Lisbon'),
+                             epoch_ms(self._utc(2024, 10, 27, 1)))
+
+    def test_server_time_endpoint(self):
+        with timezone.override('America/New_York'):
+            data = self.client.get('/api/tempo', {'t0': '1234'}).json()
+        self.assertEqual(data['timezone'], 'America/New_York')
+        self.assertEqual(data['t0'], 1234)
+        self.assertLessEqual(data['epoch_ms'], data['received_ms'])
+        self.assertLessEqual(data['received_ms'], data['sent_ms'])
+
+        data = self.client.get('/api/tempo', {'t0': 'abc'}).json()
+        self.assertNotIn('t0', data)
+        self.assertEqual(self.client.post('/api/tempo').status_code, 405)
+
+
+@override_settings(SENSOR_EXPORT_CHUNK_SIZE=7)
+class SensorDataExportTests(TestCase):
+    """Exportação das leituras: uma consulta para N linhas, em NDJSON ou array JSON"""
+
+    READINGS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        devices = [Device.objects.create(device_id=f'esp-{n}', device_name=f'ESP {n}') for n in range(2)]
+        sensors = [Sensor.objects.create(name=name, sensor_type=name, value=0) for name in ('temperatura', 'umidade')]
+        SensorData.objects.bulk_create(
+            SensorData(device=devices[n % 2], sensor=sensors[n % 2], value=n) for n in range(cls.READINGS)
+        )
+        cls.expected = [
+            reading.to_dict()
+            for reading in SensorData.objects.select_related('sensor', 'device').order_by('timestamp', 'pk')
+        ]
+
+    def _export(self, **params):
+        with mock.patch.object(export, 'LINES_PER_WRITE', 4), CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/leituras/exportar', params)
+            content = b''.join(response.streaming_content)
+        return response, content, len(queries)
+
+    def test_ndjson_in_a_single_query(self):
+        response, content, queries = self._export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in content.decode().splitlines()], self.expected)
+        self.assertEqual(queries, 1)
+
+    def test_json_array_in_a_single_query(self):
+        response, content, queries = self._export(formato='json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(content), self.expected)
+        self.assertEqual(queries, 1)
+
+        _, content, _ = self._export(formato='json', device_id='nenhum')
+        self.assertEqual(json.loads(content), [])
+
+    def test_filters(self):
+        _, content, _ = self._export(device_id='esp-1', sensor='umidade')
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(rows, [row for row in self.expected if row['device_name'] == 'ESP 1'])
+        self.assertEqual(self.client.get('/api/leituras/exportar', {'formato': 'csv'}).status_code, 400)
+
+
+class InputValidationTests(TestCase):
+    """Parâmetros inválidos enviados por clientes e dispositivos"""
+
+    def test_ring_events_rejects_non_positive_limit(self):
+        for limit in ('0', '-1', 'abc'):
+            response = self.client.get('/api/eventos', {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+        self.assertEqual(self.client.get('/api/eventos', {'limit': '10'}).status_code, 200)
+
+    def test_confirm_command_rejects_out_of_range_scheduled_at(self):
+        body = {'source': 'schedule', 'device_id': 'esp-1', 'scheduled_at': 10 ** 30}
+        response = self.client.post('/confirm_command/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        body['scheduled_at'] = ''
+        response = self.client.post('/confirm_command/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(RING_EVENT_ASYNC=False, SIREN_STATE_SNAPSHOT_INTERVAL=0)
+    def test_confirm_command_discards_unsynced_activation_clock(self):
+        scheduled_at = epoch_ms(timezone.now())
+        for activated_at in (0, scheduled_at + 1500):
+            body = {'source': 'schedule', 'device_id': 'esp-1', 'scheduled_at': scheduled_at,
+                    'activated_at': activated_at}
+            response = self.client.post('/confirm_command/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+
+        unsynced, synced = RingEvent.objects.order_by('id')
+        self.assertEqual((unsynced.activated_at, unsynced.lateness_ms), (None, None))
+        self.assertEqual(synced.lateness_ms, 1500)
+
+
+class FirmwareOtaTests(TestCase):
+    """Seleção da versão (liberação gradual) e entrega do binário com ETag e Range"""
+
+    DATA = bytes(range(100))
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.release = self._release('1.0.1', rollout_percent=100)
+        self.url = '/ota/firmware/1.0.1'
+        self.etag = f'"{self.release.sha256}"'
+
+    def _release(self, version, **fields):
+        return FirmwareRelease.objects.create(
+            version=version, binary=ContentFile(self.DATA, name=f'{version}.bin'), **fields
+        )
+
+    def _device(self, version, inside):
+        """Primeiro device_id dentro (ou fora) dos 10% da liberação de version"""
+        return next(
+            f'esp-{n}' for n in range(1000) if (rollout_bucket(f'esp-{n}', version) < 10) == inside
+        )
+
+    def _get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def test_full_download_and_not_modified(self):
+        response, content = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content, self.DATA)
+        self.assertEqual(response['ETag'], self.etag)
+
+        response, _ = self._get(HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        for header, expected in (('bytes=10-19', self.DATA[10:20]), ('bytes=90-', self.DATA[90:]),
+                                 ('bytes=-5', self.DATA[-5:]), ('bytes=95-500', self.DATA[95:])):
+            response, content = self._get(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(content, expected, header)
+        self.assertEqual(response['Content-Range'], 'bytes 95-99/100')
+
+    def test_unsatisfiable_and_invalid_ranges(self):
+        for header in ('bytes=100-', 'bytes=-0'):
+            response, _ = self._get(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */100')
+
+        # Intervalos sintaticamente inválidos são ignorados (RFC 7233): arquivo completo
+        for header in ('bytes=50-10', 'bytes=abc', 'bytes=-'):
+            response, content = self._get(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 200, header)
+            self.assertEqual(content, self.DATA, header)
+
+    def test_if_range(self):
+        response, content = self._get(HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=self.etag)
+        self.assertEqual((response.status_code, content), (206, self.DATA[10:20]))
+
+        response, content = self._get(HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"versao-antiga"')
+        self.assertEqual((response.status_code, content), (200, self.DATA))
+
+    def test_rollout_bucketing(self):
+        release = self._release('1.0.2', rollout_percent=10)
+        inside, outside = self._device('1.0.2', inside=True), self._device('1.0.2', inside=False)
+
+        self.assertEqual(rollout_bucket(inside, '1.0.2'), rollout_bucket(inside, '1.0.2'))
+        self.assertEqual(target_release(inside, '1.0.1'), release)
+        self.assertIsNone(target_release(outside, '1.0.1'))
+        self.assertEqual(target_release(outside, '1.0.0'), self.release)
+
+        release.device_group = 'bloco-a'
+        release.save()
+        self.assertIsNone(target_release(inside, '1.0.1', group='bloco-b'))
+        self.assertEqual(target_release(inside, '1.0.1', group='bloco-a'), release)
+
+    def test_reduced_rollout_never_downgrades(self):
+        release = self._release('1.0.2', rollout_percent=100)
+        outside = self._device('1.0.2', inside=False)
+        self.assertEqual(target_release(outside, '1.0.1'), release)
+
+        release.rollout_percent = 10
+        release.save()
+        self.assertIsNone(target_release(outside, '1.0.2'))
+        self.assertIsNone(target_release(outside, '1.0.10'))
+
+        response = self.client.get('/ota/verificar', {'device_id': outside, 'version': '1.0.2'})
+        self.assertEqual(response.json(), {'update': False, 'version': '1.0.2'})
+
+    def test_version_report_only_updates_registered_devices(self):
+        response = self.client.get('/ota/verificar', {'device_id': 'desconhecido', 'version': '1.0.0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Device.objects.filter(device_id='desconhecido').exists())
+
+        Device.objects.create(device_id='esp-1', device_name='esp-1', firmware_version='1.0.0')
+        self.client.get('/ota/verificar', {'device_id': 'esp-1', 'version': '1.0.1'})
+        device = Device.objects.get(device_id='esp-1')
+        self.assertEqual(device.firmware_version, '1.0.1')
+        self.assertIsNotNone(device.firmware_reported_at)
+
+
+class DeployCompatibilityTests(SimpleTestCase):
+    """implantar compara as migrações pendentes com os modelos da revisão em execução"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.loader = MigrationLoader(None, ignore_no_migrations=True)
+
+    def _problems(self, name, running=None):
+        plan = [(self.loader.graph.nodes['app', name], False)]
+        return [reason for _, _, reason in incompatible_operations(plan, self.loader, running)]
+
+    def test_removal_of_column_unused_by_running_code(self):
+        removal = '0014_remove_sirenstatus_activation_source'
+        baseline = {'app_sirenstatus': {'id': False, 'is_on': False, 'last_activated': False}}
+        self.assertEqual(self._problems(removal), ['remoção: o código antigo ainda usa a coluna'])
+        self.assertEqual(self._problems(removal, baseline), [])
+
+        baseline['app_sirenstatus']['activation_source'] = False
+        self.assertEqual(len(self._problems(removal, baseline)), 1)
+
+    def test_required_column_only_matters_for_tables_in_use(self):
+        self.assertEqual(len(self._problems('0003_sirenstatus_activation_source')), 1)
+        self.assertEqual(self._problems('0003_sirenstatus_activation_source', {'app_device': {}}), [])
+        self.assertEqual(len(self._problems('0003_sirenstatus_activation_source', {'app_sirenstatus': {}})), 1)
+
+    def test_new_device_and_config_columns_accept_null(self):
+        self.assertEqual(self._problems('0006_firmware_release'), [])
+        self.assertEqual(self._problems('0007_device_polling_config'), [])
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """O estado da sirene só chega aos outros processos por um cache compartilhado"""
+
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    def test_locmem_refused_with_several_processes(self):
+        with self.settings(CACHES=self.LOCMEM, SERVER_PROCESSES=2):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['app.E001'])
+        with self.settings(CACHES=self.LOCMEM, SERVER_PROCESSES=1):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_default_cache_is_shared(self):
+        with self.settings(SERVER_PROCESSES=4):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class DeviceProfileTests(SimpleTestCase):
+    """O perfil dos dispositivos não carrega as views da interface web"""
+
+    def test_device_urlconf_skips_web_views(self):
+        script = (
+            'import sys, django; django.setup()\n'
+            'from django.urls import get_resolver; get_resolver().url_patterns\n'
+            'print(sorted(m for m in ("app.views", "app.forms", "django.contrib.messages") if m in sys.modules))'
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='SchoolBuzzer.settings_device')
+        result = subprocess.run([sys.executable, '-c', script], env=env, cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+
+GUNICORN_APP = """
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+"""
+
+
+@skipUnless(importlib.util.find_spec('gunicorn'), 'Gunicorn não instalado')
+class GracefulSwapTests(SimpleTestCase):
+    """Troca de mestres com o Gunicorn real: o novo mestre grava <pidfile>.2 até o antigo sair"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        with open(f'{self.tmp}/app_teste.py', 'w') as arquivo:
+            arquivo.write(GUNICORN_APP)
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.pidfile = f'{self.tmp}/web.pid'
+        self.master = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--pid', self.pidfile,
+             '--bind', f'127.0.0.1:{self.port}', '--workers', '1', 'app_teste:app'],
+            cwd=self.tmp, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(self._stop)
+        self.assertTrue(self._wait(lambda: read_pid(self.pidfile) == self.master.pid))
+
+    def _stop(self):
+        for pid in {read_pid(self.pidfile), read_pid(self.pidfile + '.2')} - {None, self.master.pid}:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        if self.master.poll() is None:
+            self.master.terminate()
+            self.master.wait(timeout=15)
+
+    def _wait(self, condition, timeout=15):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.1)
+        return False
+
+    def test_new_master_takes_over_pidfile(self):
+        old_pid, new_pid = graceful_swap(
+            self.pidfile, f'http://127.0.0.1:{self.port}/', timeout=20, poll=0.1
+        )
+
+        self.assertEqual(old_pid, self.master.pid)
+        self.assertNotEqual(new_pid, old_pid)
+        self.assertEqual(read_pid(self.pidfile), new_pid)
+        self.assertFalse(os.path.exists(self.pidfile + '.2'))
+        self.assertIsNotNone(self.master.wait(timeout=15))
+
+    def test_unready_new_master_is_terminated(self):
+        with self.assertRaises(RuntimeError):
+            graceful_swap(self.pidfile, 'http://127.0.0.1:9/', timeout=3, poll=0.1)
+
+        self.assertTrue(self._wait(lambda: not os.path.exists(self.pidfile + '.2')))
+        self.assertIsNone(self.master.poll())
+        self.assertEqual(read_pid(self.pidfile), self.master.pid)
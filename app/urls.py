@@ -11,20 +11,34 @@ ROTAS PRINCIPAIS:
 - /: Página inicial
 - /agendamentos/: Gerenciamento de agendamentos
 - /api/comando: Endpoint para dispositivos ESP
+- /api/painel: Agenda do dia para o painel
+- /api/eventos: Histórico de toques
+- /api/leituras/exportar: Exportação das leituras dos sensores
+- /api/tempo: Horário do servidor para os dispositivos
+- /ota/: Distribuição de firmware (verificação e download)
+- /api/config: Configuração efetiva dos dispositivos
 - /ativar/: Ativação manual da sirene
 """
 
 from django.urls import path
+from .device_urls import device_urlpatterns
 from .views import (
 	HomeView,
 	AlarmListView,
 	AlarmCreateView,
 	AlarmUpdateView,
 	AlarmDeleteView,
-	comando_esp,
-	ativar_campainha, check_command, confirm_command, update_alarm, isUpdate, updateConfirm
+	dashboard_data,
+	ring_events,
+	ring_events_summary,
+	ring_latency,
+	sensor_data_export,
+	ativar_campainha, update_alarm
 	)
 app_name = 'app'
+
+# As rotas consultadas pelos dispositivos ESP ficam em app/device_urls.py (também servidas
+# pelo perfil SchoolBuzzer.settings_device, sem admin, sessões e demais middlewares)
 urlpatterns = [
 		# Páginas web
 		path('', HomeView.as_view(), name = 'home'),
@@ -33,12 +47,12 @@ urlpatterns = [
 		path('agendamentos/editar/<int:pk>/', AlarmUpdateView.as_view(), name = 'alarm-update'),
 		path('agendamentos/remover/<int:pk>/', AlarmDeleteView.as_view(), name = 'alarm-delete'),
 		
-		# API endpoints
-		path('api/comando', comando_esp, name = 'comando-esp'),
+		# API endpoints (painel e relatórios)
+		path('api/painel', dashboard_data, name = 'dashboard-data'),
+		path('api/eventos', ring_events, name = 'ring-events'),
+		path('api/eventos/resumo', ring_events_summary, name = 'ring-events-summary'),
+		path('api/latencia', ring_latency, name = 'ring-latency'),
+		path('api/leituras/exportar', sensor_data_export, name = 'sensor-data-export'),
 		path('ativar/', ativar_campainha, name = 'ativar-campainha'),
-		path('check_command/', check_command, name='check_command'),
-		path('confirm_command/', confirm_command, name='confirm_command'),
 		path('update/', update_alarm, name = 'update'),
-		path('isUpdate/', isUpdate, name='isUpdate'),
-		path('updateConfirm/', updateConfirm, name = 'updateConfirm'),
-		]
\ No newline at end of file
+		] + device_urlpatterns
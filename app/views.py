@@ -4,11 +4,19 @@ VIEWS DO SISTEMA DE SIRENE ESCOLAR
 DESCRIÇÃO:
 Este módulo contém todas as views do sistema, incluindo:
 - Views para interface web (CRUD de agendamentos)
-- API endpoints para comunicação com dispositivos ESP
+- API endpoints do painel e relatórios (os endpoints consultados pelos dispositivos
+  ESP ficam em app/device_views.py e são reexportados aqui)
 - Lógica de controle da sirene/campainha
 
 ENDPOINTS PRINCIPAIS:
 - /api/comando: Endpoint para o ESP consultar agendamentos
+- /api/painel: Dados do painel (agenda do dia) em JSON
+- /api/eventos: Histórico de toques (consulta por período e resumo agregado)
+- /api/latencia: Histogramas de atraso dos toques por dispositivo e origem
+- /api/leituras/exportar: Exportação das leituras dos sensores (NDJSON/JSON em streaming)
+- /api/tempo: Horário do servidor para sincronização dos dispositivos
+- /ota/verificar, /ota/firmware/<versão>: Distribuição de firmware com liberação gradual
+- /api/config: Configuração efetiva do dispositivo (intervalos e durações)
 - /ativar/: Ativação manual da sirene
 - /agendamentos/: CRUD de agendamentos
 """
@@ -18,162 +26,337 @@ ENDPOINTS PRINCIPAIS:
 # IMPORTAÇÕES
 # ========================================================
 
+import hashlib
 import json
-from datetime import datetime, time
+import logging
+import math
+import threading
+from datetime import datetime, time, timedelta
 from django.utils import timezone
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.http import JsonResponse
 
+from django.conf import settings
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Max
+from django.db.models.functions import TruncDay
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from rest_framework.views import APIView
+from django.views.generic import View, ListView, CreateView, UpdateView, DeleteView
 
 from .forms import AlarmForm
-from .models import AlarmSchedule, SirenStatus, ComandoESP
-
-DAYS_MAP = {
-		'Mon': 'SEG', 'Tue': 'TER', 'Wed': 'QUA',
-		'Thu': 'QUI', 'Fri': 'SEX', 'Sat': 'SAB', 'Sun': 'DOM'
-		}
-
+from .device_views import (  # noqa: F401 (reexportadas)
+    check_command, comando_esp, confirm_command, device_config, isUpdate, ota_check, ota_download,
+    server_time, updateConfirm,
+)
+from .events import record_ring_event
+from .export import iter_json_array, iter_ndjson, sensor_data_rows
+from .latency import latency_report
+from .models import AlarmSchedule, ComandoESP, RingEvent, SensorData
+from .ratelimit import RateLimiter, lock_siren_bucket, store_siren_bucket
+from .schedule import next_alarm, schedule_version, today_schedule, weekday_code
+from .state import mark_siren_on
+
+logger = logging.getLogger(__name__)
+
+# Ativação manual: serializa os pedidos do processo (entre processos, a trava é a linha de
+# SirenThrottle) e limita a taxa por usuário; o limite global da sirene fica no banco
+_activation_lock = threading.Lock()
+user_rate_limiter = RateLimiter(*getattr(settings, 'ACTIVATION_RATE_LIMIT_USER', (5, 60)))
+IDEMPOTENCY_KEY = 'ativar:chave:{}'
 
 
 # ========================================================
-# ENDPOINT PRINCIPAL PARA CONSULTA DA ESP
+# DADOS DO PAINEL (AGENDA DO DIA)
 # ========================================================
 
-@csrf_exempt
-def comando_esp(request):
+def dashboard_data(request):
     """
-    Endpoint que retorna JSON com o comando 'ligar' ou 'desligar' baseado no
-    horário atual e na presença de agendamento ou comando manual.
-
-    Retorna:
-    - current_time: hora atual formatada
-    - current_day: dia da semana
-    - should_activate: True se deve ativar a sirene
-    - is_scheduled: True se é por agendamento (não manual)
-    - sirene_status: status atual da sirene
-    - next_alarm: horário do próximo alarme (se houver)
+    Retorna em JSON a agenda do dia usada pelo painel.
+
+    A agenda é calculada uma única vez por versão (ver app/schedule.py), portanto
+    chamadas repetidas não consultam o banco de dados.
     """
     if request.method != 'GET':
         return JsonResponse({'error': 'Método não permitido'}, status=405)
 
-    try:
-        now = timezone.localtime(timezone.now())
-        weekday_en = now.strftime('%a')
-        weekday_pt = DAYS_MAP.get(weekday_en, weekday_en)
-        current_time = now.time()
-
-        # Consulta alarmes válidos
-        agendamentos = AlarmSchedule.objects.filter(
-            start_date__lte=now.date(),
-            end_date__gte=now.date(),
-            days_of_week__contains=weekday_pt,
-            active=True
-        ).order_by('time')
-
-        # Verifica se há alarme para o horário atual
-        should_activate = any(
-            ag.time.hour == current_time.hour and ag.time.minute == current_time.minute
-            for ag in agendamentos
-        )
-
-        # Verifica comandos manuais pendentes
-        manual_command = ComandoESP.objects.filter(comando='ligar').first()
-
-        response_data = {
-            'current_time': now.strftime('%H:%M'),
-            'current_day': weekday_pt,
-            'should_activate': should_activate or (manual_command is not None),
-            'is_scheduled': should_activate and not manual_command,
-            'sirene_status': SirenStatus.objects.first().is_on if SirenStatus.objects.exists() else False,
-            'next_alarm': None
-        }
-
-        # Próximo alarme após o horário atual
-        for ag in agendamentos:
-            if ag.time > current_time:
-                response_data['next_alarm'] = ag.time.strftime('%H:%M')
-                break
-
-        return JsonResponse(response_data)
+    now = timezone.localtime(timezone.now())
+    alarms = today_schedule(now)
+    proximo = next_alarm(alarms, now.time())
 
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+    return JsonResponse({
+        'date': now.date().isoformat(),
+        'current_day': weekday_code(now),
+        'version': schedule_version(),
+        'alarms': [alarm.to_json() for alarm in alarms],
+        'next_alarm': proximo.time.strftime('%H:%M') if proximo else None,
+    })
 
 # ========================================================
 # ATIVAÇÃO MANUAL DA CAMPANHA
 # ========================================================
 
+def _client_ip(request):
+    """
+    IP do cliente. Atrás de um proxy confiável (TRUSTED_PROXIES, ex: o Nginx local) usa o
+    último endereço de X-Forwarded-For, o único acrescentado pelo próprio proxy.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if forwarded and remote_addr in getattr(settings, 'TRUSTED_PROXIES', ()):
+        return forwarded.split(',')[-1].strip()
+    return remote_addr
+
+
+def _idempotency_cache_key(idempotency_key):
+    return IDEMPOTENCY_KEY.format(hashlib.sha256(idempotency_key.encode()).hexdigest())
+
+
 @csrf_exempt
 def ativar_campainha(request):
     """
     Endpoint para ativar a sirene manualmente via POST.
     Cria entrada de comando no banco e atualiza status da sirene.
+
+    Proteções contra acionamentos concorrentes (válidas entre processos):
+    - Serialização: a transação começa gravando a linha de SirenThrottle, que fica travada
+      até o commit
+    - Idempotência: repetir a requisição com o mesmo Idempotency-Key (cabeçalho ou campo
+      idempotency_key do JSON) devolve o mesmo comando, por ACTIVATION_IDEMPOTENCY_TTL
+      segundos (no cache, independente das linhas de ComandoESP)
+    - Agrupamento: pedidos dentro de ACTIVATION_COALESCE_SECONDS após um acionamento
+      pendente resultam em um único toque
+    - Limite de taxa (token bucket) global da sirene, no banco, e por usuário (ou IP do
+      cliente): excedido, responde 429
     """
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
 
     try:
-        ComandoESP.objects.all().delete()
-        ComandoESP.objects.create(comando='ligar', source='web')
-
-        status = SirenStatus.objects.first() or SirenStatus()
-        status.is_on = True
-        status.save()
+        data = json.loads(request.body or b'{}')
+        if not isinstance(data, dict):
+            data = {}
+    except ValueError:
+        data = {}
+
+    idempotency_key = (request.headers.get('Idempotency-Key') or data.get('idempotency_key') or '')[:64] or None
+    chave_cache = _idempotency_cache_key(idempotency_key) if idempotency_key else None
+    idempotency_ttl = getattr(settings, 'ACTIVATION_IDEMPOTENCY_TTL', 24 * 60 * 60)
+    if request.user.is_authenticated:
+        user_key = f"user:{request.user.pk}"
+    else:
+        user_key = f"ip:{_client_ip(request)}"
 
-        return JsonResponse({'status': 'success'})
+    try:
+        with _activation_lock, transaction.atomic():
+            sirene = lock_siren_bucket(*getattr(settings, 'ACTIVATION_RATE_LIMIT_SIREN', (10, 60)))
+            now = timezone.now()
+
+            # Mesma chave de idempotência: devolve o comando já criado
+            if chave_cache:
+                existente = cache.get(chave_cache)
+                if existente is not None:
+                    return JsonResponse({'status': 'success', 'command_id': existente, 'coalesced': True})
+
+            # Acionamento pendente recente: agrupa no mesmo toque
+            janela = timedelta(seconds=getattr(settings, 'ACTIVATION_COALESCE_SECONDS', 5))
+            pendente = (
+                ComandoESP.objects.filter(comando='ligar', timestamp__gte=now - janela)
+                .order_by('-timestamp').first()
+            )
+            if pendente:
+                if chave_cache:
+                    cache.set(chave_cache, pendente.pk, idempotency_ttl)
+                return JsonResponse({'status': 'success', 'command_id': pendente.pk, 'coalesced': True})
+
+            espera = max(user_rate_limiter.retry_after(user_key), sirene.retry_after())
+            if espera:
+                response = JsonResponse(
+                    {'status': 'error', 'message': 'Limite de acionamentos excedido'}, status=429
+                )
+                response['Retry-After'] = str(math.ceil(espera))
+                return response
+            user_rate_limiter.allow(user_key)
+            sirene.allow()
+            store_siren_bucket(sirene)
+
+            ComandoESP.objects.all().delete()
+            comando = ComandoESP.objects.create(comando='ligar', source='web', idempotency_key=idempotency_key)
+            if chave_cache:
+                # Gravada antes do commit: o próximo processo a obter a trava já a encontra
+                cache.set(chave_cache, comando.pk, idempotency_ttl)
+
+            # Estado da sirene e histórico só mudam se a transação for confirmada
+            # (SirenStatus é gravado em segundo plano, ver app/state.py)
+            transaction.on_commit(lambda: mark_siren_on(comando.timestamp))
+            transaction.on_commit(lambda: record_ring_event(
+                source=RingEvent.Source.WEB,
+                outcome=RingEvent.Outcome.ISSUED,
+                command_id=comando.pk,
+                timestamp=comando.timestamp,
+            ))
+
+        return JsonResponse({'status': 'success', 'command_id': comando.pk, 'coalesced': False})
 
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 # ========================================================
-# VERIFICAÇÃO DO COMANDO PENDENTE PARA A ESP
+# HISTÓRICO DE TOQUES (RELATÓRIOS)
 # ========================================================
 
-@csrf_exempt
-def check_command(request):
+def _filter_period(queryset, request):
     """
-    Retorna o comando atual ("ligar" ou "desligar") para a ESP.
+    Filtra o queryset pelo campo timestamp com os parâmetros GET inicio e fim
+    (data ou data/hora ISO). Levanta ValueError se alguma data for inválida.
     """
-    comando = ComandoESP.objects.first()
+    for param, lookup in (('inicio', 'timestamp__gte'), ('fim', 'timestamp__lte')):
+        valor = request.GET.get(param)
+        if not valor:
+            continue
+        # Data sem horário: o dia inteiro (parse_datetime a leria como 00:00)
+        dia = parse_date(valor)
+        if dia is not None:
+            momento = datetime.combine(dia, time.max if param == 'fim' else time.min)
+        else:
+            momento = parse_datetime(valor)
+            if momento is None:
+                raise ValueError(f"Data inválida em '{param}': {valor}")
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+        queryset = queryset.filter(**{lookup: momento})
+    return queryset
 
-    if not comando or comando.comando != 'ligar':
-        return JsonResponse({'command': 'desligar'})
 
-    source = getattr(comando, 'source', 'manual') or 'manual'
+def _ring_events(request):
+    """
+    Aplica os filtros comuns aos relatórios de toques.
+
+    Parâmetros (GET): inicio, fim (data ou data/hora ISO), device_id, source.
+    Levanta ValueError se alguma data for inválida.
+    """
+    eventos = _filter_period(RingEvent.objects.all(), request)
+    if request.GET.get('device_id'):
+        eventos = eventos.filter(device_id=request.GET['device_id'])
+    if request.GET.get('source'):
+        eventos = eventos.filter(source=request.GET['source'])
+    return eventos
+
+
+def ring_events(request):
+    """
+    Lista os eventos de toque de um período (mais recentes primeiro).
 
+    Parâmetros adicionais: limit (padrão 500, de 1 a 5000).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    try:
+        eventos = _ring_events(request)
+        limit = int(request.GET.get('limit', 500))
+        if limit < 1:
+            raise ValueError("limit deve ser um inteiro positivo")
+        limit = min(limit, 5000)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    campos = ('id', 'timestamp', 'device_id', 'source', 'outcome', 'command_id',
+              'scheduled_at', 'ack_latency_ms', 'activated_at', 'lateness_ms')
     return JsonResponse({
-        'command': 'ligar',
-        'source': source,
-        'id': str(comando.id)
+        'events': list(eventos.order_by('-timestamp').values(*campos)[:limit])
     })
 
+
+def ring_events_summary(request):
+    """
+    Resumo agregado dos toques por dia, origem e resultado: quantidade de eventos,
+    latência média e máxima de confirmação. Com por_dispositivo=1 agrupa também por dispositivo.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    try:
+        eventos = _ring_events(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    grupos = ['dia', 'source', 'outcome']
+    if request.GET.get('por_dispositivo') == '1':
+        grupos.append('device_id')
+
+    resumo = (
+        eventos.annotate(dia=TruncDay('timestamp'))
+        .values(*grupos)
+        .annotate(total=Count('id'), latencia_media_ms=Avg('ack_latency_ms'), latencia_max_ms=Max('ack_latency_ms'))
+        .order_by(*grupos)
+    )
+    return JsonResponse({
+        'summary': [dict(linha, dia=linha['dia'].date().isoformat()) for linha in resumo]
+    })
+
+
+def ring_latency(request):
+    """
+    Histogramas e percentis (p50/p95) do atraso dos toques, por dispositivo e por origem.
+
+    Aceita os mesmos filtros de /api/eventos e limiar_ms (padrão:
+    RING_LATENCY_P95_THRESHOLD_MS). Dispositivos com p95 acima do limiar vêm em 'flagged'.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    try:
+        eventos = _ring_events(request)
+        limiar = request.GET.get('limiar_ms')
+        limiar = int(limiar) if limiar else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(latency_report(eventos, limiar))
+
 # ========================================================
-# CONFIRMAÇÃO DE EXECUÇÃO DO COMANDO PELA ESP
+# EXPORTAÇÃO DE LEITURAS DOS SENSORES
 # ========================================================
 
-@csrf_exempt
-def confirm_command(request):
+def sensor_data_export(request):
     """
-    Endpoint chamado pela ESP para confirmar execução do comando.
-    Reseta o comando para 'desligar'.
+    Exporta as leituras dos sensores em streaming, com memória constante.
+
+    Parâmetros (GET): inicio, fim (data ou data/hora ISO), device_id, sensor (nome)
+    e formato ('ndjson', padrão, ou 'json' para um único array).
     """
-    if request.method == 'POST':
-        comando = ComandoESP.objects.first()
-        if comando:
-            comando.comando = 'desligar'
-            comando.save()
-        return JsonResponse({'status': 'success'})
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método não permitido'}, status=405)
+
+    formato = request.GET.get('formato', 'ndjson')
+    if formato not in ('ndjson', 'json'):
+        return JsonResponse({'error': "formato deve ser 'ndjson' ou 'json'"}, status=400)
+
+    try:
+        leituras = _filter_period(SensorData.objects.all(), request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if request.GET.get('device_id'):
+        leituras = leituras.filter(device__device_id=request.GET['device_id'])
+    if request.GET.get('sensor'):
+        leituras = leituras.filter(sensor__name=request.GET['sensor'])
+
+    rows = sensor_data_rows(leituras, chunk_size=getattr(settings, 'SENSOR_EXPORT_CHUNK_SIZE', 2000))
+    if formato == 'json':
+        response = StreamingHttpResponse(iter_json_array(rows), content_type='application/json')
+    else:
+        response = StreamingHttpResponse(iter_ndjson(rows), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="leituras.{formato}"'
+    return response
 
-    return JsonResponse({'status': 'error'}, status=400)
 @csrf_exempt
 def update_alarm(request):
     if request.method == 'POST':
@@ -185,62 +368,17 @@ def update_alarm(request):
         return JsonResponse({'status': 'not found'}, status=404)
     return JsonResponse({'status': 'error'}, status=405)
 
-def isUpdate(request):
-    if request.method == 'GET':
-        comando = ComandoESP.objects.first()
-        if comando:
-            return JsonResponse({'update': comando.update})
-        else:
-            return JsonResponse({'error': 'Nenhum comando encontrado'}, status=404)
-    return JsonResponse({'error': 'Método não permitido'}, status=405)
-
-@csrf_exempt
-def updateConfirm(request):
-	if request.method == 'POST':
-		comando = ComandoESP.objects.first()
-		if comando:
-			comando.update = 'modoNormal'
-			comando.save()
-			return JsonResponse({'status': 'success'})
-		else:
-			return JsonResponse({'error': 'Nenhum comando encontrado'}, status=404)
-	return JsonResponse({'error': 'Método não permitido'}, status=405)
-
-class HomeView(APIView):
+class HomeView(View):
 	def get(self, request):
-		# Converter dia atual para formato do sistema (ex: "DOM")
-		weekday_map = {
-				'Monday': 'SEG',
-				'Tuesday': 'TER',
-				'Wednesday': 'QUA',
-				'Thursday': 'QUI',
-				'Friday': 'SEX',
-				'Saturday': 'SAB',
-				'Sunday': 'DOM'
-				}
-		today = timezone.now().strftime('%A')
-		today_abbr = weekday_map.get(today, today)
-		
-		# Query corrigida
-		alarms = AlarmSchedule.objects.filter(
-				active = True,
-				start_date__lte = timezone.now().date(),
-				end_date__gte = timezone.now().date(),
-				days_of_week__contains = today_abbr
-				).order_by('time')
-		# Log de agendamentos inativos
-		inativos = AlarmSchedule.objects.filter(active = False)
-		if inativos.exists():
-			print(f"\nAGENDAMENTOS INATIVOS ENCONTRADOS:")
-			for alarm in inativos:
-				print(f"- ID {alarm.id}: {alarm.time} ({alarm.days_of_week})")
-		# DEBUG - Mostrar query no console
-		print(f"Agendamentos encontrados: {alarms.count()}")
-		for alarm in alarms:
-			print(f"- {alarm.event_type} às {alarm.time}")
+		# Agenda do dia calculada uma única vez (cache por versão)
+		now = timezone.localtime(timezone.now())
+		alarms = today_schedule(now)
+		logger.debug("Agendamentos encontrados: %d", len(alarms))
 	
 		return render(request, 'index.html', {
 				'alarms': alarms,
+				'versao_agenda': schedule_version(),
+				'data_hoje': now.date().isoformat(),
 				'titulo': 'Sistema de Sirene Escolar'
 				})
 
@@ -0,0 +1,64 @@
+"""
+CONFIGURAÇÃO DO GUNICORN (gunicorn.conf.py)
+
+DESCRIÇÃO:
+Configuração de produção (Raspberry Pi) para os dois perfis do projeto:
+- painel web e /admin/: DJANGO_SETTINGS_MODULE=SchoolBuzzer.settings
+- API dos dispositivos: DJANGO_SETTINGS_MODULE=SchoolBuzzer.settings_device
+
+A aplicação é carregada uma única vez no processo mestre (preload_app) e os workers
+são criados por fork: a inicialização do Django não se repete em cada worker e as
+páginas de memória do código importado são compartilhadas entre eles (copy-on-write).
+
+USO:
+    gunicorn -c gunicorn.conf.py SchoolBuzzer.wsgi
+
+Variáveis de ambiente: GUNICORN_BIND (padrão 0.0.0.0:3235), GUNICORN_WORKERS (padrão 2),
+GUNICORN_PIDFILE (necessário para a troca de workers do comando `implantar`).
+
+O número de workers é repassado ao Django (SERVER_PROCESSES) e o mestre executa as
+verificações do sistema antes de criar os workers: um cache que não é compartilhado
+entre processos, por exemplo, impede a inicialização.
+"""
+
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:3235')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+pidfile = os.environ.get('GUNICORN_PIDFILE') or None
+
+# Lido pelo settings.py (carregado depois deste arquivo, em preload_app)
+os.environ['SERVER_PROCESSES'] = str(max(workers, int(os.environ.get('SERVER_PROCESSES', 1))))
+
+preload_app = True
+timeout = 30
+graceful_timeout = 10
+
+# Recicla os workers periodicamente (com variação para não reiniciarem juntos)
+max_requests = 5000
+max_requests_jitter = 500
+
+
+def when_ready(server):
+    """Conclui no mestre o que seria feito na primeira requisição de cada worker"""
+    from django.core import checks
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from app.deploy import warm_caches
+
+    errors = [message for message in checks.run_checks() if message.is_serious()]
+    if errors:
+        # RuntimeError encerra o mestre; na troca do `implantar` o antigo continua no ar
+        raise RuntimeError('\n'.join(str(message) for message in errors))
+
+    get_resolver().reverse_dict  # importa o URLconf e monta as rotas
+    warm_caches()                # agenda do dia e templates, herdados pelos workers
+    connections.close_all()      # conexões não podem ser compartilhadas entre processos
+
+    # Move os objetos já criados para uma geração permanente: o coletor de lixo dos
+    # workers deixa de percorrê-los, evitando cópias das páginas compartilhadas
+    gc.collect()
+    gc.freeze()
+
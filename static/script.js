@@ -1,3 +1,6 @@
+// Reenvios do mesmo clique (falha de rede ou erro 5xx) reutilizam a Idempotency-Key
+const TENTATIVAS_ATIVACAO = 3;
+
 function ativarSirene() {
     const btn = document.getElementById('sirenButton');
     const btnText = document.getElementById('sirenButtonText');
@@ -8,11 +11,15 @@ function ativarSirene() {
     btnText.textContent = "Enviando...";
     spinner.classList.remove('d-none');
 
-    fetch("/ativar/", {
+    // Um clique = uma chave: só os reenvios automáticos deste clique a repetem
+    const idempotencyKey = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Date.now()) + Math.random();
+
+    const enviar = (tentativa) => fetch("/ativar/", {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
-            'X-CSRFToken': '{{ csrf_token }}'
+            'X-CSRFToken': '{{ csrf_token }}',
+            'Idempotency-Key': idempotencyKey
         },
         body: JSON.stringify({
             duration: 30,  // 30 segundos de duração
@@ -20,11 +27,28 @@ function ativarSirene() {
         })
     })
     .then(response => {
+        if (response.status >= 500 && tentativa < TENTATIVAS_ATIVACAO) {
+            throw Object.assign(new Error('Erro no servidor'), { reenviar: true });
+        }
+        if (response.status === 429) {
+            throw new Error('Limite de acionamentos excedido');
+        }
         if (!response.ok) {
             throw new Error('Erro na resposta do servidor');
         }
         return response.json();
     })
+    .catch(error => {
+        // Falha de rede (TypeError do fetch) ou 5xx: reenvia com a mesma chave
+        const reenviar = error.reenviar || error instanceof TypeError;
+        if (reenviar && tentativa < TENTATIVAS_ATIVACAO) {
+            return new Promise(resolve => setTimeout(resolve, 500 * tentativa))
+                .then(() => enviar(tentativa + 1));
+        }
+        throw error;
+    });
+
+    enviar(1)
     .then(data => {
         console.log('Sucesso:', data);
         btnText.textContent = "Sirene acionada!";
@@ -46,7 +70,7 @@ let horarios = {};
  // Função para carregar os agendamentos via API
     async function carregarAgendamentos() {
         try {
-            const response = await fetch('');  // Endereço do endpoint da view HomeView
+            const response = await fetch('/api/painel');  // Agenda do dia (JSON)
             const data = await response.json();
 
             const horariosContainer = document.getElementById('horarios-container');
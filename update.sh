@@ -7,20 +7,21 @@ source /home/piec1/venv/bin/activate
 
 # Ir para o diretório do projeto
 cd /home/piec1/IntegradorII || { echo "❌ Diretório do projeto não encontrado"; exit 1; }
+# Revisão em execução: o implantar compara as migrações com os modelos dela
+OLD_REV=$(git rev-parse HEAD) || { echo "❌ Falha ao ler a revisão atual"; exit 1; }
+
 # Atualizar o código via git
 echo "📥 Executando git pull..."
-git pull
-
-# Aplicar migrações do Django
-echo "🛠️ Rodando migrações..."
-python manage.py makemigrations
-python manage.py migrate
-
-# Reiniciar o serviço systemd (sem senha, configurado via sudoers)
-echo "🔁 Reiniciando serviço django.service..."
-sudo /bin/systemctl restart django.service
-
-echo "✅ Projeto atualizado e serviço reiniciado com sucesso!"
-
-
-
+git pull || { echo "❌ Falha no git pull"; exit 1; }
+
+# Verificar migrações, aplicar e trocar os workers do Gunicorn sem reiniciar o serviço.
+# As migrações são geradas em desenvolvimento (makemigrations não roda aqui) e a troca
+# é adiada se houver um toque agendado próximo (DEPLOY_RING_WINDOW_S).
+echo "🛠️ Implantando (migrações + troca gradual dos workers)..."
+python manage.py implantar --aguardar \
+    --revisao-anterior "$OLD_REV" \
+    --pidfile /run/schoolbuzzer/web.pid \
+    --pidfile /run/schoolbuzzer/device.pid \
+    || { echo "❌ Implantação recusada ou com falha; a versão anterior continua no ar"; exit 1; }
+
+echo "✅ Projeto atualizado sem interromper os dispositivos!"